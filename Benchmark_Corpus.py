@@ -0,0 +1,380 @@
+import os
+import sys
+import json
+import random
+import zipfile
+import argparse
+
+# Every corpus file gets a modification time in the year before this date (2024-01-01)
+BASE_TIME = 1704067200
+
+# Blobs are generated and written in pieces of this size
+BLOB_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Byte patterns planted in the blobs. Both have the same length, so the
+# replace_hex bench can patch them in place back and forth.
+PLANTED_PATTERN = "SYNDICAT_PLANTED_PATTERN_A"
+PLANTED_REPLACEMENT = "SYNDICAT_PLANTED_PATTERN_B"
+
+# Name of the fake UE module, in the spellings the module renamer looks for
+MODULE_NAME = "SynthModule"
+
+SPEC_NAME = "corpus.json"
+
+TREE_EXTENSIONS = (".txt", ".ini", ".cpp", ".h", ".uasset", ".umap")
+TEXT_EXTENSIONS = (".txt", ".ini", ".cpp", ".h")
+
+PROFILES = {
+    # Small enough to generate and run in a minute, for quick before/after checks
+    "small": {
+        "tree_files": 2000, "tree_depth": 4, "tree_fanout": 4,
+        "texture_sizes": [256, 1024], "texture_modes": ["L", "RGB", "RGBA", "P"], "texture_formats": ["PNG", "JPEG"],
+        "zip_archives": 8, "zip_members": 200, "zip_member_size": 64 * 1024,
+        "blob_count": 1, "blob_size": 64 * 1024 * 1024, "blob_patterns": 64,
+        "module_classes": 100, "module_assets": 20,
+    },
+    # Close to a real project drop, with multi-GB blobs
+    "large": {
+        "tree_files": 50000, "tree_depth": 6, "tree_fanout": 5,
+        "texture_sizes": [512, 2048, 4096], "texture_modes": ["L", "RGB", "RGBA", "P"],
+        "texture_formats": ["PNG", "JPEG"],
+        "zip_archives": 32, "zip_members": 1000, "zip_member_size": 256 * 1024,
+        "blob_count": 2, "blob_size": 2 * 1024 ** 3, "blob_patterns": 1024,
+        "module_classes": 2000, "module_assets": 200,
+    },
+}
+
+
+def _set_time(path, rng):
+    timestamp = BASE_TIME - rng.randrange(365 * 86400)
+    os.utime(path, (timestamp, timestamp))
+
+
+def _text_block(rng, size):
+    words = ("Actor", "Component", "Texture", "Material", "Blueprint", "Widget", "Level", "Sound", MODULE_NAME)
+    lines = []
+    length = 0
+    while length < size:
+        line = " ".join(rng.choice(words) for _ in range(rng.randrange(4, 12)))
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)[:size].encode('utf-8')
+
+
+def make_tree(root, files, depth, fanout, seed=0):
+    """
+    Writes a directory tree of small text and binary files.
+
+    Args:
+        root (str): Folder to write the tree into.
+        files (int): Number of files.
+        depth (int): Number of directory levels below root.
+        fanout (int): Subdirectories per directory.
+        seed (int): Seed of the generator, the same seed gives the same tree.
+
+    Returns:
+        dict: Numbers of files and directories and total bytes written.
+    """
+    rng = random.Random(f"tree-{seed}")
+    directories = [root]
+    level = [root]
+    for _ in range(depth):
+        level = [os.path.join(parent, f"dir_{index:02d}") for parent in level for index in range(fanout)]
+        directories.extend(level)
+    for directory in directories:
+        os.makedirs(directory, exist_ok=True)
+
+    written = 0
+    for index in range(files):
+        extension = rng.choice(TREE_EXTENSIONS)
+        size = rng.randrange(16 * 1024)
+        data = _text_block(rng, size) if extension in TEXT_EXTENSIONS else rng.randbytes(size)
+        path = os.path.join(rng.choice(directories), f"file_{index:06d}{extension}")
+        with open(path, 'wb') as f:
+            f.write(data)
+        _set_time(path, rng)
+        written += len(data)
+    return {"files": files, "directories": len(directories), "bytes": written}
+
+
+def make_texture(width, height, mode, rng):
+    """
+    Builds a deterministic texture: gradients mixed with noise, so it
+    compresses about as well as real art.
+
+    Returns:
+        PIL.Image.Image: The texture, in mode L, RGB, RGBA or P.
+    """
+    from PIL import Image
+
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.frombytes("L", (width, height), rng.randbytes(width * height))
+    detail = Image.blend(gradient, noise, 0.3)
+    if mode == "L":
+        return detail
+
+    rgb = Image.merge("RGB", (detail, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT), noise))
+    if mode == "RGB":
+        return rgb
+    if mode == "RGBA":
+        rgb.putalpha(gradient.transpose(Image.Transpose.FLIP_TOP_BOTTOM))
+        return rgb
+    if mode == "P":
+        return rgb.quantize(64)
+    raise ValueError(f"Unsupported texture mode: {mode}")
+
+
+def make_textures(root, sizes, modes, formats, seed=0):
+    """
+    Writes one texture per size, mode and format. JPEG only stores L and RGB.
+
+    Returns:
+        dict: Number of textures and total bytes written.
+    """
+    rng = random.Random(f"textures-{seed}")
+    os.makedirs(root, exist_ok=True)
+    count = 0
+    written = 0
+    for size in sizes:
+        for mode in modes:
+            for image_format in formats:
+                if image_format == "JPEG" and mode not in ("L", "RGB"):
+                    continue
+                extension = ".jpg" if image_format == "JPEG" else ".png"
+                path = os.path.join(root, f"T_{mode}_{size}{extension}")
+                make_texture(size, size, mode, rng).save(path, format=image_format)
+                _set_time(path, rng)
+                count += 1
+                written += os.path.getsize(path)
+    return {"files": count, "bytes": written}
+
+
+def make_zip_drop(root, archives, members, member_size, seed=0):
+    """
+    Writes a folder of zip archives, as delivered by an outsourcing drop.
+
+    Every member is half compressible text and half noise. Every archive
+    also carries a shared file, which the next archive repeats unchanged,
+    like the common files real drops ship again.
+
+    Returns:
+        dict: Numbers of archives and members and total uncompressed bytes.
+    """
+    rng = random.Random(f"zips-{seed}")
+    os.makedirs(root, exist_ok=True)
+    uncompressed = 0
+    shared = None
+    for archive in range(archives):
+        path = os.path.join(root, f"Drop_{archive:03d}.zip")
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zip_ref:
+            if shared:
+                zip_ref.writestr(*shared)
+                uncompressed += len(shared[1])
+            for member in range(members):
+                data = _text_block(rng, member_size // 2) + rng.randbytes(member_size - member_size // 2)
+                zip_ref.writestr(f"Content/Pack{archive:03d}/Asset_{member:05d}.uasset", data)
+                uncompressed += len(data)
+            shared = (f"Content/Shared/Shared_{archive:03d}.uasset", _text_block(rng, member_size))
+            zip_ref.writestr(*shared)
+            uncompressed += len(shared[1])
+        _set_time(path, rng)
+    return {"files": archives, "members": archives * (members + 1) + max(archives - 1, 0), "bytes": uncompressed}
+
+
+def plan_pattern_offsets(size, count, rng, pattern_length):
+    """
+    Picks where the patterns are planted in a blob: spread over the whole
+    file, with one straddling a chunk boundary so chunked scanners are
+    exercised too. Offsets never overlap.
+
+    Returns:
+        list: Sorted offsets.
+    """
+    offsets = set()
+    if size > BLOB_CHUNK_SIZE + pattern_length:
+        offsets.add(BLOB_CHUNK_SIZE - pattern_length // 2)
+    spacing = size // max(count, 1)
+    for index in range(count - len(offsets)):
+        offsets.add(index * spacing + rng.randrange(max(spacing - pattern_length, 1)))
+    planted = []
+    for offset in sorted(offsets):
+        if offset + pattern_length <= size and (not planted or offset >= planted[-1] + pattern_length):
+            planted.append(offset)
+    return planted
+
+
+def make_blob(path, size, patterns, seed=0):
+    """
+    Writes a blob of noise with PLANTED_PATTERN planted at known offsets,
+    in BLOB_CHUNK_SIZE pieces, so multi-GB blobs do not need the memory.
+
+    Returns:
+        dict: Blob size, number of planted patterns and the first offset.
+    """
+    rng = random.Random(f"blob-{seed}-{os.path.basename(path)}")
+    pattern = PLANTED_PATTERN.encode('utf-8')
+    offsets = plan_pattern_offsets(size, patterns, rng, len(pattern))
+    position = 0
+    with open(path, 'wb') as f:
+        for start in range(0, size, BLOB_CHUNK_SIZE):
+            end = min(start + BLOB_CHUNK_SIZE, size)
+            chunk = bytearray(rng.randbytes(end - start))
+            while position < len(offsets) and offsets[position] < end:
+                offset = offsets[position]
+                first = max(offset, start)
+                last = min(offset + len(pattern), end)
+                chunk[first - start:last - start] = pattern[first - offset:last - offset]
+                if offset + len(pattern) > end:
+                    # The rest of this pattern goes into the next chunk
+                    break
+                position += 1
+            f.write(chunk)
+    _set_time(path, rng)
+    return {"bytes": size, "patterns": len(offsets), "first_offset": offsets[0] if offsets else None}
+
+
+def make_ue_module(root, classes, assets, seed=0):
+    """
+    Writes a fake UE plugin holding a code module named MODULE_NAME, with
+    every spelling of the name the module renamer handles.
+
+    Returns:
+        dict: Number of files and total bytes written.
+    """
+    rng = random.Random(f"module-{seed}")
+    upper = MODULE_NAME.upper()
+    source = os.path.join(root, "Source", MODULE_NAME)
+    files = {
+        f"{MODULE_NAME}.uplugin": json.dumps({"Modules": [{"Name": MODULE_NAME, "Type": "Runtime"}]}, indent=4),
+        os.path.join(source, f"{MODULE_NAME}.Build.cs"):
+            f"public class {MODULE_NAME} : ModuleRules\n{{\n\tpublic {MODULE_NAME}(ReadOnlyTargetRules Target) "
+            f": base(Target)\n\t{{\n\t}}\n}}\n",
+        os.path.join(source, "Public", f"{MODULE_NAME}.h"):
+            f"#pragma once\n\n#include \"Modules/ModuleManager.h\"\n\n"
+            f"class F{MODULE_NAME}Module : public IModuleInterface\n{{\n}};\n",
+        os.path.join(root, "Config", f"Default{MODULE_NAME}.ini"):
+            f"[/Script/{MODULE_NAME}.Settings]\nbEnabled=True\n; {MODULE_NAME.lower()} settings\n",
+    }
+    for index in range(classes):
+        class_name = f"{MODULE_NAME}Class{index:04d}"
+        body = _text_block(rng, rng.randrange(256, 4096)).decode('utf-8')
+        files[os.path.join(source, "Public", f"{class_name}.h")] = (
+            f"#pragma once\n\n#include \"{MODULE_NAME}.h\"\n\nUCLASS()\nclass {upper}_API U{class_name} : public UObject\n"
+            f"{{\n\tGENERATED_BODY()\n}};\n\n/*\n{body}\n*/\n")
+        files[os.path.join(source, "Private", f"{class_name}.cpp")] = (
+            f"#include \"{class_name}.h\"\n\n// Part of the {MODULE_NAME.lower()} module\nDEFINE_LOG_CATEGORY_STATIC("
+            f"Log{MODULE_NAME}, Log, All);\n\n/*\n{body}\n*/\n")
+
+    written = 0
+    for relative_path, text in files.items():
+        path = os.path.join(root, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = text.encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(data)
+        _set_time(path, rng)
+        written += len(data)
+
+    # Binary assets, with the name stored as UTF-16 like the engine does
+    content = os.path.join(root, "Content")
+    os.makedirs(content, exist_ok=True)
+    for index in range(assets):
+        path = os.path.join(content, f"{MODULE_NAME}_Asset{index:03d}.uasset")
+        data = b"\xc1\x83\x2a\x9e" + MODULE_NAME.encode('utf-16-le') + rng.randbytes(rng.randrange(1024, 64 * 1024))
+        with open(path, 'wb') as f:
+            f.write(data)
+        _set_time(path, rng)
+        written += len(data)
+    return {"files": len(files) + assets, "bytes": written}
+
+
+def load_spec(root):
+    """
+    Returns:
+        dict: The spec of the corpus in root, or None if there is none.
+    """
+    try:
+        with open(os.path.join(root, SPEC_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def generate_corpus(root, profile="small", seed=0, overrides=None, force=False):
+    """
+    Generates a benchmark corpus in root.
+
+    The corpus is fully determined by the profile, the overrides and the
+    seed, which are recorded in corpus.json with what was generated.
+    Generating into a folder that already holds the same corpus does
+    nothing, unless force is set.
+
+    Args:
+        root (str): Folder to generate the corpus in.
+        profile (str): One of PROFILES.
+        seed (int): Seed of the generator.
+        overrides (dict): Profile settings to change, e.g. {"blob_size": ...}.
+        force (bool): Regenerate even if the corpus already exists.
+
+    Returns:
+        dict: The corpus spec.
+    """
+    settings = dict(PROFILES[profile], **(overrides or {}))
+    existing = load_spec(root)
+    if existing and not force and existing["settings"] == settings and existing["seed"] == seed:
+        return existing
+    if existing:
+        import shutil
+        for part in ("tree", "textures", "zips", "blobs", "module"):
+            shutil.rmtree(os.path.join(root, part), ignore_errors=True)
+
+    spec = {"profile": profile, "seed": seed, "settings": settings}
+    print("Generating directory tree...")
+    spec["tree"] = make_tree(os.path.join(root, "tree"), settings["tree_files"], settings["tree_depth"],
+                             settings["tree_fanout"], seed)
+    print("Generating textures...")
+    spec["textures"] = make_textures(os.path.join(root, "textures"), settings["texture_sizes"],
+                                     settings["texture_modes"], settings["texture_formats"], seed)
+    print("Generating zip drop...")
+    spec["zips"] = make_zip_drop(os.path.join(root, "zips"), settings["zip_archives"], settings["zip_members"],
+                                 settings["zip_member_size"], seed)
+    print("Generating blobs...")
+    os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+    spec["blobs"] = {f"blob_{index}.bin": make_blob(os.path.join(root, "blobs", f"blob_{index}.bin"),
+                                                    settings["blob_size"], settings["blob_patterns"], seed)
+                     for index in range(settings["blob_count"])}
+    print("Generating UE module...")
+    spec["module"] = make_ue_module(os.path.join(root, "module"), settings["module_classes"],
+                                    settings["module_assets"], seed)
+
+    with open(os.path.join(root, SPEC_NAME), 'w', encoding='utf-8') as f:
+        json.dump(spec, f, indent=2)
+        f.write("\n")
+    return spec
+
+
+def main(argv=None):
+    from EditImage_Tiled import parse_memory_size
+
+    parser = argparse.ArgumentParser(description="Generate a deterministic benchmark corpus.")
+    parser.add_argument("root", help="Folder to generate the corpus in")
+    parser.add_argument("--profile", choices=list(PROFILES), default="small", help="Corpus size")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generator")
+    parser.add_argument("--tree-files", type=int, help="Number of files in the directory tree")
+    parser.add_argument("--blob-size", type=parse_memory_size, help="Size of each blob, e.g. 4G")
+    parser.add_argument("--force", action="store_true", help="Regenerate even if the corpus already exists")
+    args = parser.parse_args(argv)
+
+    overrides = {}
+    if args.tree_files is not None:
+        overrides["tree_files"] = args.tree_files
+    if args.blob_size is not None:
+        overrides["blob_size"] = args.blob_size
+
+    spec = generate_corpus(args.root, args.profile, args.seed, overrides, args.force)
+    json.dump({part: spec[part] for part in ("tree", "textures", "zips", "blobs", "module")}, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
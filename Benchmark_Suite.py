@@ -0,0 +1,322 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import contextlib
+import subprocess
+from datetime import datetime
+from Benchmark_Corpus import (MODULE_NAME, PLANTED_PATTERN, PLANTED_REPLACEMENT, PROFILES, generate_corpus,
+                              load_spec)
+
+# A bench is reported as a regression when its median is this much slower than the baseline's
+DEFAULT_THRESHOLD = 0.10
+
+DEFAULT_REPEAT = 3
+
+
+@contextlib.contextmanager
+def _quiet():
+    # The scripts print every file they touch, which would dominate small benches
+    with contextlib.redirect_stdout(io.StringIO()) as out, contextlib.redirect_stderr(io.StringIO()):
+        yield out
+
+
+def _read_report(report_path):
+    with open(report_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    with _quiet() as out:
+        result = function(*args, **kwargs)
+    return time.perf_counter() - start, result, out.getvalue()
+
+
+def bench_invert_colors(corpus_root, spec, scratch, workers, run):
+    from EditImage_InvertColor import invert_colors
+
+    # A fresh copy every run, the images are edited in place
+    folder = shutil.copytree(os.path.join(corpus_root, "textures"), os.path.join(scratch, f"invert_{run}"))
+    report_path = os.path.join(scratch, f"invert_{run}.json")
+    seconds, _, _ = _timed(invert_colors, folder, workers, report_path)
+    report = _read_report(report_path)
+    if report["errors"] or report["items"] != spec["textures"]["files"]:
+        raise RuntimeError(f"invert_colors processed {report['items']} of {spec['textures']['files']} textures, "
+                           f"{report['errors']} failed")
+    return {"seconds": seconds, "items": report["items"], "bytes": report["bytes"], "stages": report["stages"]}
+
+
+def bench_adjust_lightness(corpus_root, spec, scratch, workers, run):
+    from EditImage_Brightness import adjust_lightness
+
+    folder = shutil.copytree(os.path.join(corpus_root, "textures"), os.path.join(scratch, f"lightness_{run}"))
+    report_path = os.path.join(scratch, f"lightness_{run}.json")
+    seconds, _, _ = _timed(adjust_lightness, folder, 0.2, workers, report_path)
+    report = _read_report(report_path)
+    if report["errors"] or report["items"] != spec["textures"]["files"]:
+        raise RuntimeError(f"adjust_lightness processed {report['items']} of {spec['textures']['files']} textures, "
+                           f"{report['errors']} failed")
+    return {"seconds": seconds, "items": report["items"], "bytes": report["bytes"], "stages": report["stages"]}
+
+
+def _blob_pattern(path, first_offset, length):
+    with open(path, 'rb') as f:
+        f.seek(first_offset)
+        return f.read(length).decode('utf-8', 'replace')
+
+
+def bench_replace_hex(corpus_root, spec, scratch, workers, run):
+    from ReplaceHexString import replace_hex
+
+    # Same-length patterns are patched in place, so the runs swap them back
+    # and forth instead of copying multi-GB blobs. The direction is read from
+    # the blob itself, so an interrupted run does not break the next one.
+    seconds = 0.0
+    size = 0
+    for name, blob in spec["blobs"].items():
+        path = os.path.join(corpus_root, "blobs", name)
+        current = _blob_pattern(path, blob["first_offset"], len(PLANTED_PATTERN))
+        new = PLANTED_REPLACEMENT if current == PLANTED_PATTERN else PLANTED_PATTERN
+        blob_seconds, _, output = _timed(replace_hex, path, current, new)
+        if f"Replaced {blob['patterns']} instances" not in output:
+            raise RuntimeError(f"replace_hex did not replace the {blob['patterns']} planted patterns in {name}: "
+                               f"{output.strip()}")
+        seconds += blob_seconds
+        size += blob["bytes"]
+    return {"seconds": seconds, "items": len(spec["blobs"]), "bytes": size}
+
+
+def bench_extract_zips(corpus_root, spec, scratch, workers, run):
+    from ExtractMassToFolder import extract_zips
+
+    target = os.path.join(scratch, f"extract_{run}")
+    report_path = os.path.join(scratch, f"extract_{run}.json")
+    seconds, totals, _ = _timed(extract_zips, os.path.join(corpus_root, "zips"), target, workers,
+                                report_path=report_path)
+    report = _read_report(report_path)
+    expected = spec["zips"]["members"] - (spec["zips"]["files"] - 1)
+    if totals["errors"] or totals["conflicts"] or totals["files"] != expected:
+        raise RuntimeError(f"extract_zips wrote {totals['files']} of {expected} files, "
+                           f"{len(totals['errors'])} errors, {len(totals['conflicts'])} conflicts")
+    shutil.rmtree(target)
+    return {"seconds": seconds, "items": report["items"], "bytes": report["bytes"], "stages": report["stages"]}
+
+
+def bench_list_files_by_date(corpus_root, spec, scratch, workers, run):
+    from ListFiles_WithText import list_files_by_date
+
+    seconds, files, _ = _timed(list_files_by_date, os.path.join(corpus_root, "tree"), True)
+    if len(files) != spec["tree"]["files"]:
+        raise RuntimeError(f"list_files_by_date found {len(files)} of {spec['tree']['files']} files")
+    return {"seconds": seconds, "items": len(files), "bytes": 0}
+
+
+def bench_replace_text_in_files_and_rename(corpus_root, spec, scratch, workers, run):
+    from UE_ModuleRenamer import replace_text_in_files_and_rename
+
+    folder = shutil.copytree(os.path.join(corpus_root, "module"), os.path.join(scratch, f"module_{run}"))
+    report_path = os.path.join(scratch, f"module_{run}.json")
+    seconds, (edited, plan), _ = _timed(replace_text_in_files_and_rename, folder, MODULE_NAME, "RenamedModule",
+                                        workers, report_path=report_path)
+    report = _read_report(report_path)
+    text_files = spec["module"]["files"] - spec["settings"]["module_assets"]
+    if len(edited) != text_files:
+        raise RuntimeError(f"replace_text_in_files_and_rename edited {len(edited)} of {text_files} text files")
+    return {"seconds": seconds, "items": report["items"], "bytes": report["bytes"], "stages": report["stages"]}
+
+
+BENCHES = {
+    "invert_colors": bench_invert_colors,
+    "adjust_lightness": bench_adjust_lightness,
+    "replace_hex": bench_replace_hex,
+    "extract_zips": bench_extract_zips,
+    "list_files_by_date": bench_list_files_by_date,
+    "replace_text_in_files_and_rename": bench_replace_text_in_files_and_rename,
+}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(samples):
+    """
+    Aggregates the samples of one bench.
+
+    Returns:
+        dict: Seconds of every run, min, median and mean seconds, and the
+              items/s and MB/s at the median.
+    """
+    seconds = [sample["seconds"] for sample in samples]
+    median = statistics.median(seconds)
+    last = samples[-1]
+    summary = {
+        "seconds": [round(value, 6) for value in seconds],
+        "min": round(min(seconds), 6),
+        "median": round(median, 6),
+        "mean": round(statistics.fmean(seconds), 6),
+        "items": last["items"],
+        "bytes": last["bytes"],
+        "items_per_second": round(last["items"] / median, 3) if median else None,
+        "mb_per_second": round(last["bytes"] / median / 1024 ** 2, 3) if median else None,
+    }
+    if "stages" in last:
+        summary["stages"] = last["stages"]
+    return summary
+
+
+def run_benches(corpus_root, names=None, repeat=DEFAULT_REPEAT, workers=None):
+    """
+    Runs the benches against a corpus made by Benchmark_Corpus.
+
+    Every bench runs repeat times and checks its output, so a fast but wrong
+    change fails instead of looking like a speedup. Inputs that the scripts
+    edit in place are copied to a scratch folder next to the corpus before
+    each run, outside of the timing.
+
+    Args:
+        corpus_root (str): Folder of the corpus.
+        names (list): Benches to run, default all of BENCHES.
+        repeat (int): Runs per bench.
+        workers (int): Workers passed to the scripts that take them.
+
+    Returns:
+        dict: The results, with the corpus spec and the machine they ran on.
+    """
+    # The scratch folders and the paths handed to the scripts must not depend on the working directory
+    corpus_root = os.path.abspath(corpus_root)
+    spec = load_spec(corpus_root)
+    if spec is None:
+        raise FileNotFoundError(f"No benchmark corpus in {corpus_root}, generate one with Benchmark_Corpus.py")
+
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "workers": workers,
+        "repeat": repeat,
+        "corpus": {"profile": spec["profile"], "seed": spec["seed"], "settings": spec["settings"]},
+        "benches": {},
+    }
+    for name in names or BENCHES:
+        scratch = tempfile.mkdtemp(prefix=f"bench_{name}_", dir=corpus_root)
+        try:
+            samples = []
+            for run in range(repeat):
+                samples.append(BENCHES[name](corpus_root, spec, scratch, workers, run))
+                print(f"{name:<34} run {run + 1}/{repeat}: {samples[-1]['seconds']:.3f}s", file=sys.stderr)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        results["benches"][name] = summarize(samples)
+    return results
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares the medians of two result files, bench by bench.
+
+    Returns:
+        list: (bench name, baseline median, current median, speedup, verdict)
+              tuples, verdict being "faster", "slower" (a regression),
+              "same" or "missing".
+    """
+    rows = []
+    for name in sorted(set(baseline["benches"]) | set(current["benches"])):
+        if name not in baseline["benches"] or name not in current["benches"]:
+            rows.append((name, baseline["benches"].get(name, {}).get("median"),
+                         current["benches"].get(name, {}).get("median"), None, "missing"))
+            continue
+        before = baseline["benches"][name]["median"]
+        after = current["benches"][name]["median"]
+        speedup = before / after if after else float("inf")
+        if after > before * (1 + threshold):
+            verdict = "slower"
+        elif after < before * (1 - threshold):
+            verdict = "faster"
+        else:
+            verdict = "same"
+        rows.append((name, before, after, speedup, verdict))
+    return rows
+
+
+def print_comparison(baseline, current, rows):
+    if baseline["corpus"] != current["corpus"]:
+        print("Warning: the results were measured on different corpora, the timings are not comparable")
+    print(f"Baseline: {baseline.get('commit') or '?'} ({baseline['created_at']}), "
+          f"current: {current.get('commit') or '?'} ({current['created_at']})")
+    print(f"{'Bench':<34} {'Baseline':>10} {'Current':>10} {'Speedup':>8}  Verdict")
+    print("-" * 80)
+    for name, before, after, speedup, verdict in rows:
+        before_text = f"{before:.3f}s" if before is not None else "-"
+        after_text = f"{after:.3f}s" if after is not None else "-"
+        speedup_text = f"{speedup:.2f}x" if speedup is not None else "-"
+        print(f"{name:<34} {before_text:>10} {after_text:>10} {speedup_text:>8}  {verdict}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scripts on a synthetic corpus.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate = subparsers.add_parser("generate", help="Generate a corpus (see Benchmark_Corpus.py for more options)")
+    generate.add_argument("corpus", help="Folder to generate the corpus in")
+    generate.add_argument("--profile", choices=list(PROFILES), default="small", help="Corpus size")
+    generate.add_argument("--seed", type=int, default=0, help="Seed of the generator")
+
+    run = subparsers.add_parser("run", help="Run the benches and save the results as JSON")
+    run.add_argument("corpus", help="Folder of the corpus")
+    run.add_argument("--bench", dest="benches", action="append", choices=list(BENCHES),
+                     help="Bench to run, can be repeated (default: all)")
+    run.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Runs per bench")
+    run.add_argument("--workers", type=int, default=None, help="Workers passed to the scripts")
+    run.add_argument("--output", help="Results file (default: benchmark_<date>_<time>.json)")
+    run.add_argument("--baseline", help="Compare the results against this results file")
+
+    compare = subparsers.add_parser("compare", help="Compare two results files")
+    compare.add_argument("baseline", help="Results file to compare against")
+    compare.add_argument("current", help="Results file to check")
+    for subparser in (run, compare):
+        subparser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                               help="Relative slowdown reported as a regression (default: 0.10)")
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        generate_corpus(args.corpus, args.profile, args.seed)
+        return 0
+
+    if args.command == "run":
+        results = run_benches(args.corpus, args.benches, args.repeat, args.workers)
+        output = args.output or f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        for name, summary in results["benches"].items():
+            print(f"{name:<34} median {summary['median']:.3f}s, {summary['items_per_second']} items/s, "
+                  f"{summary['mb_per_second']} MB/s")
+        print(f"Results saved to {output}")
+        if not args.baseline:
+            return 0
+        baseline, current = _read_report(args.baseline), results
+    else:
+        baseline, current = _read_report(args.baseline), _read_report(args.current)
+
+    rows = compare_results(baseline, current, args.threshold)
+    print_comparison(baseline, current, rows)
+    # A non-zero exit code lets a build pipeline fail on regressions
+    return 1 if any(verdict == "slower" for *_, verdict in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
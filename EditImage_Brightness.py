@@ -1,35 +1,240 @@
-import os
-from PIL import Image, ImageEnhance
+from PIL import Image
+from EditImage_Pipeline import run_pipeline
+from EditImage_Encoders import DEFAULT_PROFILE, build_encoder
+import functools
 
-def adjust_lightness(path, value):
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Modes whose bands are 8-bit and can go through a single Image.point pass
+EIGHT_BIT_MODES = ("L", "LA", "RGB", "RGBA")
+
+# 16-bit grayscale, loaded as I;16 or I depending on the Pillow version
+SIXTEEN_BIT_MODES = ("I;16", "I")
+
+
+def _brightness(value):
+    # Multiplies every channel, 0.0 leaves the image unchanged
+    return lambda x: x * (1 + value)
+
+
+def _lightness(value):
+    # Blends towards white for positive values and towards black for negative ones
+    if value >= 0:
+        return lambda x: x + (1 - x) * value
+    return lambda x: x * (1 + value)
+
+
+def _gamma(value):
+    return lambda x: x ** (1 / value)
+
+
+def _contrast(value):
+    # Scales the distance from mid-gray, 0.0 leaves the image unchanged
+    return lambda x: (x - 0.5) * (1 + value) + 0.5
+
+
+def _levels(value):
+    in_black, in_white, out_black, out_white = value
+    return lambda x: out_black + (x - in_black) / (in_white - in_black) * (out_white - out_black)
+
+
+# Adjustment name -> factory building a curve on normalized (0.0 to 1.0) values
+TONE_ADJUSTMENTS = {
+    "brightness": _brightness,
+    "lightness": _lightness,
+    "gamma": _gamma,
+    "contrast": _contrast,
+    "levels": _levels,
+}
+
+
+def check_tone_adjustment(name, value):
+    """
+    Checks that a tone adjustment value is in range, so a bad value fails
+    once up front instead of in every worker.
+
+    Parameters:
+    name (str): A key of TONE_ADJUSTMENTS.
+    value: The adjustment value, a float or for levels four floats.
+
+    Returns:
+    None
+    """
+    if name == "gamma" and value <= 0:
+        raise ValueError(f"gamma must be greater than 0, got {value}")
+    if name == "levels":
+        in_black, in_white, _, _ = value
+        if in_white <= in_black:
+            raise ValueError(f"levels input white ({in_white}) must be greater than input black ({in_black})")
+
+
+def _normalize_adjustments(adjustments):
+    # Lookup tables are cached, so the adjustments have to be hashable
+    normalized = []
+    for adjustment in adjustments:
+        name, value, *channels = adjustment
+        if name not in TONE_ADJUSTMENTS:
+            raise ValueError(f"Unknown tone adjustment: {name}")
+        if isinstance(value, list):
+            value = tuple(value)
+        check_tone_adjustment(name, value)
+        normalized.append((name, value, channels[0] if channels else None))
+    return tuple(normalized)
+
+
+@functools.lru_cache(maxsize=64)
+def compile_tone_tables(adjustments, bands, size=256):
+    """
+    Compiles a chain of tone adjustments into one lookup table per band.
+
+    The adjustments are merged into a single curve per band before the table
+    is sampled, so a stack of adjustments costs the same as one adjustment
+    when the table is applied. Values are clamped after every adjustment.
+    Alpha bands always get an identity table.
+
+    Parameters:
+    adjustments (tuple): Tuples (name, value, channels) where name is a key
+                         of TONE_ADJUSTMENTS and channels is a string of
+                         band names to adjust, or None for all color bands.
+    bands (tuple): Band names of the image, e.g. ("R", "G", "B", "A").
+    size (int): Number of entries per table, 256 for 8-bit or 65536 for
+                16-bit images.
+
+    Returns:
+    list: One list of `size` integers per band.
+    """
+    maximum = size - 1
+    tables = []
+    for band in bands:
+        curves = [TONE_ADJUSTMENTS[name](value) for name, value, channels in adjustments
+                  if band != "A" and (channels is None or band in channels)]
+
+        table = []
+        for index in range(size):
+            x = index / maximum
+            for curve in curves:
+                x = min(max(curve(x), 0.0), 1.0)
+            table.append(round(x * maximum))
+        tables.append(table)
+    return tables
+
+
+def adjust_image_tone(image, adjustments):
+    """
+    Applies a chain of tone adjustments to a single image in one lookup pass.
+
+    8-bit images go through a single Image.point call, palette images have
+    their palette adjusted, and 16-bit grayscale images use a 65536-entry
+    table applied with NumPy.
+
+    Parameters:
+    image (PIL.Image.Image): The image to adjust.
+    adjustments (list): Tuples (name, value) or (name, value, channels),
+                        e.g. [("lightness", 0.2), ("gamma", 1.1, "RGB")].
+
+    Returns:
+    PIL.Image.Image: The adjusted image.
+    """
+    adjustments = _normalize_adjustments(adjustments)
+
+    if image.mode in EIGHT_BIT_MODES:
+        tables = compile_tone_tables(adjustments, image.getbands())
+        return image.point([value for table in tables for value in table])
+
+    if image.mode in ("P", "PA"):
+        tables = compile_tone_tables(adjustments, ("R", "G", "B"))
+        palette = image.getpalette()
+        adjusted_image = image.copy()
+        adjusted_image.putpalette([tables[index % 3][value] for index, value in enumerate(palette)])
+        return adjusted_image
+
+    if image.mode in SIXTEEN_BIT_MODES:
+        if numpy is None:
+            raise ValueError("Adjusting 16-bit images requires numpy")
+        table = numpy.array(compile_tone_tables(adjustments, ("L",), 65536)[0], dtype=numpy.uint16)
+        pixels = numpy.clip(numpy.asarray(image), 0, 65535)
+        adjusted_image = table[pixels]
+        if image.mode == "I":
+            adjusted_image = adjusted_image.astype(numpy.int32)
+        adjusted_image = Image.fromarray(adjusted_image)
+        adjusted_image.info = image.info.copy()
+        return adjusted_image
+
+    raise ValueError(f"Unsupported image mode: {image.mode}")
+
+
+def adjust_image_lightness(image, value):
+    """
+    Adjusts the lightness of a single image by the given value.
+
+    Parameters:
+    image (PIL.Image.Image): The image to adjust.
+    value (float): Value to adjust the lightness by (-1.0 to 1.0).
+
+    Returns:
+    PIL.Image.Image: The adjusted image.
+    """
+    return adjust_image_tone(image, [("lightness", value)])
+
+
+def merge_tone_operations(operations):
+    """
+    Merges consecutive adjust_image_tone operations of a pipeline chain into
+    one, so they share a single lookup pass.
+
+    Parameters:
+    operations (list): Callables taking and returning a PIL image.
+
+    Returns:
+    list: The operations with consecutive tone adjustments merged.
+    """
+    merged = []
+    for operation in operations:
+        if merged and _is_tone_operation(operation) and _is_tone_operation(merged[-1]):
+            adjustments = tuple(merged[-1].keywords["adjustments"]) + tuple(operation.keywords["adjustments"])
+            merged[-1] = functools.partial(adjust_image_tone, adjustments=adjustments)
+        else:
+            merged.append(operation)
+    return merged
+
+
+def _is_tone_operation(operation):
+    return (isinstance(operation, functools.partial) and operation.func is adjust_image_tone
+            and "adjustments" in operation.keywords)
+
+
+def adjust_lightness(path, value, workers=None, report_path=None, max_memory=None, profile=DEFAULT_PROFILE):
     """
     Adjusts the lightness of all image files in the specified path by the given value.
 
     Parameters:
     path (str): Path to the directory containing the images.
     value (float): Value to adjust the lightness by (-1.0 to 1.0).
+    workers (int): Number of worker processes (default: CPU count).
+    report_path (str): Write a JSON run report to this path.
+    max_memory (int): Memory budget in bytes shared by all workers, larger
+                      PNGs are processed in strips. None for no limit.
+    profile (str): Encoder profile, one of EditImage_Encoders.ENCODER_PROFILES.
 
     Returns:
-    None
+    list: One result dict per processed image, see run_pipeline.
     """
-    for filename in os.listdir(path):
-        if filename.endswith(".png") or filename.endswith(".jpg") or filename.endswith(".jpeg"):
-            image_path = os.path.join(path, filename)
-            try:
-                image = Image.open(image_path)
-                lightness_enhancer = ImageEnhance.Color(image)
-                adjusted_image = lightness_enhancer.enhance(1 + value)
-                adjusted_image.save(image_path)
-                print(f"Adjusted lightness for {filename}")
-            except Exception as e:
-                print(f"Error processing {filename}: {e}")
-
-# Get the path and lightness value from the user
-path = input("Enter the path to the image directory: ")
-value = float(input("Enter the lightness adjustment value (-1.0 to 1.0): "))
-
-# Adjust the lightness of all images in the directory
-adjust_lightness(path, value)
-
-print("Press Enter to close the program...")
-input()
\ No newline at end of file
+    operation = functools.partial(adjust_image_tone, adjustments=(("lightness", value),))
+    return run_pipeline(path, [operation], workers=workers, description="Adjusted lightness for", max_memory=max_memory,
+                        encoder=build_encoder(profile), report_path=report_path)
+
+
+if __name__ == "__main__":
+    # Get the path and lightness value from the user
+    path = input("Enter the path to the image directory: ")
+    value = float(input("Enter the lightness adjustment value (-1.0 to 1.0): "))
+    report_path = input("Write a JSON run report to (or press Enter to skip): ").strip() or None
+
+    # Adjust the lightness of all images in the directory
+    adjust_lightness(path, value, report_path=report_path)
+
+    print("Press Enter to close the program...")
+    input()
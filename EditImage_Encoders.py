@@ -0,0 +1,116 @@
+import struct
+
+# Pillow save() options per profile and format. "balanced" matches Pillow's
+# defaults, "original" reuses the source file's settings (see encoder_options)
+ENCODER_PROFILES = {
+    "fast": {"PNG": {"compress_level": 1}, "JPEG": {"quality": 75}},
+    "balanced": {"PNG": {"compress_level": 6}, "JPEG": {"quality": 75}},
+    "archival": {"PNG": {"optimize": True}, "JPEG": {"quality": 95, "subsampling": "4:4:4", "optimize": True}},
+    "original": {},
+}
+
+DEFAULT_PROFILE = "balanced"
+
+JPEG_SUBSAMPLINGS = ("4:4:4", "4:2:2", "4:2:0")
+
+# zlib FLEVEL header bits -> closest compress_level
+ZLIB_LEVELS = {0: 1, 1: 3, 2: 6, 3: 9}
+
+
+def build_encoder(profile=DEFAULT_PROFILE, jpeg_quality=None, jpeg_subsampling=None):
+    """
+    Builds the encoder settings passed to the pipeline workers.
+
+    Parameters:
+    profile (str): One of the ENCODER_PROFILES names.
+    jpeg_quality (int): JPEG quality (1-95) overriding the profile.
+    jpeg_subsampling (str): JPEG chroma subsampling ("4:4:4", "4:2:2" or
+                            "4:2:0") overriding the profile.
+
+    Returns:
+    dict: The encoder settings.
+    """
+    if profile not in ENCODER_PROFILES:
+        raise ValueError(f"Unknown encoder profile: {profile}")
+
+    overrides = {}
+    if jpeg_quality is not None:
+        overrides["quality"] = jpeg_quality
+    if jpeg_subsampling is not None:
+        overrides["subsampling"] = jpeg_subsampling
+    return {"profile": profile, "overrides": {"JPEG": overrides}}
+
+
+def read_png_compress_level(image_path):
+    """
+    Guesses the compress_level a PNG was written with, from the zlib header
+    of its first IDAT chunk.
+
+    Parameters:
+    image_path (str): Path to the PNG file.
+
+    Returns:
+    int: The closest compress_level, 6 if the file has no image data.
+    """
+    with open(image_path, 'rb') as file:
+        file.read(8)
+        while True:
+            header = file.read(8)
+            if len(header) < 8:
+                return 6
+            length, chunk_type = struct.unpack(">I4s", header)
+            if chunk_type == b"IDAT":
+                zlib_header = file.read(2)
+                return ZLIB_LEVELS[zlib_header[1] >> 6] if len(zlib_header) == 2 else 6
+            file.seek(length + 4, 1)
+
+
+def _original_options(image_path, image_format, source):
+    options = {}
+    if image_format == "PNG":
+        options["compress_level"] = read_png_compress_level(image_path)
+    elif image_format == "JPEG" and source is not None:
+        from PIL import JpegImagePlugin
+        options["qtables"] = source.quantization
+        subsampling = JpegImagePlugin.get_sampling(source)
+        if subsampling != -1:
+            options["subsampling"] = subsampling
+        if source.info.get("exif"):
+            options["exif"] = source.info["exif"]
+
+    if source is not None and "dpi" in source.info:
+        options["dpi"] = source.info["dpi"]
+    return options
+
+
+def encoder_options(encoder, image_path, image_format, source=None):
+    """
+    Resolves the Pillow save() options for one image.
+
+    Parameters:
+    encoder (dict): Encoder settings from build_encoder, or None for the
+                    default profile.
+    image_path (str): Path to the source image file.
+    image_format (str): Pillow format name, e.g. "PNG" or "JPEG".
+    source (PIL.Image.Image): The source image as opened from disk, needed
+                              to keep the original JPEG settings.
+
+    Returns:
+    dict: Keyword arguments for Image.save.
+    """
+    encoder = encoder or build_encoder()
+    if encoder["profile"] == "original":
+        options = _original_options(image_path, image_format, source)
+    else:
+        options = dict(ENCODER_PROFILES[encoder["profile"]].get(image_format, {}))
+    options.update(encoder["overrides"].get(image_format, {}))
+    return options
+
+
+def png_compress_level(options):
+    """
+    Returns the zlib level matching a set of PNG save() options.
+    """
+    if "compress_level" in options:
+        return options["compress_level"]
+    return 9 if options.get("optimize") else 6
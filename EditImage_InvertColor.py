@@ -1,39 +1,158 @@
 import os
-from PIL import Image, ImageOps
+import time
+from PIL import Image
+from EditImage_Pipeline import run_pipeline, scan_images
+from EditImage_Encoders import DEFAULT_PROFILE, build_encoder
 
-def invert_colors(path):
+# 8-bit lookup tables used by Image.point: one 256-entry table per band
+INVERT_TABLE = [255 - i for i in range(256)]
+IDENTITY_TABLE = list(range(256))
+
+# Per-mode band tables, alpha bands are passed through untouched
+POINT_TABLES = {
+    "L": INVERT_TABLE,
+    "LA": INVERT_TABLE + IDENTITY_TABLE,
+    "RGB": INVERT_TABLE * 3,
+    "RGBA": INVERT_TABLE * 3 + IDENTITY_TABLE,
+}
+
+# Largest value of a 16-bit grayscale sample
+MAX_16BIT = 65535
+
+
+def invert_image(image):
+    """
+    Inverts the colors of a single image, preserving transparency.
+
+    The inversion runs on whole bands at once through Image.point, so no
+    per-pixel Python objects are created. Palette images have their palette
+    inverted instead of their pixel indices, which keeps the transparency
+    index or tRNS alpha values intact.
+
+    Parameters:
+    image (PIL.Image.Image): The image to invert.
+
+    Returns:
+    PIL.Image.Image: A new, inverted image with the same mode and info.
+    """
+    if image.mode in POINT_TABLES:
+        return image.point(POINT_TABLES[image.mode])
+
+    if image.mode == "I;16":
+        return image.point(lambda value: value * -1 + MAX_16BIT)
+
+    if image.mode == "I":
+        # Older Pillow versions load 16-bit grayscale as I. Real 32-bit data
+        # has no fixed white point, so it is rejected instead of wrapped.
+        low, high = image.getextrema()
+        if low < 0 or high > MAX_16BIT:
+            raise ValueError(f"Cannot invert 32-bit integer image with values from {low} to {high}, "
+                             f"only 16-bit data (0 to {MAX_16BIT}) is supported")
+        return image.point(lambda value: value * -1 + MAX_16BIT)
+
+    if image.mode in ("P", "PA"):
+        inverted_image = image.copy()
+        palette = image.getpalette()
+        inverted_image.putpalette([255 - value for value in palette])
+        return inverted_image
+
+    raise ValueError(f"Unsupported image mode: {image.mode}")
+
+
+def _invert_image_legacy(image):
+    """
+    Per-pixel inversion used before invert_image, kept for timing comparisons.
+    The original comprehension referenced an undefined name, so this is the
+    version it was meant to be. It only works on RGB and RGBA images.
+    """
+    inverted_image = Image.new(image.mode, image.size)
+    pixels = list(image.getdata())
+    inverted_pixels = [(255 - r, 255 - g, 255 - b, *a) for r, g, b, *a in pixels]
+    inverted_image.putdata(inverted_pixels)
+    return inverted_image
+
+
+def invert_colors(path, workers=None, report_path=None, max_memory=None, profile=DEFAULT_PROFILE):
     """
     Inverts the colors of all image files in the specified path, preserving transparency.
 
     Parameters:
     path (str): Path to the directory containing the images.
+    workers (int): Number of worker processes (default: CPU count).
+    report_path (str): Write a JSON run report to this path.
+    max_memory (int): Memory budget in bytes shared by all workers, larger
+                      PNGs are processed in strips. None for no limit.
+    profile (str): Encoder profile, one of EditImage_Encoders.ENCODER_PROFILES.
 
     Returns:
-    None
-    """
-    for filename in os.listdir(path):
-        if filename.endswith(".png") or filename.endswith(".jpg") or filename.endswith(".jpeg"):
-            image_path = os.path.join(path, filename)
-            try:
-                image = Image.open(image_path)
-                # Create a new image with the same size and mode as the original
-                inverted_image = Image.new(image.mode, image.size)
-                
-                # Invert the colors, preserving transparency
-                pixels = list(image.getdata())
-                inverted_pixels = [(255 - r, 255 - g, 255 - b, a) if len(pixel) == 4 else (255 - r, 255 - g, 255 - b) for r, g, b, *a in pixels]
-                inverted_image.putdata(inverted_pixels)
-
-                inverted_image.save(image_path)
-                print(f"Inverted colors for {filename}")
-            except Exception as e:
-                print(f"Error processing {filename}: {e}")
-
-# Get the path from the user
-path = input("Enter the path to the image directory: ")
-
-# Invert the colors of all images in the directory
-invert_colors(path)
-
-print("Press Enter to close the program...")
-input()
\ No newline at end of file
+    list: One result dict per processed image, see run_pipeline.
+    """
+    return run_pipeline(path, [invert_image], workers=workers, description="Inverted colors for", max_memory=max_memory,
+                        encoder=build_encoder(profile), report_path=report_path)
+
+
+def compare_inversion_timings(path):
+    """
+    Times the band-based inversion against the legacy per-pixel inversion for
+    every image in the specified path. Nothing is written to disk.
+
+    Parameters:
+    path (str): Path to the directory containing the images.
+
+    Returns:
+    list: A list of tuples (filename, mode, legacy_seconds, new_seconds).
+          legacy_seconds is None when the legacy code fails on that image.
+    """
+    timings = []
+
+    print(f"{'File':<40} {'Mode':<6} {'Legacy':>10} {'New':>10} {'Speedup':>9}")
+    print("-" * 80)
+
+    for image_path, _ in scan_images(path):
+        filename = os.path.basename(image_path)
+        try:
+            with Image.open(image_path) as image:
+                image.load()
+
+                start = time.perf_counter()
+                invert_image(image)
+                new_seconds = time.perf_counter() - start
+
+                try:
+                    start = time.perf_counter()
+                    _invert_image_legacy(image)
+                    legacy_seconds = time.perf_counter() - start
+                except Exception:
+                    legacy_seconds = None
+
+                mode = image.mode
+        except Exception as e:
+            print(f"Error processing {filename}: {e}")
+            continue
+
+        timings.append((filename, mode, legacy_seconds, new_seconds))
+
+        if legacy_seconds is None:
+            print(f"{filename:<40} {mode:<6} {'failed':>10} {new_seconds:>9.3f}s {'-':>9}")
+        else:
+            speedup = legacy_seconds / new_seconds if new_seconds else float("inf")
+            print(f"{filename:<40} {mode:<6} {legacy_seconds:>9.3f}s {new_seconds:>9.3f}s {speedup:>8.1f}x")
+
+    return timings
+
+
+if __name__ == "__main__":
+    # Get the path from the user
+    path = input("Enter the path to the image directory: ")
+
+    if input("Compare timings against the legacy implementation first? (y/n): ").strip().lower() == 'y':
+        compare_inversion_timings(path)
+        print()
+
+    report_path = input("Write a JSON run report to (or press Enter to skip): ").strip() or None
+
+    # Invert the colors of all images in the directory
+    invert_colors(path, report_path=report_path)
+
+    print("Press Enter to close the program...")
+    input()
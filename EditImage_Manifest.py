@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import functools
+from _FileUtils import file_sha256, write_atomic
+
+MANIFEST_NAME = ".editimage_manifest.jsonl"
+
+
+def _qualified_name(func):
+    module = func.__module__
+    if module == "__main__":
+        # A script run directly records its operations under its file name,
+        # so the chain matches runs that import the script as a module
+        module = os.path.splitext(os.path.basename(sys.modules["__main__"].__file__))[0]
+    return f"{module}.{func.__qualname__}"
+
+
+def describe_operations(operations):
+    """
+    Builds a stable description of an operation chain, used to tell whether
+    a file has already been processed by exactly the same chain.
+
+    Parameters:
+    operations (list): Callables taking and returning a PIL image.
+
+    Returns:
+    str: The chain description, e.g. "EditImage_InvertColor.invert_image".
+    """
+    descriptions = []
+    for operation in operations:
+        if isinstance(operation, functools.partial):
+            arguments = [repr(argument) for argument in operation.args]
+            arguments += [f"{key}={value!r}" for key, value in sorted(operation.keywords.items())]
+            descriptions.append(f"{_qualified_name(operation.func)}({', '.join(arguments)})")
+        else:
+            descriptions.append(_qualified_name(operation))
+    return " | ".join(descriptions)
+
+
+class ImageManifest:
+    """
+    Sidecar manifest recording which operation chain has been applied to
+    each image in a directory.
+
+    Entries are keyed by filename and store the size, mtime and SHA-256 of
+    the file as it was written. The manifest is an append-only JSON lines
+    file: each processed image appends one line right away, so a crash
+    loses at most the file that was being written. Later lines win when the
+    manifest is loaded, and compact() rewrites it with one line per file.
+    """
+
+    def __init__(self, directory):
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        self.entries = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                    self.entries[entry["name"]] = entry
+                except (ValueError, KeyError, TypeError):
+                    # A crash can leave a truncated last line behind
+                    continue
+
+    def is_up_to_date(self, image_path, stat, chain):
+        """
+        Checks whether an image already went through the given chain and has
+        not changed since.
+
+        A matching size and mtime is trusted without reading the file. When
+        only the mtime differs, the contents are hashed and compared with the
+        recorded hash, so touched or re-copied files are not processed twice.
+
+        Parameters:
+        image_path (str): Path to the image file.
+        stat (os.stat_result): The current stat of the image file.
+        chain (str): The operation chain description.
+
+        Returns:
+        bool: True if the image can be skipped.
+        """
+        entry = self.entries.get(os.path.basename(image_path))
+        if entry is None or entry["chain"] != chain or entry["size"] != stat.st_size:
+            return False
+        if entry["mtime_ns"] == stat.st_mtime_ns:
+            return True
+        if file_sha256(image_path) == entry["sha256"]:
+            self.record(image_path, stat.st_size, stat.st_mtime_ns, entry["sha256"], chain)
+            return True
+        return False
+
+    def record(self, image_path, size, mtime_ns, sha256, chain):
+        """
+        Records that an image was written after applying the given chain.
+
+        Parameters:
+        image_path (str): Path to the image file.
+        size (int): Size of the written file in bytes.
+        mtime_ns (int): Modification time of the written file.
+        sha256 (str): Hex SHA-256 digest of the written file.
+        chain (str): The operation chain description.
+
+        Returns:
+        None
+        """
+        entry = {"name": os.path.basename(image_path), "size": size, "mtime_ns": mtime_ns,
+                 "sha256": sha256, "chain": chain}
+        self.entries[entry["name"]] = entry
+        with open(self.manifest_path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(entry) + "\n")
+
+    def compact(self):
+        """
+        Rewrites the manifest with a single line per file.
+        """
+        lines = "".join(json.dumps(entry) + "\n" for entry in self.entries.values())
+        write_atomic(self.manifest_path, lines.encode('utf-8'))
@@ -0,0 +1,321 @@
+import os
+import io
+import time
+import hashlib
+import argparse
+import functools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PIL import Image
+from _Progress import ProgressRenderer, RunMetrics
+from _FileUtils import write_atomic
+from EditImage_Manifest import ImageManifest, describe_operations
+from EditImage_Tiled import estimate_image_memory, parse_memory_size, process_png_tiled
+from EditImage_Encoders import (ENCODER_PROFILES, DEFAULT_PROFILE, JPEG_SUBSAMPLINGS, build_encoder,
+                                encoder_options, png_compress_level)
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+STAGES = ("decode", "transform", "encode", "write")
+
+
+def scan_images(path):
+    """
+    Lists all image files in the specified path with a single directory scan.
+
+    Parameters:
+    path (str): Path to the directory containing the images.
+
+    Returns:
+    list: A list of tuples (image_path, stat_result), sorted by path.
+    """
+    images = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file():
+                images.append((entry.path, entry.stat()))
+    return sorted(images)
+
+
+def apply_operations(image, operations):
+    """
+    Applies a chain of operations to an image, in order.
+
+    Parameters:
+    image (PIL.Image.Image): The image to transform.
+    operations (list): Callables taking and returning a PIL image.
+
+    Returns:
+    PIL.Image.Image: The transformed image.
+    """
+    for operation in operations:
+        image = operation(image)
+    return image
+
+
+def process_image(image_path, operations, max_memory=None, encoder=None):
+    """
+    Decodes an image once, applies the whole operation chain and encodes it
+    back in place. The encoded image is swapped in atomically, so a crash
+    never leaves a half-written file behind.
+
+    When the image would not fit in max_memory in one piece, it is processed
+    in strips instead (PNG only), see EditImage_Tiled.
+
+    Parameters:
+    image_path (str): Path to the image file.
+    operations (list): Callables taking and returning a PIL image.
+    max_memory (int): Memory budget in bytes, or None for no limit.
+    encoder (dict): Encoder settings from EditImage_Encoders.build_encoder,
+                    or None for the default profile.
+
+    Returns:
+    dict: Timings in seconds for the decode, transform, encode and write
+          stages, the size, mtime and SHA-256 of the written file, plus an
+          "error" message when the image could not be processed.
+    """
+    result = {"path": image_path, "error": None}
+    result.update((stage, 0.0) for stage in STAGES)
+    try:
+        image_format = Image.registered_extensions()[os.path.splitext(image_path)[1].lower()]
+
+        if max_memory is not None and estimate_image_memory(image_path) > max_memory:
+            if image_format != "PNG":
+                raise ValueError(f"{image_format} image does not fit in the memory budget and only PNGs can be tiled")
+            options = encoder_options(encoder, image_path, image_format)
+            return process_png_tiled(image_path, operations, max_memory, result, png_compress_level(options))
+
+        start = time.perf_counter()
+        with Image.open(image_path) as image:
+            image.load()
+            result["decode"] = time.perf_counter() - start
+            options = encoder_options(encoder, image_path, image_format, image)
+
+            start = time.perf_counter()
+            processed_image = apply_operations(image, operations)
+            result["transform"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        buffer = io.BytesIO()
+        processed_image.save(buffer, format=image_format, **options)
+        data = buffer.getvalue()
+        result["encode"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        write_atomic(image_path, data)
+        result["write"] = time.perf_counter() - start
+
+        stat = os.stat(image_path)
+        result["size"] = stat.st_size
+        result["mtime_ns"] = stat.st_mtime_ns
+        result["sha256"] = hashlib.sha256(data).hexdigest()
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def run_pipeline(path, operations, workers=None, description="Processed", use_manifest=True, force=False,
+                 max_memory=None, encoder=None, report_path=None):
+    """
+    Applies a chain of operations to every image in the specified path,
+    spreading the files across a process pool.
+
+    Each image goes through a single decode/encode round trip no matter how
+    many operations are chained. Operations must be picklable (module-level
+    functions or functools.partial objects wrapping them).
+
+    Unless use_manifest is False, a sidecar manifest records the chain
+    applied to every written file. Files that already went through the same
+    chain and have not changed since are skipped after a stat, so reruns
+    only process new or changed images.
+
+    Parameters:
+    path (str): Path to the directory containing the images.
+    operations (list): Callables taking and returning a PIL image.
+    workers (int): Number of worker processes. Defaults to the CPU count,
+                   1 processes the images in the current process.
+    description (str): Verb printed in front of every processed file.
+    use_manifest (bool): Whether to skip unchanged files and record the
+                         processed ones in the sidecar manifest.
+    force (bool): Process every file even if the manifest says it is done.
+    max_memory (int): Memory budget in bytes shared by all workers, or None
+                      for no limit. Images that do not fit in their worker's
+                      share are processed in strips.
+    encoder (dict): Encoder settings from EditImage_Encoders.build_encoder,
+                    or None for the default profile.
+    report_path (str): Write a JSON run report (throughput, stage timings,
+                       failed images) to this path.
+
+    Returns:
+    list: One result dict per processed image, as returned by process_image.
+    """
+    metrics = RunMetrics("image pipeline")
+    with metrics.stage("scan"):
+        images = scan_images(path)
+    chain = describe_operations(operations)
+    manifest = ImageManifest(path) if use_manifest else None
+
+    if manifest and not force:
+        pending = [(image_path, stat) for image_path, stat in images
+                   if not manifest.is_up_to_date(image_path, stat, chain)]
+    else:
+        pending = images
+    skipped = len(images) - len(pending)
+    metrics.total = len(pending)
+    sizes = {image_path: stat.st_size for image_path, stat in pending}
+    workers = workers or os.cpu_count() or 1
+    worker_memory = max_memory // workers if max_memory else None
+    results = []
+
+    def finish(result):
+        metrics.log(_describe_image(result, sizes[result["path"]], description))
+        for stage in STAGES:
+            metrics.add_stage_time(stage, result[stage])
+        if result["error"]:
+            metrics.errors.add()
+        else:
+            metrics.items.add()
+            metrics.bytes.add(sizes[result["path"]])
+        if manifest and not result["error"]:
+            manifest.record(result["path"], result["size"], result["mtime_ns"], result["sha256"], chain)
+        results.append(result)
+
+    with ProgressRenderer(metrics):
+        if workers == 1 or len(pending) <= 1:
+            for image_path, _ in pending:
+                finish(process_image(image_path, operations, worker_memory, encoder))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(process_image, image_path, operations, worker_memory, encoder) for image_path, _ in pending]
+                for future in as_completed(futures):
+                    finish(future.result())
+
+    if manifest and results:
+        manifest.compact()
+    metrics.finish()
+    elapsed = metrics.elapsed
+
+    if skipped:
+        print(f"Skipped {skipped} images already processed with the same operations")
+    _report_totals(results, sizes, elapsed, workers, (encoder or build_encoder())["profile"])
+
+    if report_path:
+        metrics.details.update(skipped=skipped, workers=workers, profile=(encoder or build_encoder())["profile"],
+                               failed={result["path"]: result["error"] for result in results if result["error"]})
+        metrics.write_report(report_path)
+    return results
+
+
+def _describe_image(result, size, description):
+    filename = os.path.basename(result["path"])
+    if result["error"]:
+        return f"Error processing {filename}: {result['error']}"
+
+    seconds = sum(result[stage] for stage in STAGES)
+    megabytes = size / (1024 * 1024)
+    throughput = megabytes / seconds if seconds else 0.0
+    stages = ", ".join(f"{stage} {result[stage] * 1000:.0f}" for stage in STAGES)
+    return f"{description} {filename} ({megabytes:.1f} MB in {seconds * 1000:.0f} ms, {throughput:.1f} MB/s; {stages} ms)"
+
+
+def _report_totals(results, sizes, elapsed, workers, profile):
+    processed = [result for result in results if not result["error"]]
+    megabytes = sum(sizes[result["path"]] for result in processed) / (1024 * 1024)
+    failed = len(results) - len(processed)
+
+    print("-" * 80)
+    print(f"Processed {len(processed)} images ({megabytes:.1f} MB) in {elapsed:.2f}s using {workers} worker(s), "
+          f"{profile} encoder profile")
+    if elapsed:
+        print(f"Throughput: {len(processed) / elapsed:.1f} images/s, {megabytes / elapsed:.1f} MB/s")
+    for stage in STAGES:
+        print(f"  {stage:<10} {sum(result[stage] for result in processed):.2f}s total")
+    if failed:
+        print(f"Failed: {failed} images")
+
+
+def parse_operation(spec):
+    """
+    Turns an operation spec from the command line into a pipeline operation.
+
+    Supported specs:
+        invert            Invert the colors, preserving transparency.
+        lightness=VALUE   Adjust the lightness by VALUE (-1.0 to 1.0).
+        brightness=VALUE  Scale every channel by 1 + VALUE.
+        contrast=VALUE    Scale the distance from mid-gray by 1 + VALUE.
+        gamma=VALUE       Apply a gamma curve, values above 1.0 brighten.
+        levels=IN_BLACK,IN_WHITE,OUT_BLACK,OUT_WHITE
+                          Remap the input range to the output range (0.0 to 1.0).
+
+    Parameters:
+    spec (str): The operation spec.
+
+    Returns:
+    callable: A picklable callable taking and returning a PIL image.
+    """
+    name, _, argument = spec.partition("=")
+    name = name.strip().lower()
+
+    if name == "invert":
+        from EditImage_InvertColor import invert_image
+        return invert_image
+    if name in ("lightness", "brightness", "contrast", "gamma", "levels"):
+        from EditImage_Brightness import adjust_image_tone, check_tone_adjustment
+        try:
+            value = tuple(float(part) for part in argument.split(","))
+        except ValueError:
+            raise ValueError(f"{name} needs numeric values: {spec}") from None
+        if name != "levels" and len(value) == 1:
+            value = value[0]
+        elif name != "levels" or len(value) != 4:
+            raise ValueError(f"{name} needs {'four values' if name == 'levels' else 'one value'}: {spec}")
+        check_tone_adjustment(name, value)
+        return functools.partial(adjust_image_tone, adjustments=((name, value),))
+
+    raise ValueError(f"Unknown operation: {spec}")
+
+
+def parse_operations(specs):
+    """
+    Turns a list of operation specs into a pipeline chain. Consecutive tone
+    adjustments are merged so they are applied in a single lookup pass.
+
+    Parameters:
+    specs (list): Operation specs, see parse_operation.
+
+    Returns:
+    list: Picklable callables taking and returning a PIL image.
+    """
+    from EditImage_Brightness import merge_tone_operations
+    return merge_tone_operations([parse_operation(spec) for spec in specs])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply a chain of image operations to every image in a folder.")
+    parser.add_argument("path", help="Path to the image directory")
+    parser.add_argument("--op", dest="operations", action="append", required=True,
+                        help="Operation to apply, in order (invert, lightness=VALUE, gamma=VALUE, ...). Can be repeated.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Process every image, even ones the manifest marks as done")
+    parser.add_argument("--no-manifest", action="store_true", help="Neither read nor write the sidecar manifest")
+    parser.add_argument("--max-memory", type=parse_memory_size, default=None,
+                        help="Memory budget shared by all workers, e.g. 2G. Larger PNGs are processed in strips.")
+    parser.add_argument("--profile", choices=list(ENCODER_PROFILES), default=DEFAULT_PROFILE,
+                        help="Encoder profile: fast (low PNG compression), balanced (Pillow defaults), "
+                             "archival (maximum compression) or original (keep the source's settings)")
+    parser.add_argument("--jpeg-quality", type=int, default=None, help="JPEG quality (1-95), overrides the profile")
+    parser.add_argument("--jpeg-subsampling", choices=JPEG_SUBSAMPLINGS, default=None,
+                        help="JPEG chroma subsampling, overrides the profile")
+    parser.add_argument("--report", help="Write a JSON run report to this path")
+    args = parser.parse_args()
+
+    try:
+        operations = parse_operations(args.operations)
+    except ValueError as e:
+        parser.error(str(e))
+    encoder = build_encoder(args.profile, args.jpeg_quality, args.jpeg_subsampling)
+    run_pipeline(args.path, operations, workers=args.workers, use_manifest=not args.no_manifest, force=args.force,
+                 max_memory=args.max_memory, encoder=encoder, report_path=args.report)
+
+
+if __name__ == "__main__":
+    main()
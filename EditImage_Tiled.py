@@ -0,0 +1,379 @@
+import io
+import os
+import sys
+import time
+import zlib
+import struct
+import hashlib
+import tempfile
+from PIL import Image
+from _FileUtils import atomic_output
+from _Progress import peak_rss_bytes
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Largest piece of compressed data read from the source file at once
+READ_SIZE = 1024 * 1024
+
+# (color type, bit depth) -> (bytes per pixel, Pillow raw mode of a PNG row)
+PNG_LAYOUTS = {
+    (0, 8): (1, "L"),
+    (0, 16): (2, "I;16B"),
+    (2, 8): (3, "RGB"),
+    (3, 8): (1, "P"),
+    (4, 8): (2, "LA"),
+    (6, 8): (4, "RGBA"),
+}
+
+# Copies of a strip alive at once: the filtered rows, the in-memory PNG, the
+# decoded and transformed strips and the re-filtered output rows, plus the
+# allocator's slack
+STRIP_COPIES = 10
+
+# Copies of a whole image alive at once when it is not tiled: the decoded
+# image, the transformed image and the encoded output
+IMAGE_COPIES = 3
+
+MEMORY_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_memory_size(text):
+    """
+    Parses a memory size such as "512M", "2G" or "1048576".
+
+    Parameters:
+    text (str): The size, in bytes or with a K, M or G suffix.
+
+    Returns:
+    int: The size in bytes.
+    """
+    text = text.strip().upper().rstrip("B")
+    if text and text[-1] in MEMORY_UNITS:
+        return int(float(text[:-1]) * MEMORY_UNITS[text[-1]])
+    return int(text)
+
+
+def _chunk(chunk_type, data):
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+
+class PngStripReader:
+    """
+    Decodes a non-interlaced PNG strip by strip.
+
+    The IDAT stream is inflated incrementally, and every strip of filtered
+    rows is unfiltered by Pillow through a small in-memory PNG. That PNG
+    starts with the last unfiltered row of the previous strip (stored with
+    filter type 0), so the filters of the strip's first row see the correct
+    previous row. Only one strip is held in memory at a time.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        if file.read(8) != PNG_SIGNATURE:
+            raise ValueError("Not a PNG file")
+
+        self.chunks = []
+        while True:
+            length, chunk_type = struct.unpack(">I4s", file.read(8))
+            if chunk_type == b"IDAT":
+                self._idat_length = length
+                break
+            data = file.read(length)
+            file.read(4)
+            if chunk_type == b"IHDR":
+                self.width, self.height, self.bit_depth, self.color_type, _, _, interlace = struct.unpack(">IIBBBBB", data)
+            elif chunk_type == b"IEND":
+                raise ValueError("PNG has no image data")
+            else:
+                self.chunks.append((chunk_type, data))
+
+        if interlace:
+            raise ValueError("Interlaced PNGs cannot be processed in tiles")
+        if (self.color_type, self.bit_depth) not in PNG_LAYOUTS:
+            raise ValueError(f"Unsupported PNG layout for tiling (color type {self.color_type}, {self.bit_depth}-bit)")
+
+        bytes_per_pixel, self.rawmode = PNG_LAYOUTS[(self.color_type, self.bit_depth)]
+        self.row_bytes = self.width * bytes_per_pixel
+        self.trailing_chunks = []
+
+    def _iter_idat_data(self):
+        length = self._idat_length
+        while True:
+            while length:
+                data = self.file.read(min(length, READ_SIZE))
+                if not data:
+                    raise ValueError("Truncated PNG")
+                length -= len(data)
+                yield data
+            self.file.read(4)
+
+            length, chunk_type = struct.unpack(">I4s", self.file.read(8))
+            if chunk_type != b"IDAT":
+                break
+
+        # Keep the chunks stored after the image data, e.g. text or time stamps
+        while chunk_type != b"IEND":
+            self.trailing_chunks.append((chunk_type, self.file.read(length)))
+            self.file.read(4)
+            length, chunk_type = struct.unpack(">I4s", self.file.read(8))
+
+    def _iter_filtered_strips(self, strip_bytes):
+        decompressor = zlib.decompressobj()
+        buffer = bytearray()
+        for data in self._iter_idat_data():
+            while data:
+                buffer += decompressor.decompress(data, strip_bytes)
+                data = decompressor.unconsumed_tail
+                while len(buffer) >= strip_bytes:
+                    yield bytes(buffer[:strip_bytes])
+                    del buffer[:strip_bytes]
+        buffer += decompressor.flush()
+        if buffer:
+            yield bytes(buffer)
+
+    def iter_strips(self, rows_per_strip):
+        """
+        Yields the image as a sequence of horizontal strips.
+
+        Parameters:
+        rows_per_strip (int): Number of rows per strip, the last strip may
+                              be shorter.
+
+        Yields:
+        PIL.Image.Image: The decoded strips, from top to bottom.
+        """
+        palette_chunks = b"".join(_chunk(chunk_type, data) for chunk_type, data in self.chunks
+                                  if chunk_type in (b"PLTE", b"tRNS"))
+        previous_row = bytes(self.row_bytes)
+
+        for filtered in self._iter_filtered_strips(rows_per_strip * (self.row_bytes + 1)):
+            rows = len(filtered) // (self.row_bytes + 1)
+            header = struct.pack(">IIBBBBB", self.width, rows + 1, self.bit_depth, self.color_type, 0, 0, 0)
+            image_data = zlib.compress(b"\x00" + previous_row + filtered, 0)
+            del filtered
+            png = b"".join((PNG_SIGNATURE, _chunk(b"IHDR", header), palette_chunks,
+                            _chunk(b"IDAT", image_data), _chunk(b"IEND", b"")))
+            del image_data
+
+            with Image.open(io.BytesIO(png)) as image:
+                image.load()
+                previous_row = image.crop((0, rows, self.width, rows + 1)).tobytes("raw", self.rawmode)
+                strip = image.crop((0, 1, self.width, rows + 1))
+            del png
+            yield strip
+
+
+class PngStripWriter:
+    """
+    Encodes a PNG strip by strip, compressing the rows as they arrive.
+
+    Rows are written with filter type 0, so every strip can be encoded
+    without looking at the previous one. The SHA-256 of everything written
+    is kept in `digest`.
+    """
+
+    def __init__(self, file, width, height, bit_depth, color_type, chunks=(), compress_level=6):
+        self.file = file
+        self.header = struct.pack(">IIBBBBB", width, height, bit_depth, color_type, 0, 0, 0)
+        self.chunks = chunks
+        bytes_per_pixel, self.rawmode = PNG_LAYOUTS[(color_type, bit_depth)]
+        self.row_bytes = width * bytes_per_pixel
+        self.compressor = zlib.compressobj(compress_level)
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self._started = False
+
+    def _write(self, data):
+        self.file.write(data)
+        self.digest.update(data)
+        self.size += len(data)
+
+    def _start(self, first_strip):
+        self._write(PNG_SIGNATURE + _chunk(b"IHDR", self.header))
+        for chunk_type, data in self.chunks:
+            if chunk_type == b"PLTE":
+                # Palette operations change the palette, not the pixel indices
+                data = bytes(first_strip.getpalette()[:len(data)])
+            self._write(_chunk(chunk_type, data))
+        self._started = True
+
+    def write_strip(self, strip):
+        """
+        Appends a strip below the strips written so far.
+
+        Parameters:
+        strip (PIL.Image.Image): The strip, in the same mode as the source.
+
+        Returns:
+        None
+        """
+        if not self._started:
+            self._start(strip)
+
+        data = strip.tobytes("raw", self.rawmode)
+        row_bytes = self.row_bytes
+        filtered = b"".join(b"\x00" + data[offset:offset + row_bytes] for offset in range(0, len(data), row_bytes))
+        del data
+
+        compressed = self.compressor.compress(filtered)
+        if compressed:
+            self._write(_chunk(b"IDAT", compressed))
+
+    def close(self, trailing_chunks=()):
+        """
+        Finishes the image data and writes the trailing chunks and IEND.
+        """
+        compressed = self.compressor.flush()
+        if compressed:
+            self._write(_chunk(b"IDAT", compressed))
+        for chunk_type, data in trailing_chunks:
+            self._write(_chunk(chunk_type, data))
+        self._write(_chunk(b"IEND", b""))
+
+
+def estimate_image_memory(image_path):
+    """
+    Estimates the peak memory needed to process an image in one piece,
+    without decoding it.
+
+    Parameters:
+    image_path (str): Path to the image file.
+
+    Returns:
+    int: The estimated number of bytes.
+    """
+    with open(image_path, 'rb') as file:
+        if file.read(8) == PNG_SIGNATURE:
+            file.read(8)
+            width, height, bit_depth, color_type = struct.unpack(">IIBB", file.read(10))
+            channels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}.get(color_type, 4)
+            return width * height * channels * max(bit_depth // 8, 1) * IMAGE_COPIES
+
+    with Image.open(image_path) as image:
+        bytes_per_band = {"I;16": 2, "I": 4, "F": 4}.get(image.mode, 1)
+        return image.width * image.height * len(image.getbands()) * bytes_per_band * IMAGE_COPIES
+
+
+def process_png_tiled(image_path, operations, max_memory, result, compress_level=6):
+    """
+    Applies a chain of operations to a PNG in place, strip by strip, so peak
+    memory is bounded by max_memory instead of by the image size.
+
+    Only per-pixel operations (such as invert or the tone adjustments) give
+    the same result in tiles as on the whole image.
+
+    Parameters:
+    image_path (str): Path to the PNG file.
+    operations (list): Callables taking and returning a PIL image.
+    max_memory (int): Memory budget in bytes.
+    result (dict): Result dict updated with the decode, transform and
+                   encode timings and the size, mtime and SHA-256 of the
+                   written file. Writing is interleaved with encoding and
+                   counted as encode time.
+    compress_level (int): zlib level of the written image data.
+
+    Returns:
+    dict: The result dict.
+    """
+    # The source must be closed before atomic_output replaces it, Windows does not allow replacing an open file
+    with atomic_output(image_path) as output:
+        with open(image_path, 'rb') as source:
+            reader = PngStripReader(source)
+            writer = PngStripWriter(output, reader.width, reader.height, reader.bit_depth, reader.color_type,
+                                    reader.chunks, compress_level)
+            rows_per_strip = max(1, max_memory // ((reader.row_bytes + 1) * STRIP_COPIES))
+
+            strips = reader.iter_strips(rows_per_strip)
+            while True:
+                start = time.perf_counter()
+                strip = next(strips, None)
+                result["decode"] += time.perf_counter() - start
+                if strip is None:
+                    break
+
+                start = time.perf_counter()
+                for operation in operations:
+                    strip = operation(strip)
+                result["transform"] += time.perf_counter() - start
+
+                start = time.perf_counter()
+                writer.write_strip(strip)
+                result["encode"] += time.perf_counter() - start
+                del strip
+
+            start = time.perf_counter()
+            writer.close(reader.trailing_chunks)
+            result["encode"] += time.perf_counter() - start
+
+    stat = os.stat(image_path)
+    result["size"] = stat.st_size
+    result["mtime_ns"] = stat.st_mtime_ns
+    result["sha256"] = writer.digest.hexdigest()
+    return result
+
+
+def write_synthetic_png(image_path, width, height, rows_per_strip=256):
+    """
+    Writes a deterministic RGBA gradient PNG of any size, strip by strip.
+
+    Parameters:
+    image_path (str): Path to the PNG file to write.
+    width (int): Image width in pixels.
+    height (int): Image height in pixels.
+    rows_per_strip (int): Rows generated at once.
+
+    Returns:
+    None
+    """
+    row_bytes = width * 4
+    pattern = bytes(range(256)) * (row_bytes // 256 + 2)
+
+    with open(image_path, 'wb') as file:
+        writer = PngStripWriter(file, width, height, 8, 6, compress_level=1)
+        for top in range(0, height, rows_per_strip):
+            rows = min(rows_per_strip, height - top)
+            data = b"".join(pattern[(top + row) % 256:(top + row) % 256 + row_bytes] for row in range(rows))
+            writer.write_strip(Image.frombytes("RGBA", (width, rows), data))
+        writer.close()
+
+
+def check_memory_ceiling(size=16384, max_memory=256 * 1024 ** 2, ceiling=512 * 1024 ** 2):
+    """
+    Inverts a synthetic size x size RGBA PNG in tiles and checks that the
+    peak RSS of the process stayed under the ceiling. The image is 1 GiB
+    decoded at the default size, so processing it in one piece would blow
+    well past the ceiling.
+
+    Parameters:
+    size (int): Width and height of the synthetic image.
+    max_memory (int): Memory budget passed to the tiled processing.
+    ceiling (int): Largest acceptable peak RSS in bytes.
+
+    Returns:
+    bool: True if the peak RSS stayed under the ceiling.
+    """
+    from EditImage_InvertColor import invert_image
+
+    with tempfile.TemporaryDirectory() as directory:
+        image_path = os.path.join(directory, "synthetic.png")
+        print(f"Writing a synthetic {size}x{size} RGBA PNG...")
+        write_synthetic_png(image_path, size, size)
+
+        print(f"Inverting it in tiles with a {max_memory / 1024 ** 2:.0f} MB budget...")
+        start = time.perf_counter()
+        result = {"decode": 0.0, "transform": 0.0, "encode": 0.0, "write": 0.0}
+        process_png_tiled(image_path, [invert_image], max_memory, result, compress_level=1)
+        elapsed = time.perf_counter() - start
+
+    peak = peak_rss_bytes()
+    passed = peak <= ceiling
+    print(f"Processed in {elapsed:.1f}s (decode {result['decode']:.1f}s, transform {result['transform']:.1f}s, "
+          f"encode {result['encode']:.1f}s)")
+    print(f"Peak RSS: {peak / 1024 ** 2:.0f} MB (ceiling {ceiling / 1024 ** 2:.0f} MB) - {'OK' if passed else 'FAILED'}")
+    return passed
+
+
+if __name__ == "__main__":
+    # Running this module directly checks the memory ceiling of tiled processing
+    sys.exit(0 if check_memory_ceiling() else 1)
@@ -1,37 +1,389 @@
+import io
 import os
+import json
+import time
+import zlib
+import shutil
 import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from _FileUtils import write_atomic
+from _Progress import ProgressRenderer, RunMetrics
 
-def extract_zips(folder_path):
+# Members of one archive are handed to the workers in batches of about this
+# many uncompressed bytes, so a big archive is spread over several workers
+BATCH_SIZE = 64 * 1024 * 1024
+
+# Nested zips up to this size are read into memory to be opened, bigger
+# ones are read straight from the compressed stream of the outer zip
+NESTED_IN_MEMORY = 256 * 1024 * 1024
+
+COPY_SIZE = 1024 * 1024
+
+# Characters zipfile replaces in member names on Windows
+WINDOWS_ILLEGAL = str.maketrans(':<>|"?*', '_______')
+
+# Folder, inside the extraction subfolder, holding one manifest per archive
+MANIFEST_DIR = ".extract_manifests"
+
+
+def member_path(target_path, member_name):
+    """
+    Returns where a zip member is extracted to, sanitized like
+    ZipFile.extract does: absolute paths, drive letters and '..' parts are
+    dropped, so nothing can be written outside of target_path.
+    """
+    arcname = member_name.replace('/', os.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    invalid = ('', os.curdir, os.pardir)
+    parts = [part for part in arcname.split(os.sep) if part not in invalid]
+    if os.sep == '\\':
+        parts = [part.translate(WINDOWS_ILLEGAL).rstrip('.') for part in parts]
+        parts = [part for part in parts if part not in invalid]
+    return os.path.join(target_path, *parts)
+
+
+def manifest_path(target_path, zip_path):
+    return os.path.join(target_path, MANIFEST_DIR, os.path.basename(zip_path) + ".json")
+
+
+def load_archive_manifest(file_path):
+    """
+    Loads the manifest of an archive, written by an earlier extraction.
+
+    Returns:
+    dict: Member name -> [size, CRC32, date_time, mtime_ns of the extracted
+          file (None for nested zips)], empty if there is no usable manifest.
+    """
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            return json.load(file)["members"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+def save_archive_manifest(file_path, zip_path, members):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    data = {"archive": os.path.basename(zip_path), "members": members}
+    write_atomic(file_path, json.dumps(data, indent=1).encode('utf-8'))
+
+
+def member_signature(info):
+    return [info.file_size, info.CRC, list(info.date_time)]
+
+
+def file_crc32(file_path):
+    crc = 0
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(COPY_SIZE), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def _is_nested_zip(info, nested):
+    return nested and not info.is_dir() and info.filename.lower().endswith(".zip")
+
+
+def unchanged_record(info, path, entry, nested=False):
+    """
+    Checks whether a member is already extracted at path.
+
+    A member recorded in the archive's manifest with the same size, CRC32
+    and date is unchanged as long as the file on disk still has the size
+    and mtime it was given when it was extracted, so no file is read. Other
+    files of the right size are read once, and match if their CRC32 does.
+
+    Parameters:
+    info (zipfile.ZipInfo): The member.
+    path (str): Where the member is extracted to.
+    entry (list): The member's record in the manifest, or None.
+    nested (bool): Whether nested zips are extracted to folders.
+
+    Returns:
+    list: The manifest record of the member if it is unchanged, else None.
+    """
+    signature = member_signature(info)
+    if _is_nested_zip(info, nested):
+        if entry and entry[:3] == signature and os.path.isdir(os.path.splitext(path)[0]):
+            return entry
+        return None
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    if stat.st_size != info.file_size:
+        return None
+    if entry and entry[:3] == signature and entry[3] == stat.st_mtime_ns:
+        return entry
+    if file_crc32(path) == info.CRC:
+        return signature + [stat.st_mtime_ns]
+    return None
+
+
+def extract_member(zip_ref, info, path):
+    """
+    Extracts one zip member to path, streaming it in blocks.
+
+    Parent directories are created with exist_ok, as other workers may be
+    creating the same ones at the same time. The file gets the member's
+    date as its modification time.
+
+    Returns:
+    int: The number of bytes written.
+    """
+    if info.is_dir():
+        os.makedirs(path, exist_ok=True)
+        return 0
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with zip_ref.open(info) as source, open(path, 'wb') as target:
+        shutil.copyfileobj(source, target, COPY_SIZE)
+    try:
+        timestamp = time.mktime(info.date_time + (0, 0, -1))
+        os.utime(path, (timestamp, timestamp))
+    except (OverflowError, ValueError):
+        pass
+    return info.file_size
+
+
+def _extract_infos(zip_ref, infos, target_path, nested, records=None):
+    """
+    Extracts members of an open zip, recursing into nested zips.
+
+    The manifest record of each extracted file and nested zip is added to
+    records, if given.
+
+    Returns:
+    tuple: (number of files, number of bytes written).
+    """
+    files = 0
+    written = 0
+    for info in infos:
+        path = member_path(target_path, info.filename)
+        if _is_nested_zip(info, nested):
+            try:
+                with zip_ref.open(info) as stream:
+                    source = io.BytesIO(stream.read()) if info.file_size <= NESTED_IN_MEMORY else stream
+                    with zipfile.ZipFile(source) as nested_ref:
+                        # The nested zip's contents go to a folder named after it
+                        nested_files, nested_written = _extract_infos(nested_ref, nested_ref.infolist(),
+                                                                      os.path.splitext(path)[0], nested)
+                files += nested_files
+                written += nested_written
+                if records is not None:
+                    records[info.filename] = member_signature(info) + [None]
+                continue
+            except zipfile.BadZipFile:
+                # Not a readable zip after all, keep it as a plain file
+                pass
+
+        written += extract_member(zip_ref, info, path)
+        if not info.is_dir():
+            files += 1
+            if records is not None:
+                records[info.filename] = member_signature(info) + [os.stat(path).st_mtime_ns]
+    return files, written
+
+
+def extract_job(job):
+    """
+    Extracts one batch of members of an archive. Runs in the worker processes.
+
+    Parameters:
+    job (tuple): (zip path, indices of the members in infolist(), target
+                 path, whether to recurse into nested zips).
+
+    Returns:
+    dict: The zip path, numbers of files and bytes written, the manifest
+          records of the extracted members, the seconds spent, and the
+          error message if the batch failed.
+    """
+    zip_path, indices, target_path, nested = job
+    start = time.perf_counter()
+    result = {"zip": zip_path, "files": 0, "bytes": 0, "records": {}, "seconds": 0.0, "error": None}
+    try:
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            infos = zip_ref.infolist()
+            result["files"], result["bytes"] = _extract_infos(zip_ref, [infos[index] for index in indices],
+                                                              target_path, nested, result["records"])
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def plan_jobs(zip_paths, target_path, nested=False, batch_size=BATCH_SIZE, incremental=False):
+    """
+    Splits the members of the archives into extraction jobs, largest first.
+
+    Consecutive members of an archive are batched until they reach
+    batch_size uncompressed bytes, and a member bigger than that gets a job
+    of its own. Starting with the largest jobs keeps one giant archive
+    from being the last thing left running on a single worker.
+
+    Archives are planned in name order. A file that an earlier archive
+    already writes is left out: silently if both members have the same
+    size and CRC32, as a reported conflict otherwise. With incremental,
+    members already extracted (see unchanged_record) are left out too.
+
+    Returns:
+    dict: "jobs", a list of (uncompressed size, job) tuples, largest first;
+          "manifests", zip path -> the manifest records of its skipped
+          members; "skipped", the number of members already extracted;
+          "conflicts", a list of (path, kept zip path, skipped zip path);
+          "errors", zip path -> error message for unreadable archives.
+    """
+    plan = {"jobs": [], "manifests": {}, "skipped": 0, "conflicts": [], "errors": {}}
+    owners = {}
+    for zip_path in sorted(zip_paths):
+        try:
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                infos = zip_ref.infolist()
+        except (OSError, zipfile.BadZipFile) as e:
+            plan["errors"][zip_path] = str(e)
+            continue
+
+        manifest = load_archive_manifest(manifest_path(target_path, zip_path)) if incremental else {}
+        records = plan["manifests"][zip_path] = {}
+        batch = []
+        batch_bytes = 0
+        for index, info in enumerate(infos):
+            path = member_path(target_path, info.filename)
+            if not info.is_dir():
+                owner = owners.setdefault(os.path.normcase(path), (zip_path, index, info.file_size, info.CRC))
+                if owner[:2] != (zip_path, index):
+                    if owner[2:] != (info.file_size, info.CRC):
+                        plan["conflicts"].append((path, owner[0], zip_path))
+                    continue
+
+            if incremental:
+                if info.is_dir():
+                    unchanged = os.path.isdir(path)
+                else:
+                    record = unchanged_record(info, path, manifest.get(info.filename), nested)
+                    unchanged = record is not None
+                    if unchanged:
+                        records[info.filename] = record
+                if unchanged:
+                    plan["skipped"] += 1
+                    continue
+
+            if info.file_size >= batch_size and batch:
+                plan["jobs"].append((batch_bytes, (zip_path, batch, target_path, nested)))
+                batch = []
+                batch_bytes = 0
+            batch.append(index)
+            batch_bytes += info.file_size
+            if batch_bytes >= batch_size:
+                plan["jobs"].append((batch_bytes, (zip_path, batch, target_path, nested)))
+                batch = []
+                batch_bytes = 0
+        if batch:
+            plan["jobs"].append((batch_bytes, (zip_path, batch, target_path, nested)))
+
+    plan["jobs"].sort(key=lambda job: job[0], reverse=True)
+    return plan
+
+
+def extract_zips(folder_path, subfolder_name=None, workers=None, nested=False, incremental=False, report_path=None):
     """
     Extracts the contents of all .zip files in the given folder path to a subfolder.
 
+    The archives are extracted in parallel in a process pool, largest jobs
+    first, and big archives are split over several workers. A manifest of
+    the extracted members of each archive is kept in the subfolder, so an
+    incremental run only extracts new or changed members.
+
     Parameters:
     folder_path (str): The path to the folder containing the .zip files.
+    subfolder_name (str): The subfolder to extract to, asked for if None.
+    workers (int): Number of worker processes.
+    nested (bool): Extract zips found inside the archives too, each into a
+                   folder named after it, instead of writing the .zip file.
+    incremental (bool): Skip members that are already extracted.
+    report_path (str): Write a JSON run report (throughput, stage timings,
+                       conflicts and errors) to this path.
 
     Returns:
-    None
+    dict: Numbers of files and bytes extracted and of members skipped,
+          seconds taken, the conflicting paths, and the archives that
+          failed with their error messages.
     """
-    subfolder_name = input("Enter the name of the subfolder to extract the ZIP contents to: ")
+    if subfolder_name is None:
+        subfolder_name = input("Enter the name of the subfolder to extract the ZIP contents to: ")
     subfolder_path = os.path.join(folder_path, subfolder_name)
 
     # Create the subfolder if it doesn't exist
     if not os.path.exists(subfolder_path):
         os.makedirs(subfolder_path)
 
-    # Loop through all files in the folder
-    for filename in os.listdir(folder_path):
-        # Check if the file is a .zip file
-        if filename.endswith(".zip"):
-            zip_path = os.path.join(folder_path, filename)
-            print(f"Extracting {filename} to {subfolder_path}")
+    zip_paths = [os.path.join(folder_path, filename) for filename in os.listdir(folder_path)
+                 if filename.lower().endswith(".zip")]
 
-            # Extract the contents of the .zip file to the subfolder
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(subfolder_path)
+    metrics = RunMetrics("extract")
+    with metrics.stage("scan"):
+        plan = plan_jobs(zip_paths, subfolder_path, nested, incremental=incremental)
+    totals = {"files": 0, "bytes": 0, "skipped": plan["skipped"], "seconds": 0.0,
+              "conflicts": plan["conflicts"], "errors": plan["errors"]}
+    for zip_path, error in plan["errors"].items():
+        print(f"Cannot open {os.path.basename(zip_path)}: {error}")
+    for path, kept_zip, skipped_zip in plan["conflicts"]:
+        print(f"Conflict: {os.path.relpath(path, subfolder_path)} differs in {os.path.basename(kept_zip)} "
+              f"and {os.path.basename(skipped_zip)}, keeping the one from {os.path.basename(kept_zip)}")
+
+    remaining = {}
+    for _, (zip_path, _, _, _) in plan["jobs"]:
+        remaining[zip_path] = remaining.get(zip_path, 0) + 1
+
+    print(f"Extracting {len(remaining)} archives ({len(plan['jobs'])} jobs) to {subfolder_path}")
+    with ProgressRenderer(metrics), ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(extract_job, job) for _, job in plan["jobs"]]
+        for future in as_completed(futures):
+            result = future.result()
+            zip_path = result["zip"]
+            totals["files"] += result["files"]
+            totals["bytes"] += result["bytes"]
+            metrics.items.add(result["files"])
+            metrics.bytes.add(result["bytes"])
+            metrics.add_stage_time("extract", result["seconds"])
+            plan["manifests"][zip_path].update(result["records"])
+            if result["error"]:
+                totals["errors"][zip_path] = result["error"]
+                metrics.errors.add()
+                metrics.log(f"Error extracting {os.path.basename(zip_path)}: {result['error']}")
+
+            remaining[zip_path] -= 1
+            if not remaining[zip_path] and zip_path not in totals["errors"]:
+                metrics.log(f"Extracted {os.path.basename(zip_path)}")
+
+    with metrics.stage("manifest"):
+        for zip_path, records in plan["manifests"].items():
+            save_archive_manifest(manifest_path(subfolder_path, zip_path), zip_path, records)
+
+    metrics.finish()
+    totals["seconds"] = metrics.elapsed
+    megabytes = totals["bytes"] / (1024 * 1024)
+    if incremental:
+        print(f"\nSkipped {totals['skipped']} unchanged members")
+    print(f"\nExtracted {totals['files']} files ({megabytes:.1f} MB) in {totals['seconds']:.2f}s "
+          f"({megabytes / max(totals['seconds'], 1e-9):.1f} MB/s)")
+
+    if report_path:
+        metrics.details.update(skipped=totals["skipped"], errors=totals["errors"],
+                               conflicts=[list(conflict) for conflict in totals["conflicts"]])
+        metrics.write_report(report_path)
+    return totals
+
+
+if __name__ == "__main__":
+    # Example usage
+    folder_path = input("Enter the path to the folder containing the .zip files: ")
+    nested = input("Also extract zips found inside the archives? (y/n): ").strip().lower() == 'y'
+    incremental = input("Only extract new or changed files? (y/n): ").strip().lower() == 'y'
+    report_path = input("Write a JSON run report to (or press Enter to skip): ").strip() or None
+    extract_zips(folder_path, nested=nested, incremental=incremental, report_path=report_path)
 
     print("Extraction complete. Press Enter to close the script.")
     input()
-
-# Example usage
-folder_path = input("Enter the path to the folder containing the .zip files: ")
-extract_zips(folder_path)
\ No newline at end of file
@@ -1,8 +1,55 @@
 import os
-from datetime import datetime
-import glob
-import pyperclip
+import sys
 import io
+import time
+import argparse
+from ListFiles_Scanner import scan_file_times
+from ListFiles_Index import FileIndex, INDEX_NAME
+from ListFiles_Output import OUTPUT_FORMATS, CLIPBOARD_MAX_LINES, format_time, select_files, write_files
+from _Progress import ProgressRenderer, RunMetrics
+
+
+def iter_file_times(folder_path, recursive=True, extension=None, exclude=(), since=None, use_index=False,
+                    top=None, full_refresh=False):
+    """
+    Yields (file path, last modified timestamp) for the files of a folder.
+
+    Files come in scan order, except with use_index, where they come from
+    the index sorted newest first, and only the top ones if top is given.
+
+    Args:
+        folder_path (str): The folder to list.
+        recursive (bool): Whether to include subfolders.
+        extension (str): Only files with this extension, or None for all.
+        exclude (list): Names or patterns of folders and files to skip.
+        since (float): Only files modified at or after this timestamp.
+        use_index (bool): Refresh and query the persistent file index.
+        top (int): With use_index, the number of most recent files to return.
+        full_refresh (bool): With use_index, re-list every folder instead of
+                             only the changed ones, to pick up files edited
+                             in place.
+    """
+    extensions = [extension] if extension else None
+    if use_index:
+        with FileIndex(folder_path, exclude=exclude) as index:
+            stats = index.refresh(full=full_refresh)
+            print(f"Index refreshed in {stats['seconds']:.2f}s "
+                  f"({stats['listed']} of {stats['checked']} folders changed)", file=sys.stderr)
+            for file_path, modified_time, _ in index.query(extensions=extensions, since=since,
+                                                           recursive=recursive, limit=top):
+                yield file_path, modified_time
+        return
+
+    for file_path, modified_time in scan_file_times(folder_path, recursive=recursive, extensions=extensions,
+                                                    exclude=list(exclude) + [INDEX_NAME]):
+        if since is None or modified_time >= since:
+            yield file_path, modified_time
+
+
+def display_path(file_path, folder_path):
+    # Get the relative path after the input folder, and prepend * to it
+    return os.path.join('*', os.path.relpath(file_path, folder_path))
+
 
 def list_files():
     # Get folder path
@@ -12,8 +59,8 @@ def list_files():
             break
         print("Invalid folder path. Please try again.")
 
-    # Normalize the folder path to ensure consistent separator handling
-    folder_path = os.path.normpath(folder_path)
+    # Absolute, like the paths the index returns, and with consistent separators
+    folder_path = os.path.abspath(folder_path)
 
     # Ask about recursive search
     while True:
@@ -27,56 +74,124 @@ def list_files():
     if extension and not extension.startswith('.'):
         extension = '.' + extension
 
-    # Build search pattern
-    pattern = '**/*' if recursive == 'y' else '*'
-    if extension:
-        pattern += extension
+    # Names or patterns of folders and files to skip while scanning
+    exclude = input("Enter folders/files to skip, separated by spaces (e.g. Intermediate .git), "
+                    "or press Enter for none: ").split()
+
+    # Only keep recently modified files
+    days = input("Only files modified in the last N days (or press Enter for all): ").strip()
+    since = time.time() - float(days) * 86400 if days else None
+
+    # The index makes repeat runs on big trees only stat the directories
+    use_index = input("Use the file index (faster on repeat runs)? (y/n): ").strip().lower() == 'y'
+
+    # Files edited in place do not change their folder, only a full refresh sees them
+    full_refresh = use_index and input("Re-read every folder to catch files edited in place? (y/n): "
+                                       ).strip().lower() == 'y'
 
-    # Get all files
-    files = []
+    # Only show the most recent files
+    top = input("Only show the N most recently modified files (or press Enter for all): ").strip()
+    top = int(top) if top else None
+
+    # Get all files, sorted by modified time (oldest first)
     try:
-        for file_path in glob.glob(os.path.join(folder_path, pattern), recursive=(recursive == 'y')):
-            if os.path.isfile(file_path):
-                modified_time = os.path.getmtime(file_path)
-                # Get the relative path after the input folder
-                relative_path = os.path.relpath(file_path, folder_path)
-                # Prepend * to the relative path
-                display_path = os.path.join('*', relative_path)
-                files.append((display_path, modified_time))
+        files = select_files(iter_file_times(folder_path, recursive == 'y', extension, exclude, since, use_index, top,
+                                             full_refresh), top=top, newest_first=False)
     except Exception as e:
         print(f"Error accessing files: {e}")
         input("Press Enter to exit...")
         return
 
-    # Sort files by modified time (oldest first)
-    files.sort(key=lambda x: x[1], reverse=False)
-
     # Prepare output for both display and clipboard
     output = io.StringIO()
     output.write("Files sorted by last modified date (oldest first):\n")
     output.write("-" * 80 + "\n")
-    
-    for file_path, modified_time in files:
-        modified_date = datetime.fromtimestamp(modified_time).strftime('%Y-%m-%d %H:%M:%S')
-        line = f"{modified_date} - {file_path}\n"
-        output.write(line)
-
+    write_files(((display_path(file_path, folder_path), modified_time) for file_path, modified_time in files), output)
     output.write(f"\nTotal files found: {len(files)}")
-    
+
     # Get the complete output as a string
     result = output.getvalue()
-    
+
     # Print to console
     print(result)
-    
-    # Copy to clipboard
-    try:
-        pyperclip.copy(result)
-        print("\nList has been copied to clipboard!")
-    except Exception as e:
-        print(f"\nFailed to copy to clipboard: {e}")
+
+    # Copy to clipboard, unless the list is too long for it
+    if len(files) > CLIPBOARD_MAX_LINES:
+        print(f"\nList is longer than {CLIPBOARD_MAX_LINES} files, not copied to clipboard.")
+    else:
+        try:
+            import pyperclip
+            pyperclip.copy(result)
+            print("\nList has been copied to clipboard!")
+        except Exception as e:
+            print(f"\nFailed to copy to clipboard: {e}")
 
     input("\nPress Enter to exit...")
 
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="List files sorted by last modified date.")
+    parser.add_argument("path", help="Folder to list")
+    parser.add_argument("--no-recursive", action="store_true", help="Only list the folder itself")
+    parser.add_argument("--ext", help="Only files with this extension, e.g. .uasset")
+    parser.add_argument("--exclude", nargs="*", default=[],
+                        help="Names or patterns of folders and files to skip, e.g. Intermediate .git")
+    parser.add_argument("--days", type=float, help="Only files modified in the last N days")
+    parser.add_argument("--index", action="store_true", help="Use the persistent file index")
+    parser.add_argument("--reindex", action="store_true",
+                        help="Re-read every folder into the index, to catch files edited in place (implies --index)")
+    parser.add_argument("--top", type=int, help="Only the N most recently modified files")
+    parser.add_argument("--newest-first", action="store_true", help="Sort newest first instead of oldest first")
+    parser.add_argument("--stream", action="store_true",
+                        help="Write files as they are found, unsorted, instead of sorting at the end")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="text", help="Output format")
+    parser.add_argument("--output", help="Write to this file instead of stdout")
+    parser.add_argument("--report", help="Write a JSON run report to this path")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.path):
+        parser.error(f"Invalid folder path: {args.path}")
+    if args.stream and args.top is not None:
+        parser.error("--stream writes files as they are found, it cannot be combined with --top")
+
+    # Absolute, so CSV and JSONL paths look the same with or without --index
+    folder_path = os.path.abspath(args.path)
+    extension = args.ext if not args.ext or args.ext.startswith('.') else '.' + args.ext
+    since = time.time() - args.days * 86400 if args.days is not None else None
+
+    metrics = RunMetrics("list")
+
+    def counted(file_times):
+        for file_time in file_times:
+            metrics.items.add()
+            yield file_time
+
+    file_times = counted(iter_file_times(folder_path, not args.no_recursive, extension, args.exclude, since,
+                                         args.index or args.reindex, args.top, args.reindex))
+    if not args.stream:
+        # Progress is only shown while scanning, the listing itself may be going to the terminal
+        with metrics.stage("scan"), ProgressRenderer(metrics):
+            file_times = select_files(file_times, top=args.top, newest_first=args.newest_first)
+
+    out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        with metrics.stage("write"):
+            count = write_files(file_times, out, args.format,
+                                lambda file_path, modified_time:
+                                f"{format_time(modified_time)} - {display_path(file_path, folder_path)}")
+    finally:
+        if args.output:
+            out.close()
+    print(f"Total files found: {count}", file=sys.stderr)
+
+    metrics.finish()
+    if args.report:
+        metrics.details["written"] = count
+        metrics.write_report(args.report)
+
+
 if __name__ == "__main__":
-    list_files()
\ No newline at end of file
+    # Run interactively when started without arguments, e.g. by double-clicking
+    if len(sys.argv) > 1:
+        main()
+    else:
+        list_files()
\ No newline at end of file
@@ -0,0 +1,227 @@
+import os
+import json
+import hashlib
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ListFiles_Scanner import DEFAULT_WORKERS, normalize_extensions, is_excluded
+
+INDEX_NAME = ".listfiles_index.sqlite"
+
+# Indexes live in a per-user cache folder, not in the indexed tree: writing
+# the database (and its journal) into the root would change the root's mtime
+# and force it to be re-listed on every refresh
+CACHE_DIR_NAME = "ListFiles"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS directories (path TEXT PRIMARY KEY, parent TEXT, mtime_ns INTEGER);
+CREATE INDEX IF NOT EXISTS directories_parent ON directories (parent);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, directory TEXT, extension TEXT, size INTEGER, mtime REAL);
+CREATE INDEX IF NOT EXISTS files_directory ON files (directory);
+CREATE INDEX IF NOT EXISTS files_mtime ON files (mtime);
+CREATE INDEX IF NOT EXISTS files_extension_mtime ON files (extension, mtime);
+"""
+
+
+def default_index_path(root, suffix=".sqlite"):
+    """
+    Returns where the index of a tree is kept: a file named after a hash of
+    the tree's path, in %LOCALAPPDATA% on Windows or ~/.cache elsewhere.
+    Other kinds of index of the same tree use another suffix.
+    """
+    cache = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    digest = hashlib.sha1(os.path.normcase(os.path.abspath(root)).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache, CACHE_DIR_NAME, f"{digest}{suffix}")
+
+
+def _read_directory(root, directory, known_mtime_ns, exclude, skip_names=(INDEX_NAME,)):
+    """
+    Lists one directory of the tree, unless its mtime is unchanged.
+
+    Runs in the refresh threads, so it only touches the filesystem.
+
+    Returns:
+        tuple: (directory, mtime_ns or None if it is gone,
+                None if unchanged else (file rows, subdirectory names)).
+    """
+    full_path = os.path.join(root, directory)
+    try:
+        mtime_ns = os.stat(full_path).st_mtime_ns
+    except OSError:
+        return directory, None, None
+    if mtime_ns == known_mtime_ns:
+        return directory, mtime_ns, None
+
+    files = []
+    subdirectories = []
+    try:
+        with os.scandir(full_path) as entries:
+            for entry in entries:
+                if entry.name.startswith(skip_names) or exclude and is_excluded(entry.name, exclude):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirectories.append(entry.name)
+                    elif entry.is_file():
+                        stat = entry.stat()
+                        files.append((os.path.join(directory, entry.name), directory,
+                                      os.path.splitext(entry.name)[1].lower(), stat.st_size, stat.st_mtime))
+                except OSError:
+                    continue
+    except OSError:
+        return directory, None, None
+    return directory, mtime_ns, (files, subdirectories)
+
+
+class FileIndex:
+    """
+    Persistent index of the path, size and mtime of every file in a tree,
+    stored in a SQLite file in the user's cache folder (see
+    default_index_path). Index files found in the tree, such as ones left
+    by older versions that kept the index at the root, are never listed.
+
+    A refresh stats every directory but only re-lists the ones whose own
+    mtime changed, which is what happens when files are created, deleted or
+    renamed in them. Editors that save by writing a temporary file and
+    renaming it over the original (as the UE editor does) are picked up the
+    same way. A file rewritten in place does not change its directory's
+    mtime; refresh(full=True) re-lists everything to catch those.
+
+    Queries are answered from the index alone.
+    """
+
+    def __init__(self, root, exclude=None, index_path=None):
+        self.root = os.path.abspath(root)
+        self.index_path = index_path or default_index_path(self.root)
+        # Also skips the journal files SQLite writes next to the database
+        self.skip_names = (INDEX_NAME, os.path.basename(self.index_path))
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        self.exclude = tuple(sorted(pattern.strip().rstrip('/\\') for pattern in exclude or ()))
+        self.connection = sqlite3.connect(self.index_path)
+        self.connection.executescript(SCHEMA)
+
+        # An index built with other exclude patterns is missing or holding files
+        stored = self.connection.execute("SELECT value FROM meta WHERE key = 'exclude'").fetchone()
+        if stored is None or tuple(json.loads(stored[0])) != self.exclude:
+            with self.connection:
+                self._clear()
+                self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('exclude', ?)",
+                                        (json.dumps(self.exclude),))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def _clear(self):
+        self.connection.execute("DELETE FROM directories")
+        self.connection.execute("DELETE FROM files")
+
+    def _delete_tree(self, directory):
+        prefix = os.path.join(directory, "")
+        for table, column in (("directories", "path"), ("files", "directory")):
+            self.connection.execute(f"DELETE FROM {table} WHERE {column} = ? OR substr({column}, 1, ?) = ?",
+                                    (directory, len(prefix), prefix))
+
+    def _children(self, directory):
+        return self.connection.execute("SELECT path, mtime_ns FROM directories WHERE parent = ?",
+                                       (directory,)).fetchall()
+
+    def refresh(self, full=False, workers=DEFAULT_WORKERS):
+        """
+        Brings the index up to date with the tree.
+
+        The tree is refreshed one level at a time: the directories of a level
+        are stat'ed (and listed if changed) concurrently, and their results
+        are written to the index before the next level.
+
+        Args:
+            full (bool): Re-list every directory, not only the changed ones.
+            workers (int): Number of threads reading the filesystem.
+
+        Returns:
+            dict: Numbers of directories checked and listed, and the time taken.
+        """
+        start = time.perf_counter()
+        checked = listed = 0
+        with self.connection:
+            if full:
+                self.connection.execute("UPDATE directories SET mtime_ns = NULL")
+            known = self.connection.execute("SELECT mtime_ns FROM directories WHERE path = ''").fetchone()
+            level = [("", known[0] if known else None)]
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                while level:
+                    results = executor.map(lambda item: _read_directory(self.root, *item, self.exclude,
+                                                                           self.skip_names), level)
+                    next_level = []
+                    for directory, mtime_ns, listing in results:
+                        checked += 1
+                        if mtime_ns is None:
+                            self._delete_tree(directory)
+                            continue
+                        if listing is None:
+                            next_level.extend(self._children(directory))
+                            continue
+
+                        listed += 1
+                        files, subdirectories = listing
+                        self.connection.execute("DELETE FROM files WHERE directory = ?", (directory,))
+                        self.connection.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?)", files)
+
+                        children = dict(self._children(directory))
+                        for name in subdirectories:
+                            child = os.path.join(directory, name)
+                            next_level.append((child, children.pop(child, None)))
+                        for child in children:
+                            self._delete_tree(child)
+
+                        parent = os.path.dirname(directory) if directory else None
+                        self.connection.execute("INSERT OR REPLACE INTO directories VALUES (?, ?, ?)",
+                                                (directory, parent, mtime_ns))
+                    level = next_level
+
+        return {"checked": checked, "listed": listed, "seconds": time.perf_counter() - start}
+
+    def query(self, extensions=None, since=None, recursive=True, newest_first=True, limit=None):
+        """
+        Lists indexed files, sorted by last modified date.
+
+        Args:
+            extensions (iterable): Extensions to keep, or None for all files.
+            since (float): Only files modified at or after this timestamp.
+            recursive (bool): Include files in subdirectories.
+            newest_first (bool): Sort order.
+            limit (int): Maximum number of files to return.
+
+        Returns:
+            list: (file path, last modified timestamp, size) tuples.
+        """
+        conditions = []
+        parameters = []
+        extensions = normalize_extensions(extensions)
+        if extensions:
+            conditions.append(f"extension IN ({', '.join('?' * len(extensions))})")
+            parameters.extend(extensions)
+        if since is not None:
+            conditions.append("mtime >= ?")
+            parameters.append(since)
+        if not recursive:
+            conditions.append("directory = ''")
+
+        sql = "SELECT path, mtime, size FROM files"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY mtime {'DESC' if newest_first else 'ASC'}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+
+        return [(os.path.join(self.root, path), mtime, size)
+                for path, mtime, size in self.connection.execute(sql, parameters)]
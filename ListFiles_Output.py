@@ -0,0 +1,81 @@
+import csv
+import json
+import heapq
+from datetime import datetime
+from operator import itemgetter
+
+OUTPUT_FORMATS = ("text", "csv", "jsonl")
+
+# Larger listings are not copied to the clipboard, which can hang on them
+CLIPBOARD_MAX_LINES = 10000
+
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def select_files(file_times, top=None, newest_first=True):
+    """
+    Sorts (file path, last modified timestamp) pairs by date.
+
+    With top, only the top most recently modified files are kept. They are
+    picked with a bounded heap while the pairs stream in, so the whole
+    listing is never held in memory or sorted.
+
+    Args:
+        file_times (iterable): (file path, last modified timestamp) pairs.
+        top (int): Number of most recent files to keep, or None for all.
+        newest_first (bool): Sort order of the result.
+
+    Returns:
+        list: The selected pairs, sorted.
+    """
+    if top is None:
+        return sorted(file_times, key=itemgetter(1), reverse=newest_first)
+
+    newest = heapq.nlargest(top, file_times, key=itemgetter(1))
+    return newest if newest_first else newest[::-1]
+
+
+def write_files(file_times, out, output_format="text", text_line=None, extra_columns=()):
+    """
+    Writes (file path, last modified timestamp) pairs to a text stream as
+    they come, one line per file.
+
+    Args:
+        file_times (iterable): The pairs to write, or longer tuples holding
+                               the values of extra_columns after the
+                               timestamp.
+        out (file): The stream to write to.
+        output_format (str): "text", "csv" or "jsonl".
+        text_line (callable): Formats one tuple as a line of text, for the
+                              "text" format.
+        extra_columns (tuple): Names of the values after the timestamp,
+                               e.g. ("matches",), written as extra CSV
+                               columns and JSON keys.
+
+    Returns:
+        int: Number of files written.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+
+    if output_format == "csv":
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(["path", "modified", "timestamp", *extra_columns])
+
+    count = 0
+    for file_path, modified_time, *extra in file_times:
+        if output_format == "csv":
+            writer.writerow([file_path, format_time(modified_time), modified_time, *extra])
+        elif output_format == "jsonl":
+            out.write(json.dumps({"path": file_path, "modified": format_time(modified_time),
+                                  "timestamp": modified_time, **dict(zip(extra_columns, extra))}) + "\n")
+        else:
+            out.write((text_line or default_text_line)(file_path, modified_time, *extra) + "\n")
+        count += 1
+    return count
+
+
+def default_text_line(file_path, modified_time, *extra):
+    return " - ".join([format_time(modified_time), file_path, *map(str, extra)])
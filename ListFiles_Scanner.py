@@ -0,0 +1,111 @@
+import os
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Directory listings are mostly waiting on the (network) filesystem, so
+# more threads than cores still help
+DEFAULT_WORKERS = 16
+
+
+def normalize_extensions(extensions):
+    """
+    Normalizes extensions like "png", ".PNG" or "*.png" to ".png".
+
+    Returns:
+        tuple: The lowercase extensions, or None to match every file.
+    """
+    if not extensions:
+        return None
+    return tuple('.' + extension.strip().lstrip('*.').lower() for extension in extensions)
+
+
+def is_excluded(name, exclude):
+    return any(fnmatch.fnmatch(name, pattern) for pattern in exclude)
+
+
+def _scan_directory(path, extensions, exclude, onerror):
+    """
+    Lists one directory.
+
+    Returns:
+        tuple: (matching file DirEntry objects, subdirectory paths).
+    """
+    files = []
+    subdirectories = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if exclude and is_excluded(entry.name, exclude):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirectories.append(entry.path)
+                    elif entry.is_file() and (extensions is None or entry.name.lower().endswith(extensions)):
+                        files.append(entry)
+                except OSError:
+                    continue
+    except OSError as e:
+        if onerror is not None:
+            onerror(e)
+    return files, subdirectories
+
+
+def scan_files(path, recursive=True, extensions=None, exclude=None, workers=DEFAULT_WORKERS, onerror=None):
+    """
+    Yields the files under path as os.DirEntry objects.
+
+    The tree is read with os.scandir. Its entries already know whether they
+    are files or directories, and on Windows they also carry the size and
+    modification time, so entry.stat() is free there. Everywhere else the
+    stat result is cached after the first call. Subdirectories are listed
+    concurrently in a thread pool, which hides most of the latency of
+    network shares, and excluded directories are never entered.
+
+    Files are yielded in the order their directories finish listing, not in
+    any sorted order.
+
+    Args:
+        path (str): The folder to scan.
+        recursive (bool): Whether to descend into subdirectories.
+        extensions (iterable): Extensions to keep, e.g. [".uasset", "png"],
+                               or None for all files.
+        exclude (iterable): Names or glob patterns of files and directories
+                            to skip, e.g. ["Intermediate", ".git", "*.tmp"].
+        workers (int): Number of listing threads.
+        onerror (callable): Called with the OSError of a directory that
+                            could not be listed; such directories are
+                            skipped either way.
+
+    Yields:
+        os.DirEntry: The matching files.
+    """
+    extensions = normalize_extensions(extensions)
+    exclude = tuple(pattern.strip().rstrip('/\\') for pattern in exclude or ())
+
+    if not recursive:
+        files, _ = _scan_directory(path, extensions, exclude, onerror)
+        yield from files
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(_scan_directory, path, extensions, exclude, onerror)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirectories = future.result()
+                for subdirectory in subdirectories:
+                    pending.add(executor.submit(_scan_directory, subdirectory, extensions, exclude, onerror))
+                yield from files
+
+
+def scan_file_times(path, recursive=True, extensions=None, exclude=None, workers=DEFAULT_WORKERS):
+    """
+    Yields (file path, last modified timestamp) for the files under path.
+
+    See scan_files for the arguments.
+    """
+    for entry in scan_files(path, recursive, extensions, exclude, workers):
+        try:
+            yield entry.path, entry.stat().st_mtime
+        except OSError:
+            continue
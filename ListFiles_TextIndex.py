@@ -0,0 +1,174 @@
+import os
+import codecs
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from ListFiles_Index import default_index_path
+
+# Name of the index when it was kept at the root of the tree, such files are still skipped
+TEXT_INDEX_NAME = ".listfiles_trigrams.sqlite"
+
+# Only the first block of a file is read to tell text from binary
+SNIFF_SIZE = 8192
+
+# Bigger files are not indexed and are always searched
+INDEX_MAX_SIZE = 32 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT UNIQUE, mtime REAL, indexed INTEGER);
+CREATE TABLE IF NOT EXISTS trigrams (trigram INTEGER, file_id INTEGER, PRIMARY KEY (trigram, file_id)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS trigrams_file ON trigrams (file_id);
+"""
+
+
+def file_encoding(block):
+    """
+    Guesses the encoding of a file from its first block.
+
+    Returns:
+        str: 'utf-16-le' or 'utf-16-be' for files with a byte order mark,
+             'utf-8' for other text, or None for binary files (NUL bytes).
+    """
+    if block.startswith(codecs.BOM_UTF16_LE):
+        return 'utf-16-le'
+    if block.startswith(codecs.BOM_UTF16_BE):
+        return 'utf-16-be'
+    if b"\x00" in block:
+        return None
+    return 'utf-8'
+
+
+def trigrams_of(data):
+    """
+    Returns the set of trigrams of some bytes, each packed into an int.
+
+    Bytes are lowercased first (ASCII only, like bytes regexes with
+    IGNORECASE), so the same index serves case-sensitive and -insensitive
+    searches.
+    """
+    data = data.lower()
+    return {(a << 16) | (b << 8) | c for a, b, c in zip(data, data[1:], data[2:])}
+
+
+def read_trigrams(file_path):
+    """
+    Reads the trigrams of one text file. Runs in the refresh processes.
+
+    UTF-16 files are indexed as UTF-8, the encoding searches are indexed in.
+
+    Returns:
+        tuple: (file_path, set of trigrams, or None if the file is binary,
+                too big or unreadable, so it always has to be searched).
+    """
+    try:
+        if os.path.getsize(file_path) > INDEX_MAX_SIZE:
+            return file_path, None
+        with open(file_path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return file_path, None
+
+    encoding = file_encoding(data[:SNIFF_SIZE])
+    if encoding is None:
+        return file_path, None
+    if encoding != 'utf-8':
+        data = data.decode(encoding, errors='replace').encode('utf-8')
+    return file_path, trigrams_of(data)
+
+
+class TrigramIndex:
+    """
+    Persistent trigram index of the text files in a tree, stored in a
+    SQLite file in the per-user cache folder (see
+    ListFiles_Index.default_index_path), so the tree itself is never written.
+
+    Each text file is recorded with its mtime and the set of its trigrams.
+    A search only has to read the files containing every trigram of the
+    searched text, plus the files that could not be indexed (binary or
+    bigger than INDEX_MAX_SIZE). Refreshing re-reads only the files whose
+    mtime changed since they were indexed.
+    """
+
+    def __init__(self, root, index_path=None):
+        self.root = os.path.abspath(root)
+        self.index_path = index_path or default_index_path(self.root, ".trigrams.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        self.connection = sqlite3.connect(self.index_path)
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def refresh(self, file_times, workers=None, recursive=True):
+        """
+        Brings the index up to date with a file listing.
+
+        Only files in the folders the listing covered are dropped when they
+        are missing from it, so a listing of the root alone keeps the
+        entries of the subfolders indexed by an earlier recursive listing.
+
+        Args:
+            file_times (iterable): (file path, last modified timestamp) of
+                                   every file that should be indexed, as
+                                   absolute paths.
+            workers (int): Number of processes reading files.
+            recursive (bool): Whether the listing covers the subfolders of
+                              the root, or only the root itself.
+
+        Returns:
+            dict: Numbers of files indexed and removed, and the time taken.
+        """
+        start = time.perf_counter()
+        stored = {path: (file_id, mtime) for file_id, path, mtime in
+                  self.connection.execute("SELECT id, path, mtime FROM files")}
+        current = dict(file_times)
+        changed = [path for path, mtime in current.items() if stored.get(path, (None, None))[1] != mtime]
+        removed = [stored[path][0] for path in stored.keys() - current.keys()
+                   if recursive or os.path.dirname(path) == self.root]
+
+        with self.connection:
+            for file_id in removed:
+                self._delete(file_id)
+
+            if changed:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    for path, trigrams in executor.map(read_trigrams, changed, chunksize=16):
+                        if path in stored:
+                            self._delete(stored[path][0])
+                        cursor = self.connection.execute("INSERT INTO files (path, mtime, indexed) VALUES (?, ?, ?)",
+                                                         (path, current[path], trigrams is not None))
+                        if trigrams:
+                            self.connection.executemany("INSERT INTO trigrams VALUES (?, ?)",
+                                                        ((trigram, cursor.lastrowid) for trigram in trigrams))
+
+        return {"indexed": len(changed), "removed": len(removed), "seconds": time.perf_counter() - start}
+
+    def _delete(self, file_id):
+        self.connection.execute("DELETE FROM trigrams WHERE file_id = ?", (file_id,))
+        self.connection.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def candidates(self, text):
+        """
+        Returns the indexed files that may contain text.
+
+        Returns:
+            set: The candidate file paths, or None if text is too short to
+                 narrow anything down (fewer than 3 bytes).
+        """
+        trigrams = trigrams_of(text.encode('utf-8'))
+        if not trigrams:
+            return None
+
+        placeholders = ', '.join('?' * len(trigrams))
+        rows = self.connection.execute(
+            f"SELECT path FROM files WHERE indexed = 0 OR id IN ("
+            f"SELECT file_id FROM trigrams WHERE trigram IN ({placeholders}) "
+            f"GROUP BY file_id HAVING COUNT(*) = ?)",
+            (*trigrams, len(trigrams)))
+        return {path for path, in rows}
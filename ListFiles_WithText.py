@@ -1,48 +1,182 @@
 import os
-from datetime import datetime
-import time
+import re
+import sys
+import mmap
+from concurrent.futures import ProcessPoolExecutor
+from ListFiles_Scanner import scan_file_times
+from ListFiles_Output import OUTPUT_FORMATS, format_time, select_files, write_files
+from ListFiles_TextIndex import SNIFF_SIZE, TEXT_INDEX_NAME, TrigramIndex, file_encoding
+from _Progress import ProgressRenderer, RunMetrics
 
-def list_files_by_date(path, recursive=False):
+def list_files_by_date(path, recursive=False, top=None):
     """
     Lists all files in the given path, sorted by last edited date.
 
     Args:
         path (str): The path to list files from.
         recursive (bool): Whether to search the path recursively.
+        top (int): Only list the N most recently edited files.
 
     Returns:
         list: A list of tuples containing the file path and last edited timestamp.
     """
-    file_dates = []
-
-    if recursive:
-        for root, dirs, files in os.walk(path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                last_edited = os.path.getmtime(file_path)
-                file_dates.append((file_path, last_edited))
-    else:
-        for file in os.listdir(path):
-            file_path = os.path.join(path, file)
-            if os.path.isfile(file_path):
-                last_edited = os.path.getmtime(file_path)
-                file_dates.append((file_path, last_edited))
+    return select_files(scan_file_times(path, recursive), top=top, newest_first=True)
+
+
+def count_matches(job):
+    """
+    Counts the occurrences of some text in one file. Runs in the search processes.
+
+    The file is memory-mapped and scanned by the regex engine, so it is
+    never copied into Python. Text files are searched in their own encoding
+    (UTF-8 or UTF-16 with a byte order mark). Binary files are skipped,
+    unless include_binary is set, in which case both the UTF-8 and UTF-16LE
+    forms of the text are searched, the two ways UE assets store strings.
+
+    Args:
+        job (tuple): (file path, text, ignore_case, include_binary).
+
+    Returns:
+        tuple: (number of occurrences, number of bytes searched).
+    """
+    file_path, text, ignore_case, include_binary = job
+    flags = re.IGNORECASE if ignore_case else 0
+    try:
+        with open(file_path, 'rb') as f:
+            block = f.read(SNIFF_SIZE)
+            if not block:
+                return 0, 0
+            encoding = file_encoding(block)
+            if encoding is not None:
+                pattern = re.compile(re.escape(text.encode(encoding)), flags)
+            elif include_binary:
+                pattern = re.compile(re.escape(text.encode('utf-8')) + b"|" + re.escape(text.encode('utf-16-le')),
+                                     flags)
+            else:
+                return 0, len(block)
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return sum(1 for _ in pattern.finditer(data)), len(data)
+    except (OSError, ValueError):
+        return 0, 0
+
+
+def search_files(path, text, recursive=True, ignore_case=False, include_binary=False, use_index=False, workers=None,
+                 report_path=None):
+    """
+    Lists the files containing some text, sorted by last edited date.
 
-    return sorted(file_dates, key=lambda x: x[1], reverse=True)
+    The files are searched in parallel, in a process pool. With use_index,
+    a trigram index of the path is refreshed first (only files that
+    changed since the last search are re-read), and only the files it
+    reports as possible matches are searched.
 
-# Get the path from the user
-path = input("Enter the path to list files: ")
+    Args:
+        path (str): The path to search.
+        text (str): The text to look for.
+        recursive (bool): Whether to search the path recursively.
+        ignore_case (bool): Match ASCII letters regardless of case.
+        include_binary (bool): Also search binary files, e.g. .uasset.
+        use_index (bool): Use and refresh the persistent trigram index.
+        workers (int): Number of search processes.
+        report_path (str): Write a JSON run report (throughput, stage
+                           timings) to this path.
+
+    Returns:
+        list: A list of tuples containing the absolute file path, last
+              edited timestamp and number of matches.
+    """
+    # The index is keyed by absolute paths, whatever the working directory
+    path = os.path.abspath(path)
+    metrics = RunMetrics("search")
+    with metrics.stage("scan"):
+        file_dates = [(file_path, last_edited) for file_path, last_edited in list_files_by_date(path, recursive)
+                      if not os.path.basename(file_path).startswith(TEXT_INDEX_NAME)]
+    metrics.details["scanned"] = len(file_dates)
+
+    if use_index and text:
+        with metrics.stage("index"), TrigramIndex(path) as index:
+            stats = index.refresh(file_dates, workers, recursive)
+            print(f"Index refreshed in {stats['seconds']:.2f}s ({stats['indexed']} files read)", file=sys.stderr)
+            candidates = index.candidates(text)
+        if candidates is not None:
+            file_dates = [(file_path, last_edited) for file_path, last_edited in file_dates
+                          if file_path in candidates]
+
+    metrics.total = len(file_dates)
+    jobs = [(file_path, text, ignore_case, include_binary) for file_path, _ in file_dates]
+    matches = []
+    with metrics.stage("read"), ProgressRenderer(metrics), ProcessPoolExecutor(max_workers=workers) as executor:
+        for (file_path, last_edited), (count, size) in zip(file_dates,
+                                                           executor.map(count_matches, jobs, chunksize=32)):
+            metrics.items.add()
+            metrics.bytes.add(size)
+            if count:
+                matches.append((file_path, last_edited, count))
+
+    metrics.finish()
+    if report_path:
+        metrics.details["matches"] = len(matches)
+        metrics.write_report(report_path)
+    return matches
+
+
+if __name__ == "__main__":
+    # Get the path from the user, absolute so every listing shows the same paths
+    path = os.path.abspath(input("Enter the path to list files: "))
+
+    # Ask if the user wants to search recursively
+    recursive = input("Search recursively? (y/n) ").lower() == 'y'
+
+    # Ask for the text to look for inside the files
+    text = input("Enter the text to search for in the files (or press Enter to list all files) ")
+
+    if text:
+        ignore_case = input("Ignore case? (y/n) ").lower() == 'y'
+        include_binary = input("Also search binary files, e.g. .uasset? (y/n) ").lower() == 'y'
+        use_index = input("Use the text index (faster on repeat searches)? (y/n) ").lower() == 'y'
+    else:
+        # Ask how many of the most recent files to show
+        top = input("Show only the N most recently edited files (or press Enter for all) ").strip()
+        top = int(top) if top else None
 
-# Ask if the user wants to search recursively
-recursive = input("Search recursively? (y/n) ").lower() == 'y'
+        # Unsorted, but nothing is held in memory and the first files show up at once
+        stream = top is None and input("Write files as they are found, unsorted? (y/n) ").lower() == 'y'
 
-# List the files by last edited date
-file_list = list_files_by_date(path, recursive)
+    output_format = input(f"Output format ({', '.join(OUTPUT_FORMATS)}, or press Enter for text) ").strip().lower()
+    while output_format not in OUTPUT_FORMATS + ("",):
+        output_format = input(f"Please enter one of {', '.join(OUTPUT_FORMATS)}: ").strip().lower()
+    output_path = input("Write the list to a file (or press Enter to print it) ").strip()
+    report_path = input("Write a JSON run report to (or press Enter to skip) ").strip() or None
 
-# Print the file list
-for file_path, last_edited in file_list:
-    last_edited_datetime = datetime.fromtimestamp(last_edited)
-    print(f"{file_path} - Last edited: {last_edited_datetime.strftime('%Y-%m-%d %H:%M:%S')}")
+    out = open(output_path, 'w', encoding='utf-8', newline='') if output_path else sys.stdout
+    try:
+        if text:
+            # Search the files, still sorted by last edited date
+            matches = search_files(path, text, recursive, ignore_case, include_binary, use_index,
+                                   report_path=report_path)
+            write_files(matches, out, output_format or "text",
+                        lambda file_path, last_edited, count:
+                        f"{file_path} - Last edited: {format_time(last_edited)} - {count} matches",
+                        extra_columns=("matches",))
+            summary = f"Found '{text}' in {len(matches)} files"
+        else:
+            # List the files by last edited date
+            metrics = RunMetrics("list")
+            with metrics.stage("scan"):
+                file_list = scan_file_times(path, recursive) if stream else list_files_by_date(path, recursive, top)
+            with metrics.stage("write"):
+                count = write_files(file_list, out, output_format or "text",
+                                    lambda file_path, last_edited: f"{file_path} - Last edited: {format_time(last_edited)}")
+            metrics.items.add(count)
+            metrics.finish()
+            if report_path:
+                metrics.write_report(report_path)
+            summary = f"Listed {count} files"
+    finally:
+        if output_path:
+            out.close()
+    print(f"\n{summary}" + (f", written to {output_path}" if output_path else ""))
 
-# Wait for user input to close
-input("Press Enter to close...")
\ No newline at end of file
+    # Wait for user input to close
+    input("Press Enter to close...")
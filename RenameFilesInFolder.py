@@ -1,21 +1,280 @@
+import os
+import re
+import json
+import tempfile
+import contextlib
+from _Progress import RunMetrics
 
+# Journal of the last batch of renames in a folder, used to undo it
+JOURNAL_NAME = ".rename_journal.jsonl"
 
-import os
 
-# Input the folder path, string1, and string2
-folder_path = input("Enter the folder path: ")
-string1 = input("Enter the string to replace: ")
-string2 = input("Enter the new string: ")
-
-# Go through all files in the folder
-for filename in os.listdir(folder_path):
-    # Check if the file name contains string1
-    if string1 in filename:
-        # Create the new file name by replacing string1 with string2
-        new_filename = filename.replace(string1, string2)
-        # Get the full old and new file paths
-        old_file_path = os.path.join(folder_path, filename)
-        new_file_path = os.path.join(folder_path, new_filename)
-        # Rename the file
-        os.rename(old_file_path, new_file_path)
-        print(f'Renamed: {filename} -> {new_filename}')
+def build_renamer(string1, string2, regex=False):
+    """
+    Returns a function mapping a file name to its new name.
+
+    Args:
+        string1 (str): The string to replace, or a regular expression.
+        string2 (str): The new string. In regex mode it may use group
+                       references like \\1 or \\g<name>.
+        regex (bool): Treat string1 as a regular expression.
+
+    Returns:
+        callable: name -> new name.
+    """
+    if regex:
+        pattern = re.compile(string1)
+        return lambda name: pattern.sub(string2, name)
+    return lambda name: name.replace(string1, string2)
+
+
+def list_folders(folder_path, recursive=False):
+    """
+    Lists the names in the folder, and in all its subfolders if recursive,
+    in a single pass.
+
+    Returns:
+        list: (folder path, list of names) tuples, deepest folders first.
+    """
+    if not recursive:
+        return [(folder_path, os.listdir(folder_path))]
+    folders = [(root, dirs + files) for root, dirs, files in os.walk(folder_path)]
+    folders.sort(key=lambda folder: folder[0].count(os.sep), reverse=True)
+    return folders
+
+
+def _is_valid_name(name):
+    return name not in ('', os.curdir, os.pardir) and os.sep not in name and (os.altsep or os.sep) not in name
+
+
+def plan_folder(names, renamer):
+    """
+    Plans the renames within one folder.
+
+    A rename is dropped as a conflict when its new name is invalid, is
+    also the new name of another rename, or belongs to a file that keeps
+    its name. Dropping a rename keeps that file's name, which can cause
+    more conflicts, so this repeats until the plan is stable. Names are
+    compared with os.path.normcase, so case-insensitive file systems are
+    handled.
+
+    Args:
+        names (list): The names in the folder.
+        renamer (callable): name -> new name.
+
+    Returns:
+        tuple: (dict old name -> new name, list of (old name, new name) conflicts).
+    """
+    mapping = {}
+    conflicts = []
+    for name in names:
+        if name.startswith(JOURNAL_NAME):
+            continue
+        new_name = renamer(name)
+        if new_name == name:
+            continue
+        if _is_valid_name(new_name):
+            mapping[name] = new_name
+        else:
+            conflicts.append((name, new_name))
+
+    while True:
+        staying = {os.path.normcase(name) for name in names if name not in mapping}
+        targets = {}
+        for name, new_name in mapping.items():
+            targets.setdefault(os.path.normcase(new_name), []).append(name)
+
+        dropped = [name for key, sources in targets.items() if key in staying or len(sources) > 1
+                   for name in sources]
+        if not dropped:
+            return mapping, conflicts
+        for name in dropped:
+            conflicts.append((name, mapping.pop(name)))
+
+
+def order_folder(mapping, names):
+    """
+    Orders the renames of one folder so that no rename hits a name that is
+    still in use.
+
+    A rename whose new name is still held by another file waits for that
+    file to be renamed first (chains like A->B, B->C). As every new name
+    has a single source, the renames form separate chains and cycles, and
+    one walk over them orders everything. A cycle (swaps like A->B, B->A)
+    is broken by moving its first file to a temporary name, which costs
+    one extra rename per cycle.
+
+    Returns:
+        list: (old name, new name) steps in execution order.
+    """
+    source_by_key = {os.path.normcase(name): name for name in mapping}
+    used = {os.path.normcase(name) for name in names} | {os.path.normcase(name) for name in mapping.values()}
+    steps = []
+    done = set()
+    for start in mapping:
+        if start in done:
+            continue
+        chain = []
+        in_chain = set()
+        name = start
+        while name is not None and name not in done and name not in in_chain:
+            chain.append(name)
+            in_chain.add(name)
+            holder = source_by_key.get(os.path.normcase(mapping[name]))
+            name = holder if holder != name else None
+
+        if name is not None and name in in_chain:
+            # The chain loops back on itself: park the looping file on a free name
+            counter = 0
+            temp_name = f"{name}.renametmp"
+            while os.path.normcase(temp_name) in used:
+                counter += 1
+                temp_name = f"{name}.renametmp{counter}"
+            used.add(os.path.normcase(temp_name))
+            steps.append((name, temp_name))
+            for item in reversed(chain):
+                steps.append((temp_name if item == name else item, mapping[item]))
+        else:
+            steps.extend((item, mapping[item]) for item in reversed(chain))
+        done.update(chain)
+    return steps
+
+
+def plan_renames(folder_path, string1, string2, regex=False, recursive=False):
+    """
+    Plans a batch rename of the files and folders in folder_path.
+
+    The folder tree is listed once and every rename is worked out in
+    memory. The steps of deeper folders come first, so the parent path of
+    every step is still valid when it runs.
+
+    Returns:
+        tuple: (list of (old path, new path) steps in execution order,
+                list of (old path, new name) conflicts).
+    """
+    renamer = build_renamer(string1, string2, regex)
+    steps = []
+    conflicts = []
+    for folder, names in list_folders(folder_path, recursive):
+        mapping, folder_conflicts = plan_folder(names, renamer)
+        conflicts.extend((os.path.join(folder, name), new_name) for name, new_name in folder_conflicts)
+        steps.extend((os.path.join(folder, old_name), os.path.join(folder, new_name))
+                     for old_name, new_name in order_folder(mapping, names))
+    return steps, conflicts
+
+
+def apply_renames(folder_path, steps, metrics=None):
+    """
+    Runs the planned renames, one os.rename per step.
+
+    Every completed step is written to a new journal, which replaces the
+    journal of the previous batch once the whole batch has succeeded. If a
+    step fails, the completed steps are undone and the previous journal is
+    kept, so it still matches the folder.
+
+    Args:
+        metrics (RunMetrics): Counts the completed steps and times the
+                              rename stage, if given.
+
+    Returns:
+        int: Number of completed steps.
+    """
+    if not steps:
+        return 0
+
+    journal_path = os.path.join(folder_path, JOURNAL_NAME)
+    file_descriptor, temp_path = tempfile.mkstemp(prefix=f"{JOURNAL_NAME}.", suffix=".tmp", dir=folder_path)
+    stage = metrics.stage if metrics else lambda name: contextlib.nullcontext()
+    completed = 0
+    try:
+        with stage("rename"), os.fdopen(file_descriptor, 'w', encoding='utf-8') as journal:
+            for old_path, new_path in steps:
+                os.rename(old_path, new_path)
+                journal.write(json.dumps([old_path, new_path]) + "\n")
+                completed += 1
+                if metrics:
+                    metrics.items.add()
+    except BaseException:
+        _roll_back(steps[:completed], temp_path, journal_path)
+        raise
+    os.replace(temp_path, journal_path)
+    return completed
+
+
+def _roll_back(steps, temp_path, journal_path):
+    undone = 0
+    try:
+        for old_path, new_path in reversed(steps):
+            os.rename(new_path, old_path)
+            undone += 1
+    except OSError:
+        # The folder no longer matches the previous journal: keep the steps
+        # that are still to be undone instead, so undo_renames can finish
+        with open(temp_path, 'w', encoding='utf-8') as journal:
+            journal.writelines(json.dumps(step) + "\n" for step in steps[:len(steps) - undone])
+        os.replace(temp_path, journal_path)
+        return
+    os.remove(temp_path)
+
+
+def undo_renames(folder_path):
+    """
+    Undoes the last batch of renames in folder_path, using its journal.
+
+    If an undo step fails, the journal keeps the steps that are still to
+    be undone, so the undo can be run again.
+
+    Returns:
+        int: Number of renames undone, 0 if there is nothing to undo.
+    """
+    journal_path = os.path.join(folder_path, JOURNAL_NAME)
+    if not os.path.exists(journal_path):
+        return 0
+    with open(journal_path, 'r', encoding='utf-8') as journal:
+        steps = [json.loads(line) for line in journal if line.strip()]
+
+    undone = 0
+    try:
+        for old_path, new_path in reversed(steps):
+            os.rename(new_path, old_path)
+            undone += 1
+    finally:
+        remaining = steps[:len(steps) - undone]
+        if remaining:
+            with open(journal_path, 'w', encoding='utf-8') as journal:
+                journal.writelines(json.dumps(step) + "\n" for step in remaining)
+        else:
+            os.remove(journal_path)
+    return undone
+
+
+if __name__ == "__main__":
+    # Input the folder path, string1, and string2
+    folder_path = input("Enter the folder path: ")
+    undo = input("Undo the last batch of renames in this folder instead? (y/N): ").strip().lower() == 'y'
+
+    if undo:
+        print(f"Undid {undo_renames(folder_path)} renames")
+    else:
+        string1 = input("Enter the string to replace: ")
+        string2 = input("Enter the new string: ")
+        regex = input("Treat the string to replace as a regular expression? (y/n): ").strip().lower() == 'y'
+        recursive = input("Include subfolders? (y/n): ").strip().lower() == 'y'
+        report_path = input("Write a JSON run report to (or press Enter to skip): ").strip() or None
+
+        # Plan every rename before touching the folder
+        metrics = RunMetrics("rename")
+        with metrics.stage("scan"):
+            steps, conflicts = plan_renames(folder_path, string1, string2, regex, recursive)
+        metrics.total = len(steps)
+        for old_path, new_name in conflicts:
+            print(f"Skipped: {os.path.relpath(old_path, folder_path)} -> {new_name} (name already taken or invalid)")
+
+        apply_renames(folder_path, steps, metrics)
+        metrics.finish()
+        for old_path, new_path in steps:
+            print(f'Renamed: {os.path.relpath(old_path, folder_path)} -> {os.path.basename(new_path)}')
+
+        if report_path:
+            metrics.details["conflicts"] = len(conflicts)
+            metrics.write_report(report_path)
@@ -1,32 +1,478 @@
 import os
+import re
+import mmap
+import tempfile
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from _Progress import ProgressRenderer, RunMetrics
 
-def replace_hex(file_path, source_string, new_string):
-    # Open file in binary read mode
-    with open(file_path, 'rb') as file:
-        content = file.read()
+# Size of the pieces read or copied at once, so memory use does not grow with the file
+CHUNK_SIZE = 4 * 1024 * 1024
 
+# How typed patterns are turned into bytes. UE stores many names as UTF-16LE.
+PATTERN_ENCODINGS = ("hex", "utf-8", "utf-16-le")
+
+
+def _iter_offsets_chunked(file, pattern):
+    # Keeps the last len(pattern) - 1 bytes of every chunk, so matches that
+    # span a chunk boundary are still found
+    file.seek(0)
+    buffer = b""
+    buffer_start = 0
+    search_from = 0
+    while True:
+        chunk = file.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        buffer += chunk
+
+        index = buffer.find(pattern, search_from)
+        while index != -1:
+            yield buffer_start + index
+            search_from = index + len(pattern)
+            index = buffer.find(pattern, search_from)
+
+        keep_from = max(len(buffer) - (len(pattern) - 1), search_from)
+        buffer = buffer[keep_from:]
+        buffer_start += keep_from
+        search_from = max(search_from - keep_from, 0)
+
+
+def iter_match_offsets(file, pattern):
+    """
+    Yields the offsets of all non-overlapping matches of pattern in a file,
+    leftmost first, the same matches bytes.replace would replace.
+
+    The file is searched through a read-only mmap, or in chunks when it
+    cannot be mapped (empty files, some network filesystems). Either way,
+    memory use stays constant no matter how large the file is.
+
+    Args:
+        file: A file object opened in binary read mode.
+        pattern (bytes): The byte pattern to search for.
+
+    Yields:
+        int: The offset of each match.
+    """
+    try:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError):
+        yield from _iter_offsets_chunked(file, pattern)
+        return
+
+    with mapped:
+        offset = mapped.find(pattern)
+        while offset != -1:
+            yield offset
+            offset = mapped.find(pattern, offset + len(pattern))
+
+
+def _copy_range(source, destination, start, end):
+    source.seek(start)
+    remaining = end - start
+    while remaining:
+        chunk = source.read(min(remaining, CHUNK_SIZE))
+        if not chunk:
+            break
+        destination.write(chunk)
+        remaining -= len(chunk)
+
+
+def patch_in_place(file_path, edits):
+    """
+    Applies length-preserving edits to a file in place.
+
+    Args:
+        file_path (str): Path to the file.
+        edits: Iterable of (offset, length, new_bytes) tuples where
+               len(new_bytes) == length. It is consumed lazily, so it may
+               read from the same file.
+
+    Returns:
+        int: The number of edits applied.
+    """
+    count = 0
+    writer = None
+    try:
+        for offset, _, new_bytes in edits:
+            # Only open for writing once there is something to patch
+            if writer is None:
+                writer = open(file_path, 'r+b')
+            writer.seek(offset)
+            writer.write(new_bytes)
+            count += 1
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def rewrite_file(file_path, edits):
+    """
+    Applies edits of any length by streaming the file into a temporary file
+    next to it, which is then swapped in atomically. Nothing is written when
+    there are no edits.
+
+    Args:
+        file_path (str): Path to the file.
+        edits: Iterable of (offset, length, new_bytes) tuples in ascending,
+               non-overlapping order. It is consumed lazily, so it may read
+               from the same file.
+
+    Returns:
+        int: The number of edits applied.
+    """
+    count = 0
+    directory, filename = os.path.split(os.path.abspath(file_path))
+    temp_path = None
+    try:
+        with open(file_path, 'rb') as copier:
+            position = 0
+            output = None
+            for offset, length, new_bytes in edits:
+                if output is None:
+                    file_descriptor, temp_path = tempfile.mkstemp(prefix=f".{filename}.", suffix=".tmp", dir=directory)
+                    output = os.fdopen(file_descriptor, 'wb')
+                _copy_range(copier, output, position, offset)
+                output.write(new_bytes)
+                position = offset + length
+                count += 1
+
+            if output is None:
+                return 0
+            with output:
+                _copy_range(copier, output, position, os.fstat(copier.fileno()).st_size)
+
+        # The source file must be closed before it can be replaced on Windows
+        os.chmod(temp_path, os.stat(file_path).st_mode & 0o7777)
+        os.replace(temp_path, file_path)
+        temp_path = None
+    finally:
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
+    return count
+
+
+def replace_bytes(file_path, source_bytes, new_bytes, metrics=None):
+    """
+    Replaces all non-overlapping occurrences of source_bytes in a file.
+
+    Same-length replacements are patched in place at the matched offsets.
+    Other replacements are streamed to a temporary file next to the original,
+    which is then swapped in atomically. Files without a match are not
+    written at all.
+
+    Args:
+        file_path (str): Path to the file.
+        source_bytes (bytes): The bytes to search for.
+        new_bytes (bytes): The replacement bytes.
+        metrics (RunMetrics): Counts the file and its bytes and times the
+                              replace stage, if given.
+
+    Returns:
+        int: The number of replacements made.
+    """
+    if not source_bytes:
+        raise ValueError("The source pattern must not be empty")
+
+    stage = metrics.stage if metrics else lambda name: contextlib.nullcontext()
+    with stage("replace"):
+        edits = _iter_edits(file_path, source_bytes, new_bytes)
+        if len(source_bytes) == len(new_bytes):
+            count = patch_in_place(file_path, edits)
+        else:
+            count = rewrite_file(file_path, edits)
+    if metrics:
+        metrics.items.add()
+        metrics.bytes.add(os.path.getsize(file_path))
+    return count
+
+
+def _iter_edits(file_path, source_bytes, new_bytes):
+    # The file is closed as soon as the edits are exhausted, before rewrite_file replaces it
+    with open(file_path, 'rb') as reader:
+        for offset in iter_match_offsets(reader, source_bytes):
+            yield offset, len(source_bytes), new_bytes
+
+
+def parse_hex(text):
+    """
+    Parses a hex byte pattern such as "DE AD BE EF", "deadbeef" or
+    "0xDE,0xAD".
+
+    Args:
+        text (str): The hex pattern.
+
+    Returns:
+        bytes: The pattern bytes.
+    """
+    digits = re.sub(r"0x|[\s,:-]", "", text, flags=re.IGNORECASE)
+    if not digits or len(digits) % 2 or not re.fullmatch(r"[0-9a-fA-F]+", digits):
+        raise ValueError(f"Not a hex byte pattern: {text}")
+    return bytes.fromhex(digits)
+
+
+def encode_pattern(text, encoding):
+    """
+    Turns a typed pattern into bytes.
+
+    Args:
+        text (str): The pattern as typed.
+        encoding (str): One of PATTERN_ENCODINGS.
+
+    Returns:
+        bytes: The pattern bytes.
+    """
+    if encoding == "hex":
+        return parse_hex(text)
+    if encoding not in PATTERN_ENCODINGS:
+        raise ValueError(f"Unknown pattern encoding: {encoding}")
+    return text.encode(encoding)
+
+
+def scan_file(file_path, pattern):
+    """
+    Finds the offsets of all non-overlapping matches of pattern in a file.
+
+    Args:
+        file_path (str): Path to the file.
+        pattern (bytes): The byte pattern.
+
+    Returns:
+        tuple: (file_path, offsets, file size, error message or None).
+    """
+    try:
+        with open(file_path, 'rb') as file:
+            return file_path, list(iter_match_offsets(file, pattern)), os.fstat(file.fileno()).st_size, None
+    except OSError as e:
+        return file_path, [], 0, str(e)
+
+
+def patch_file(file_path, offsets, source_bytes, new_bytes):
+    """
+    Writes new_bytes over source_bytes at the given offsets, in place. Every
+    offset is checked first, so a file that changed since it was scanned is
+    never patched at a wrong position.
+
+    Args:
+        file_path (str): Path to the file.
+        offsets (list): Offsets found by scan_file.
+        source_bytes (bytes): The bytes expected at every offset.
+        new_bytes (bytes): The replacement, of the same length.
+
+    Returns:
+        tuple: (file_path, patched count, skipped count, error message or None).
+    """
+    patched = skipped = 0
+    try:
+        with open(file_path, 'r+b') as file:
+            for offset in offsets:
+                file.seek(offset)
+                if file.read(len(source_bytes)) != source_bytes:
+                    skipped += 1
+                    continue
+                file.seek(offset)
+                file.write(new_bytes)
+                patched += 1
+    except OSError as e:
+        return file_path, patched, skipped, str(e)
+    return file_path, patched, skipped, None
+
+
+def list_tree_files(root, extensions=None):
+    """
+    Lists every file under root, optionally only the given extensions.
+
+    Args:
+        root (str): The folder to walk.
+        extensions (tuple): Lower-case extensions such as (".uasset", ".uexp"),
+                            or None for all files.
+
+    Returns:
+        list: The file paths.
+    """
+    file_paths = []
+    for folder, _, files in os.walk(root):
+        for file in files:
+            if extensions is None or file.lower().endswith(extensions):
+                file_paths.append(os.path.join(folder, file))
+    return file_paths
+
+
+def scan_tree(root, pattern, extensions=None, workers=None, metrics=None):
+    """
+    Scans every file under root for pattern in a process pool.
+
+    Args:
+        root (str): The folder to scan.
+        pattern (bytes): The byte pattern.
+        extensions (tuple): Extensions to scan, or None for all files.
+        workers (int): Number of worker processes (default: CPU count).
+        metrics (RunMetrics): Counts the files and bytes scanned and times
+                              the scan and read stages, if given.
+
+    Returns:
+        dict: File path -> list of match offsets, only for files with matches.
+    """
+    metrics = metrics or RunMetrics("scan tree")
+    with metrics.stage("scan"):
+        file_paths = list_tree_files(root, extensions)
+    metrics.total = len(file_paths)
+
+    matches = {}
+    with metrics.stage("read"), ProgressRenderer(metrics), ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(file_paths) // ((workers or os.cpu_count() or 1) * 8))
+        for file_path, offsets, size, error in executor.map(scan_file, file_paths, [pattern] * len(file_paths),
+                                                            chunksize=chunksize):
+            metrics.items.add()
+            metrics.bytes.add(size)
+            if error:
+                metrics.errors.add()
+                metrics.log(f"Error scanning {file_path}: {error}")
+            elif offsets:
+                matches[file_path] = offsets
+    print(f"Scanned {len(file_paths)} files, {len(matches)} with matches")
+    metrics.details.update(scanned=len(file_paths), matched_files=len(matches),
+                           matches=sum(len(offsets) for offsets in matches.values()))
+    return matches
+
+
+def print_offset_report(root, matches):
+    for file_path, offsets in sorted(matches.items()):
+        shown = ", ".join(f"0x{offset:08X}" for offset in offsets[:16])
+        more = f" (+{len(offsets) - 16} more)" if len(offsets) > 16 else ""
+        print(f"{os.path.relpath(file_path, root)}: {len(offsets)} matches at {shown}{more}")
+
+
+def patch_tree(matches, source_bytes, new_bytes, workers=None, metrics=None):
+    """
+    Applies length-preserving patches at the offsets found by scan_tree, in
+    a process pool. Files without matches are never opened for writing.
+
+    Args:
+        matches (dict): File path -> list of match offsets.
+        source_bytes (bytes): The bytes expected at every offset.
+        new_bytes (bytes): The replacement, of the same length.
+        workers (int): Number of worker processes (default: CPU count).
+        metrics (RunMetrics): Counts the errors and times the write stage,
+                              if given.
+
+    Returns:
+        int: The total number of patches written.
+    """
+    if len(source_bytes) != len(new_bytes):
+        raise ValueError("Tree patches must keep the pattern length "
+                         f"({len(source_bytes)} bytes -> {len(new_bytes)} bytes)")
+
+    metrics = metrics or RunMetrics("patch tree")
+    total = 0
+    file_paths = list(matches)
+    count = len(file_paths)
+    with metrics.stage("write"), ProcessPoolExecutor(max_workers=workers) as executor:
+        for file_path, patched, skipped, error in executor.map(patch_file, file_paths, [matches[path] for path in file_paths],
+                                                               [source_bytes] * count, [new_bytes] * count):
+            total += patched
+            if error:
+                metrics.errors.add()
+                print(f"Error patching {file_path}: {error}")
+            elif skipped:
+                print(f"Skipped {skipped} offsets in {file_path} that changed since the scan")
+    print(f"Patched {total} matches in {count} files")
+    metrics.details["patched"] = total
+    return total
+
+
+def replace_in_tree(root, source_bytes, new_bytes, extensions=None, dry_run=True, workers=None, metrics=None):
+    """
+    Finds source_bytes in every file under root and, unless dry_run is set,
+    patches it with new_bytes in place.
+
+    Args:
+        root (str): The folder to process.
+        source_bytes (bytes): The bytes to search for.
+        new_bytes (bytes): The replacement, of the same length.
+        extensions (tuple): Extensions to process, or None for all files.
+        dry_run (bool): Only report the match offsets.
+        workers (int): Number of worker processes (default: CPU count).
+        metrics (RunMetrics): Collects the scan and patch metrics, see
+                              scan_tree and patch_tree.
+
+    Returns:
+        dict: File path -> list of match offsets.
+    """
+    metrics = metrics or RunMetrics("replace in tree")
+    matches = scan_tree(root, source_bytes, extensions, workers, metrics)
+    print_offset_report(root, matches)
+    if not dry_run and matches:
+        patch_tree(matches, source_bytes, new_bytes, workers, metrics)
+    return matches
+
+
+def tree_main(root, report_path=None):
+    extensions = input("File extensions to scan (e.g. .uasset .uexp, or press Enter for all files): ").split()
+    extensions = tuple(extension.lower() if extension.startswith('.') else '.' + extension.lower()
+                       for extension in extensions) or None
+
+    while True:
+        encoding = input(f"Pattern type ({', '.join(PATTERN_ENCODINGS)}) or 'exit' to quit: ").strip().lower()
+        if encoding == 'exit':
+            print("Exiting...")
+            break
+        if encoding not in PATTERN_ENCODINGS:
+            print(f"Please enter one of: {', '.join(PATTERN_ENCODINGS)}")
+            continue
+
+        try:
+            source_bytes = encode_pattern(input("Enter the source pattern: "), encoding)
+            new_bytes = encode_pattern(input("Enter the new pattern: "), encoding)
+        except ValueError as e:
+            print(e)
+            continue
+        if len(source_bytes) != len(new_bytes):
+            print(f"Patterns must have the same length ({len(source_bytes)} bytes vs {len(new_bytes)} bytes)")
+            continue
+
+        metrics = RunMetrics("replace in tree")
+        matches = replace_in_tree(root, source_bytes, new_bytes, extensions, dry_run=True, metrics=metrics)
+        if matches and input("Apply these patches? (y/n): ").strip().lower() == 'y':
+            patch_tree(matches, source_bytes, new_bytes, metrics=metrics)
+        metrics.finish()
+        if report_path:
+            metrics.write_report(report_path)
+
+
+def replace_hex(file_path, source_string, new_string, report_path=None):
     # Convert source and new strings to bytes
     source_bytes = source_string.encode('utf-8')
     new_bytes = new_string.encode('utf-8')
 
-    # Check if the source string exists in the content
-    if source_bytes in content:
-        replaced_content = content.replace(source_bytes, new_bytes)
-        # Open file in binary write mode and save the replaced content
-        with open(file_path, 'wb') as file:
-            file.write(replaced_content)
-        print(f"Replaced all instances of '{source_string}' with '{new_string}' in {file_path}")
+    metrics = RunMetrics("replace hex", 1)
+    count = replace_bytes(file_path, source_bytes, new_bytes, metrics)
+    metrics.finish()
+    if count:
+        print(f"Replaced {count} instances of '{source_string}' with '{new_string}' in {file_path}")
     else:
         print(f"Source string '{source_string}' not found in the file.")
 
+    if report_path:
+        metrics.details["replaced"] = count
+        metrics.write_report(report_path)
+
+
 def main():
-    file_path = input("Enter the file path: ")
-    
+    file_path = input("Enter the file or folder path: ")
+
     # Check if the file exists
     if not os.path.exists(file_path):
         print(f"Error: File at path {file_path} does not exist.")
         return
 
+    report_path = input("Write a JSON run report to (or press Enter to skip): ").strip() or None
+
+    if os.path.isdir(file_path):
+        tree_main(file_path, report_path)
+        return
+
     while True:
         source_string = input("Enter the source string (or type 'exit' to quit): ")
         if source_string.lower() == 'exit':
@@ -35,7 +481,7 @@ def main():
 
         new_string = input("Enter the new string: ")
 
-        replace_hex(file_path, source_string, new_string)
+        replace_hex(file_path, source_string, new_string, report_path)
 
 if __name__ == "__main__":
     main()
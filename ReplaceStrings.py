@@ -1,41 +1,212 @@
 import os
+import re
+import csv
+import json
+import mmap
+import contextlib
+from ReplaceHexString import CHUNK_SIZE, patch_in_place, rewrite_file
+from _Progress import RunMetrics
 
-def replace_hex(file_path, source_string, new_string):
-    # Open file in binary read mode
+
+def load_mapping(mapping_path):
+    """
+    Loads source -> new string pairs from a CSV or JSON file.
+
+    CSV files hold one "source,new" pair per row; a "source,new" header row
+    and rows starting with '#' are skipped. JSON files hold either an object
+    {"source": "new", ...} or a list of [source, new] pairs.
+
+    Args:
+        mapping_path (str): Path to the .csv or .json mapping file.
+
+    Returns:
+        dict: The source -> new string mapping, in file order.
+    """
+    with open(mapping_path, 'r', encoding='utf-8', newline='') as file:
+        if mapping_path.lower().endswith(".json"):
+            data = json.load(file)
+            pairs = data.items() if isinstance(data, dict) else data
+        else:
+            pairs = [row for row in csv.reader(file)
+                     if row and not row[0].startswith('#') and [cell.lower() for cell in row] != ["source", "new"]]
+
+    mapping = {}
+    for pair in pairs:
+        if len(pair) != 2:
+            raise ValueError(f"Expected a source and a new string, got: {pair}")
+        source_string, new_string = pair
+        if not source_string:
+            raise ValueError("Source strings must not be empty")
+        mapping[source_string] = new_string
+    return mapping
+
+
+def _trie_regex(node):
+    branches = [re.escape(bytes([byte])) + _trie_regex(node[byte])
+                for byte in sorted(key for key in node if key is not None)]
+    if not branches:
+        return b""
+    group = branches[0] if len(branches) == 1 else b"(?:" + b"|".join(branches) + b")"
+    if None in node:
+        # A source ends here: the longer continuations are optional and greedy,
+        # so the longest source matching at a position always wins
+        return b"(?:" + group + b")?"
+    return group
+
+
+def compile_matcher(sources):
+    """
+    Compiles byte strings into a single regex that finds all of them in one
+    scan, with leftmost-longest, non-overlapping semantics.
+
+    The sources are merged into a trie first, like the goto function of an
+    Aho-Corasick automaton, so shared prefixes are only tested once and
+    every step of the match has at most one branch to follow. The scan
+    itself runs in the C regex engine.
+
+    Args:
+        sources (iterable): The byte strings to search for.
+
+    Returns:
+        re.Pattern: The compiled bytes pattern.
+    """
+    trie = {}
+    for source in sources:
+        node = trie
+        for byte in source:
+            node = node.setdefault(byte, {})
+        node[None] = True
+    return re.compile(_trie_regex(trie))
+
+
+def _iter_matches_chunked(file, matcher, max_length):
+    # Matches starting within max_length - 1 bytes of the end of the buffer
+    # could still grow longer, so they are left for the next chunk
+    buffer = b""
+    buffer_start = 0
+    while True:
+        chunk = file.read(CHUNK_SIZE)
+        buffer += chunk
+        cut = len(buffer) if not chunk else max(len(buffer) - (max_length - 1), 0)
+
+        position = 0
+        for match in matcher.finditer(buffer):
+            if match.start() >= cut:
+                break
+            yield buffer_start + match.start(), match.group()
+            position = match.end()
+
+        if not chunk:
+            return
+        keep_from = max(cut, position)
+        buffer = buffer[keep_from:]
+        buffer_start += keep_from
+
+
+def _iter_matches(file, matcher, max_length):
+    try:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError):
+        yield from _iter_matches_chunked(file, matcher, max_length)
+        return
+
+    with mapped:
+        for match in matcher.finditer(mapped):
+            yield match.start(), match.group()
+
+
+def _iter_edits(file_path, matcher, replacements, hits):
+    # The file is closed as soon as the edits are exhausted, before rewrite_file replaces it
+    max_length = max(len(source) for source in replacements)
     with open(file_path, 'rb') as file:
-        content = file.read()
-
-    # Convert source and new strings to bytes
-    source_bytes = source_string.encode('utf-8')
-    new_bytes = new_string.encode('utf-8')
-
-    # Check if the source string exists in the content
-    if source_bytes in content:
-        replaced_content = content.replace(source_bytes, new_bytes)
-        # Open file in binary write mode and save the replaced content
-        with open(file_path, 'wb') as file:
-            file.write(replaced_content)
-        print(f"Replaced all instances of '{source_string}' with '{new_string}' in {file_path}")
-    else:
-        print(f"Source string '{source_string}' not found in the file.")
+        for offset, source in _iter_matches(file, matcher, max_length):
+            hits[source] += 1
+            yield offset, len(source), replacements[source]
+
+
+def replace_strings(file_path, mapping, metrics=None):
+    """
+    Replaces every source string of the mapping with its new string, in a
+    single read and a single write of the file.
+
+    All sources are matched at once, so a replacement is never fed into a
+    later pair, and where sources overlap the leftmost, then longest, one
+    wins. When every pair keeps its length the file is patched in place,
+    otherwise it is streamed to a temporary file that is swapped in.
+
+    Args:
+        file_path (str): Path to the file.
+        mapping (dict): Source string -> new string.
+        metrics (RunMetrics): Counts the file and its bytes and times the
+                              replace stage, if given.
+
+    Returns:
+        dict: Source string -> number of replacements made.
+    """
+    replacements = {source.encode('utf-8'): new.encode('utf-8') for source, new in mapping.items()}
+    if not replacements or b"" in replacements:
+        raise ValueError("The mapping needs at least one non-empty source string")
+
+    matcher = compile_matcher(replacements)
+    hits = dict.fromkeys(replacements, 0)
+    edits = _iter_edits(file_path, matcher, replacements, hits)
+
+    stage = metrics.stage if metrics else lambda name: contextlib.nullcontext()
+    with stage("replace"):
+        if all(len(source) == len(new) for source, new in replacements.items()):
+            patch_in_place(file_path, edits)
+        else:
+            rewrite_file(file_path, edits)
+    if metrics:
+        metrics.items.add()
+        metrics.bytes.add(os.path.getsize(file_path))
+
+    return {source.decode('utf-8'): count for source, count in hits.items()}
+
+
+def print_hit_report(file_path, hits, mapping):
+    total = sum(hits.values())
+    print(f"\nReplaced {total} instances in {file_path}")
+    print("-" * 60)
+    for source_string, count in sorted(hits.items(), key=lambda item: item[1], reverse=True):
+        print(f"{count:>8}  '{source_string}' -> '{mapping[source_string]}'")
+
 
 def main():
     file_path = input("Enter the file path: ")
-    
+
     # Check if the file exists
     if not os.path.exists(file_path):
         print(f"Error: File at path {file_path} does not exist.")
         return
 
-    while True:
-        source_string = input("Enter the source string (or type 'exit' to quit): ")
-        if source_string.lower() == 'exit':
-            print("Exiting...")
-            break
+    mapping_path = input("Enter the path to a CSV/JSON mapping file (or press Enter to type the pairs): ").strip()
+    if mapping_path:
+        mapping = load_mapping(mapping_path)
+    else:
+        mapping = {}
+        while True:
+            source_string = input("Enter the source string (or type 'exit' to apply all pairs): ")
+            if source_string.lower() == 'exit':
+                break
+
+            new_string = input("Enter the new string: ")
+            mapping[source_string] = new_string
+
+    if not mapping:
+        print("No pairs to replace. Exiting...")
+        return
+
+    report_path = input("Write a JSON run report to (or press Enter to skip): ").strip() or None
 
-        new_string = input("Enter the new string: ")
+    metrics = RunMetrics("replace strings", 1)
+    hits = replace_strings(file_path, mapping, metrics)
+    metrics.finish()
+    print_hit_report(file_path, hits, mapping)
 
-        replace_hex(file_path, source_string, new_string)
+    if report_path:
+        metrics.details["hits"] = hits
+        metrics.write_report(report_path)
 
 if __name__ == "__main__":
     main()
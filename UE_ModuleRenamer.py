@@ -1,51 +1,369 @@
-# This is an older script used for renaming a UE code module. 
+# This is an older script used for renaming a UE code module.
 # What I would do is copy and paste an existing module with all it's content, and just use this to batch rename all instances of the Module name in the file contents and name.
 
 import os
-import fileinput
+import re
+import time
+import codecs
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from _FileUtils import write_atomic
+from _Progress import ProgressRenderer, RunMetrics
 
-def is_text_file(file_path):
+# Only the first block of a file is read to tell text from binary
+SNIFF_SIZE = 8192
+
+# Byte order marks of the UTF-16 text files the engine sometimes writes
+BOM_ENCODINGS = ((codecs.BOM_UTF16_LE, 'utf-16-le'), (codecs.BOM_UTF16_BE, 'utf-16-be'))
+
+# Changed lines shown per file in the preview
+PREVIEW_LINES = 5
+
+
+def sniff_encoding(block):
+    """
+    Guesses the text encoding of a file from its first block.
+
+    Returns 'utf-8', 'utf-16-le' or 'utf-16-be', or None if the block looks
+    binary (contains NUL bytes or invalid UTF-8).
+    """
+    for bom, encoding in BOM_ENCODINGS:
+        if block.startswith(bom):
+            return encoding
+    if b"\x00" in block:
+        return None
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            f.read()
-        return True
-    except (UnicodeDecodeError, IsADirectoryError, PermissionError):
+        block.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # The block may end in the middle of a multi-byte character
+        if e.reason != 'unexpected end of data':
+            return None
+    return 'utf-8'
+
+
+def build_variant_table(search_text, replace_text, extra_pairs=None):
+    """
+    Builds the table of every spelling of the module name to replace.
+
+    UE spells a module name in several forms: MyModule in class and file
+    names, MYMODULE_API in export macros and include guards, and mymodule
+    in some paths and config keys. The table holds the name as typed, its
+    UPPER_API, UPPER and lower forms, then any extra pairs. When two forms
+    are spelled the same, the earlier one wins.
+
+    Variants only match as whole words of an identifier, see compile_table,
+    so renaming Foo leaves food, footer and FOOTER alone.
+
+    Returns:
+        dict: Source string -> replacement string.
+    """
+    variants = [
+        (search_text, replace_text),
+        (search_text.upper() + "_API", replace_text.upper() + "_API"),
+        (search_text.upper(), replace_text.upper()),
+        (search_text.lower(), replace_text.lower()),
+    ]
+    variants += list((extra_pairs or {}).items())
+
+    table = {}
+    for source, new in variants:
+        if source and source not in table:
+            table[source] = new
+    return table
+
+
+def _identifier_pattern(source):
+    # The characters that would carry on the word at each end of source:
+    # after a lower-case end only lower case and digits do, so FooEditor
+    # still matches Foo, while a lower-case start cannot follow any letter
+    first, last = source[0], source[-1]
+    upper_word = source.isupper()
+    lookbehind = b""
+    if first.isalnum() and not (first.isupper() and not upper_word):
+        lookbehind = b"(?<![A-Z0-9])" if upper_word else b"(?<![A-Za-z0-9])"
+    lookahead = b""
+    if last.isalnum():
+        lookahead = b"(?![A-Z0-9])" if last.isupper() or (last.isdigit() and upper_word) else b"(?![a-z0-9])"
+    return lookbehind + re.escape(source.encode('utf-8')) + lookahead
+
+
+def compile_table(table):
+    """
+    Compiles a variant table into a single matcher.
+
+    Each variant only matches where it is a whole word of an identifier:
+    MyModule matches in FMyModuleModule and MyModule_API but not in
+    MyModules, and mymodule matches in mymodule.build but not in
+    notmymodule. Longer variants are tried first, so the longest variant
+    matching at a position wins.
+
+    Returns:
+        tuple: (compiled bytes regex, UTF-8 source bytes -> replacement bytes).
+    """
+    replacements = {source.encode('utf-8'): new.encode('utf-8') for source, new in table.items()}
+    sources = sorted(table, key=lambda source: len(source.encode('utf-8')), reverse=True)
+    return re.compile(b"|".join(_identifier_pattern(source) for source in sources)), replacements
+
+
+def replace_tokens(data, matcher, replacements):
+    """
+    Replaces every variant in UTF-8 bytes in one scan, leftmost-longest.
+
+    Returns:
+        bytes: The new data, or None if no variant was found.
+    """
+    if matcher.search(data) is None:
+        return None
+    return matcher.sub(lambda match: replacements[match.group()], data)
+
+
+def replace_tokens_in_file(file_path, matcher, replacements, metrics=None):
+    """
+    Replaces every variant in a text file, reading it only once.
+
+    Binary files are rejected after their first block, and files that do not
+    contain any variant are never written. UTF-8 files are edited as bytes,
+    so line endings and everything else stay exactly as they were. The new
+    contents replace the file in one step, so an interrupted run never
+    leaves a truncated file.
+
+    Args:
+        metrics (RunMetrics): Counts the bytes read and times the read,
+                              transform and write stages, if given.
+
+    Returns:
+        bool: True if the file was rewritten.
+    """
+    stage = metrics.stage if metrics else lambda name: contextlib.nullcontext()
+    with stage("read"), open(file_path, 'rb') as f:
+        block = f.read(SNIFF_SIZE)
+        encoding = sniff_encoding(block)
+        if encoding is None:
+            return False
+        data = block + f.read()
+    if metrics:
+        metrics.bytes.add(len(data))
+
+    with stage("transform"):
+        if encoding == 'utf-8':
+            new_data = replace_tokens(data, matcher, replacements)
+        else:
+            new_text = replace_tokens(data.decode(encoding).encode('utf-8'), matcher, replacements)
+            new_data = None if new_text is None else new_text.decode('utf-8').encode(encoding)
+    if new_data is None:
         return False
 
-def replace_text_in_files_and_rename(folder_name, search_text, replace_text):
+    with stage("write"):
+        write_atomic(file_path, new_data)
+    return True
+
+
+def preview_file_edits(file_path, matcher, replacements):
+    """
+    Lists the lines of a text file that replace_tokens_in_file would change,
+    without writing anything.
+
+    Returns:
+        list: (line number, old line, new line) for every changed line, empty
+              for binary files and files without any variant.
+    """
+    with open(file_path, 'rb') as f:
+        block = f.read(SNIFF_SIZE)
+        encoding = sniff_encoding(block)
+        if encoding is None:
+            return []
+        data = block + f.read()
+    if encoding != 'utf-8':
+        data = data.decode(encoding).encode('utf-8')
+    if matcher.search(data) is None:
+        return []
+
+    edits = []
+    for number, line in enumerate(data.splitlines(), 1):
+        new_line = replace_tokens(line, matcher, replacements)
+        if new_line is not None:
+            edits.append((number, line.decode('utf-8', 'replace').strip(), new_line.decode('utf-8', 'replace').strip()))
+    return edits
+
+
+def plan_renames(paths, matcher, replacements):
+    """
+    Works out every file and directory rename before anything is touched.
+
+    Deeper paths come first, so the parents of the remaining paths are still
+    valid when their turn comes. Renames onto a name that already exists, or
+    onto the same new name as another rename, are reported as conflicts and
+    left out of the plan.
+
+    Returns:
+        tuple: (list of (old_path, new_path) in execution order,
+                list of (old_path, new_path, other_path) conflicts, where
+                other_path is the path of the earlier rename to the same new
+                path, or None if new_path already exists).
+    """
+    plan = []
+    conflicts = []
+    taken = {}
+    for path in sorted(paths, key=lambda path: path.count(os.sep), reverse=True):
+        parent, name = os.path.split(path)
+        new_name = replace_tokens(name.encode('utf-8'), matcher, replacements)
+        if new_name is None:
+            continue
+
+        new_path = os.path.join(parent, new_name.decode('utf-8'))
+        if new_path in taken:
+            conflicts.append((path, new_path, taken[new_path]))
+            continue
+        if os.path.exists(new_path):
+            conflicts.append((path, new_path, None))
+            continue
+        taken[new_path] = path
+        plan.append((path, new_path))
+    return plan, conflicts
+
+
+def apply_rename_plan(plan):
+    for old_path, new_path in plan:
+        os.rename(old_path, new_path)
+
+
+def replace_text_in_files_and_rename(folder_name, search_text, replace_text, workers=None, extra_pairs=None,
+                                     confirm=None, report_path=None):
+    """
+    Replaces every spelling of search_text in the contents and names of all
+    files and directories under folder_name.
+
+    The tree is walked once, each text file is read once and scanned once
+    for the whole variant table, and the rename plan is computed before any
+    file is touched.
+
+    Args:
+        folder_name (str): The copied module folder.
+        search_text (str): The old module name.
+        replace_text (str): The new module name.
+        workers (int): Number of threads for the content pass.
+        extra_pairs (dict): Additional source -> replacement strings.
+        confirm (callable): Called with the variant table, the rename plan
+                            and the content edits (file path -> changed
+                            lines, see preview_file_edits) before anything
+                            is written; returning False cancels the run.
+        report_path (str): Write a JSON run report (throughput, stage
+                           timings) to this path.
+
+    Returns:
+        tuple: (edited file paths, applied renames as (old_path, new_path)).
+    """
     folder_path = os.path.abspath(folder_name)
+    table = build_variant_table(search_text, replace_text, extra_pairs)
+    matcher, replacements = compile_table(table)
+
+    # Walk the tree once, and keep the directories for the rename plan
+    start = time.perf_counter()
+    file_paths = []
+    dir_paths = []
+    for root, dirs, files in os.walk(folder_path):
+        dir_paths.extend(os.path.join(root, directory) for directory in dirs)
+        file_paths.extend(os.path.join(root, file) for file in files)
+
+    plan, conflicts = plan_renames(file_paths + dir_paths, matcher, replacements)
+    scan_seconds = time.perf_counter() - start
+    for old_path, new_path, other_path in conflicts:
+        if other_path is None:
+            print(f"Cannot rename {old_path}: {new_path} already exists")
+        else:
+            print(f"Cannot rename {old_path}: {other_path} is renamed to {new_path} too")
+    if confirm is not None:
+        def preview(file_path):
+            try:
+                return preview_file_edits(file_path, matcher, replacements)
+            except (OSError, UnicodeError):
+                # Reported by the content pass if the run goes ahead
+                return []
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            edits = {file_path: lines for file_path, lines in zip(file_paths, executor.map(preview, file_paths))
+                     if lines}
+        if not confirm(table, plan, edits):
+            return [], []
 
-    edited_files = []  # To store the names of edited files
+    # Started after the confirmation, so the report does not count the time spent answering it
+    metrics = RunMetrics("rename module", len(file_paths))
+    metrics.add_stage_time("scan", scan_seconds)
 
-    for root, _, files in os.walk(folder_path):
-        for file in files:
-            file_path = os.path.join(root, file)
+    def rewrite(file_path):
+        try:
+            return replace_tokens_in_file(file_path, matcher, replacements, metrics)
+        except (OSError, UnicodeError) as e:
+            metrics.errors.add()
+            metrics.log(f"Error editing {file_path}: {e}")
+            return False
+        finally:
+            metrics.items.add()
 
-            if os.path.isfile(file_path) and is_text_file(file_path):
-                # Replace text within the file
-                with fileinput.FileInput(file_path, inplace=True) as f:
-                    for line in f:
-                        edited_line = line.replace(search_text, replace_text)
-                        print(edited_line, end='')
-                        if edited_line != line:
-                            edited_files.append(file_path)
+    with ProgressRenderer(metrics), ThreadPoolExecutor(max_workers=workers) as executor:
+        edited_files = [file_path for file_path, edited in zip(file_paths, executor.map(rewrite, file_paths)) if edited]
 
-                # Rename the file if the filename contains the search_text
-                new_file_name = file.replace(search_text, replace_text)
-                if new_file_name != file:
-                    new_file_path = os.path.join(root, new_file_name)
-                    os.rename(file_path, new_file_path)
+    with metrics.stage("rename"):
+        apply_rename_plan(plan)
+    metrics.finish()
 
     if edited_files:
         print("\nEdited files:")
         for edited_file in edited_files:
             print(edited_file)
-    
-    input("Press Enter to close...")
+
+    if plan:
+        print("\nRenamed:")
+        for old_path, new_path in plan:
+            print(f"{os.path.relpath(old_path, folder_path)} -> {os.path.basename(new_path)}")
+
+    print(f"\nScanned {len(file_paths)} files, edited {len(edited_files)}, renamed {len(plan)} paths")
+
+    if report_path:
+        metrics.details.update(edited=len(edited_files), renamed=len(plan), conflicts=len(conflicts))
+        metrics.write_report(report_path)
+    return edited_files, plan
+
+
+def print_plan(table, plan, edits):
+    print("\nReplacing:")
+    for source, new in table.items():
+        print(f"  {source} -> {new}")
+
+    print(f"\nContent edits ({len(edits)} files):")
+    for file_path, lines in edits.items():
+        print(f"  {file_path} ({len(lines)} lines)")
+        for number, old_line, new_line in lines[:PREVIEW_LINES]:
+            print(f"    {number}: {old_line}")
+            print(f"    {' ' * len(str(number))}  {new_line}")
+        if len(lines) > PREVIEW_LINES:
+            print(f"    ... and {len(lines) - PREVIEW_LINES} more lines")
+
+    print(f"\nRename plan ({len(plan)} paths):")
+    for old_path, new_path in plan:
+        print(f"  {old_path} -> {os.path.basename(new_path)}")
+
+
+def _confirm_plan(table, plan, edits):
+    print_plan(table, plan, edits)
+    return input("\nApply? (y/n): ").strip().lower() == 'y'
+
 
 if __name__ == "__main__":
     folder_name = input("Enter the folder name: ")
     search_text = input("Enter the text to search for: ")
     replace_text = input("Enter the text to replace with: ")
+    while True:
+        pairs = input("Extra replacements (old=new, separated by spaces), or press Enter for none: ").split()
+        invalid = [pair for pair in pairs if "=" not in pair or pair.startswith("=")]
+        if not invalid:
+            break
+        print(f"Not an old=new pair: {', '.join(invalid)}. Please try again.")
+    extra_pairs = dict(pair.split("=", 1) for pair in pairs)
 
-    replace_text_in_files_and_rename(folder_name, search_text, replace_text)
+    report_path = input("Write a JSON run report to (or press Enter to skip): ").strip() or None
+
+    replace_text_in_files_and_rename(folder_name, search_text, replace_text, extra_pairs=extra_pairs,
+                                     confirm=_confirm_plan, report_path=report_path)
+
+    input("Press Enter to close...")
@@ -0,0 +1,65 @@
+import os
+import hashlib
+import tempfile
+import contextlib
+
+
+def file_sha256(file_path):
+    """
+    Hashes a file in fixed-size chunks.
+
+    Parameters:
+    file_path (str): Path to the file.
+
+    Returns:
+    str: The hex SHA-256 digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@contextlib.contextmanager
+def atomic_output(file_path):
+    """
+    Opens a temporary file in the same directory as file_path for binary
+    writing, and swaps it in with os.replace once the block completes, so
+    the file never holds a partial write. The temporary file is removed if
+    the block raises.
+
+    Parameters:
+    file_path (str): Path to the file to write.
+
+    Yields:
+    file: The temporary file object.
+    """
+    directory, filename = os.path.split(os.path.abspath(file_path))
+    file_descriptor, temp_path = tempfile.mkstemp(prefix=f".{filename}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(file_descriptor, 'wb') as file:
+            yield file
+        if os.path.exists(file_path):
+            os.chmod(temp_path, os.stat(file_path).st_mode & 0o7777)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_atomic(file_path, data):
+    """
+    Writes data to a file through a temporary file in the same directory and
+    an os.replace, so the file never holds a partial write.
+
+    Parameters:
+    file_path (str): Path to the file to write.
+    data (bytes): The new file contents.
+
+    Returns:
+    None
+    """
+    with atomic_output(file_path) as file:
+        file.write(data)
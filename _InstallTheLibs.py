@@ -1,169 +1,390 @@
 import subprocess
 import sys
-from typing import List
-from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 from datetime import datetime
-import pkg_resources
+import importlib
+import importlib.metadata
 import threading
 import re
-from time import sleep
+import os
+import json
+import argparse
+import tempfile
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+from _Progress import ProgressRenderer, RunMetrics
+from _FileUtils import file_sha256
+
+try:
+    from packaging.requirements import Requirement, InvalidRequirement
+    from packaging.version import Version, InvalidVersion
+except ImportError:
+    Requirement = None
+
+# The packages the scripts in this folder use
+DEFAULT_PACKAGES = ["requests", "pandas", "numpy", "pyperclip", "PIL"]
+
+# Import names that differ from the name of the distribution providing them
+IMPORT_TO_DISTRIBUTION = {
+    "PIL": "Pillow",
+    "cv2": "opencv-python",
+    "yaml": "PyYAML",
+    "sklearn": "scikit-learn",
+    "bs4": "beautifulsoup4",
+    "win32api": "pywin32",
+}
 
 class ProgressTracker:
-    def __init__(self, total_packages):
-        self.total_packages = total_packages
-        self.completed = 0
-        self.current_operations = {}
-        self.lock = threading.Lock()
-        
+    """
+    Shows the progress of the installation on a status line.
+
+    Updates only record the latest status; the line itself is redrawn by a
+    ProgressRenderer thread at a fixed rate, so pip's output is never held
+    up by terminal writes. Use it as a context manager around the install.
+    """
+    def __init__(self, total_packages, metrics: Optional[RunMetrics] = None):
+        self.metrics = metrics or RunMetrics("install", total_packages)
+        self.renderer = ProgressRenderer(self.metrics, sys.stdout)
+
+    def __enter__(self) -> "ProgressTracker":
+        self.renderer.__enter__()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
     def update_progress(self, package: str, status: str) -> None:
         """Update the progress status for a specific package"""
-        with self.lock:
-            self.current_operations[package] = status
-            self._display_progress()
-            
+        self.metrics.status = f"{package}: {status}"
+
     def complete_package(self, package: str) -> None:
-        """Mark a package as completed and remove it from current operations"""
-        with self.lock:
-            self.completed += 1
-            if package in self.current_operations:
-                del self.current_operations[package]
-            self._display_progress()
-    
-    def _display_progress(self) -> None:
-        """Display the current progress of all operations"""
-        percentage = (self.completed / self.total_packages) * 100
-        
-        # Clear previous lines
-        sys.stdout.write("\033[K")  # Clear current line
-        for _ in range(len(self.current_operations)):
-            sys.stdout.write("\033[F")  # Move cursor up
-            sys.stdout.write("\033[K")  # Clear line
-            
-        # Print progress bar
-        bar_length = 30
-        filled = int(bar_length * percentage / 100)
-        bar = "█" * filled + "░" * (bar_length - filled)
-        print(f"\rOverall Progress: [{bar}] {percentage:.1f}% ({self.completed}/{self.total_packages})")
-        
-        # Print current operations
-        for pkg, status in self.current_operations.items():
-            print(f"  → {pkg}: {status}")
-        
-        sys.stdout.flush()
-
-def get_package_version(package: str) -> tuple[bool, str]:
-    """
-    Check if a package is installed and get its version.
-    
+        """Mark a package as completed"""
+        self.metrics.items.add()
+
+    def stop(self) -> None:
+        """Draw the final status line and stop redrawing"""
+        self.metrics.status = ""
+        self.renderer.stop()
+
+def normalize_name(name: str) -> str:
+    """Normalize a distribution name as pip does (PEP 503)."""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+def snapshot_installed() -> dict[str, str]:
+    """
+    Read the name and version of every installed distribution at once.
+
+    Returns:
+        Dict of normalized distribution name -> version string
+    """
+    importlib.invalidate_caches()
+    installed = {}
+    for distribution in importlib.metadata.distributions():
+        name = distribution.metadata["Name"]
+        if name:
+            installed.setdefault(normalize_name(name), distribution.version)
+    return installed
+
+def _release(version: str) -> tuple[int, ...]:
+    match = re.match(r"\d+(\.\d+)*", version.strip())
+    parts = [int(part) for part in match.group().split(".")] if match else []
+    while parts and parts[-1] == 0:
+        parts.pop()
+    return tuple(parts)
+
+def _matches_specifier(version: str, operator: str, wanted: str) -> bool:
+    """Compare release numbers, used when the packaging library is not installed."""
+    if wanted.endswith(".*") and operator in ("==", "!="):
+        prefix = _release(wanted[:-2])
+        matches = _release(version)[:len(prefix)] == prefix
+        return matches if operator == "==" else not matches
+
+    current, target = _release(version), _release(wanted)
+    if operator == "~=":
+        prefix = _release(".".join(wanted.split(".")[:-1]))
+        return current >= target and current[:len(prefix)] == prefix
+    return {
+        "==": current == target, "===": version == wanted, "!=": current != target,
+        ">=": current >= target, "<=": current <= target, ">": current > target, "<": current < target,
+    }[operator]
+
+def parse_requirement(package: str) -> tuple[str, str, str]:
+    """
+    Split a requirement into its distribution name, extras and version specifiers,
+    mapping import names like PIL to their distribution.
+
+    Args:
+        package: A requirement such as "numpy", "PIL>=9" or "requests[socks]==2.31.0"
+
+    Returns:
+        Tuple of (distribution_name, extras, specifiers), extras and specifiers as written
+    """
+    match = re.match(r"\s*([A-Za-z0-9][A-Za-z0-9._-]*)\s*(\[[^\]]*\])?\s*([^;]*)", package)
+    if not match:
+        raise ValueError(f"Invalid requirement: {package}")
+    name, extras, specifiers = match.group(1), match.group(2) or "", match.group(3).strip()
+    return IMPORT_TO_DISTRIBUTION.get(name, name), extras, specifiers
+
+def is_satisfied(package: str, installed: dict[str, str]) -> tuple[bool, Optional[str]]:
+    """
+    Check a requirement against a snapshot of the installed distributions.
+
+    Uses the packaging library when it is available (full PEP 440 and environment
+    markers), and a release-number comparison otherwise.
+
     Args:
-        package: Name of the package to check
-        
+        package: The requirement, e.g. "pandas>=2.0"
+        installed: Snapshot from snapshot_installed()
+
     Returns:
-        Tuple of (is_installed, version_string)
+        Tuple of (is_satisfied, installed_version or None)
     """
-    try:
-        version = pkg_resources.get_distribution(package).version
-        return True, version
-    except pkg_resources.DistributionNotFound:
-        return False, ""
+    name, _, specifiers = parse_requirement(package)
+    version = installed.get(normalize_name(name))
+
+    if Requirement is not None:
+        try:
+            requirement = Requirement(package)
+            if requirement.marker is not None and not requirement.marker.evaluate():
+                return True, version
+            return version is not None and requirement.specifier.contains(Version(version), prereleases=True), version
+        except (InvalidRequirement, InvalidVersion):
+            pass
+
+    if version is None:
+        return False, None
+    for specifier in filter(None, (part.strip() for part in specifiers.split(","))):
+        operator, wanted = re.match(r"(===|~=|==|!=|>=|<=|>|<)?\s*(.*)", specifier).groups()
+        if not _matches_specifier(version, operator or "==", wanted):
+            return False, version
+    return True, version
 
-def install_or_update_package(package: str, progress_tracker: ProgressTracker) -> tuple[str, bool, str]:
+def resolve_packages(packages: List[str], upgrade: bool = False) -> list[dict]:
     """
-    Install a package if not present, or update it if already installed.
-    
+    Work out which packages need pip, without starting it.
+
     Args:
-        package: Name of the package to install/update
-        progress_tracker: ProgressTracker instance for monitoring progress
-        
+        packages: Requirements or import names to check
+        upgrade: Send installed packages to pip too, to upgrade them
+
     Returns:
-        Tuple of (package_name, success_status, message)
+        List of dicts with the package, the requirement to give pip, the installed
+        version and the action: "builtin", "satisfied" or "install"
     """
-    installed, current_version = get_package_version(package)
-    
-    try:
-        if installed:
-            progress_tracker.update_progress(package, "Checking for updates...")
-            # Try to upgrade the package
-            process = subprocess.Popen(
-                [sys.executable, "-m", "pip", "install", "--upgrade", package],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            # Monitor the upgrade process
-            while True:
-                output = process.stdout.readline()
-                if output:
-                    progress_tracker.update_progress(package, output.strip())
-                if process.poll() is not None:
-                    break
-            
-            # Check if version changed after upgrade
-            _, new_version = get_package_version(package)
-            
-            if process.returncode == 0:
-                message = (f"Updated from {current_version} to {new_version}" 
-                          if new_version != current_version 
-                          else f"Already up to date (version {current_version})")
-                progress_tracker.complete_package(package)
-                return package, True, message
-            else:
-                error = process.stderr.read().strip()
-                progress_tracker.complete_package(package)
-                return package, False, f"Update failed: {error}"
+    installed = snapshot_installed()
+    plan = []
+    for package in packages:
+        name, extras, specifiers = parse_requirement(package)
+        entry = {"package": package, "requirement": f"{name}{extras}{specifiers}", "installed": None}
+        if name in sys.stdlib_module_names:
+            entry["action"] = "builtin"
         else:
-            progress_tracker.update_progress(package, "Starting installation...")
-            # Package not installed, perform fresh install
-            process = subprocess.Popen(
-                [sys.executable, "-m", "pip", "install", package],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            # Monitor the installation process
-            while True:
-                output = process.stdout.readline()
-                if output:
-                    progress_tracker.update_progress(package, output.strip())
-                if process.poll() is not None:
-                    break
-            
-            if process.returncode == 0:
-                _, installed_version = get_package_version(package)
-                progress_tracker.complete_package(package)
-                return package, True, f"Newly installed (version {installed_version})"
-            else:
-                error = process.stderr.read().strip()
-                progress_tracker.complete_package(package)
-                return package, False, error.strip()
-                
-    except Exception as e:
-        progress_tracker.complete_package(package)
-        return package, False, str(e)
+            satisfied, entry["installed"] = is_satisfied(entry["requirement"], installed)
+            entry["action"] = "satisfied" if satisfied and not upgrade else "install"
+        plan.append(entry)
+    return plan
 
-def batch_install(packages: List[str], max_workers: int = 4) -> None:
+def run_pip(arguments: List[str], progress_tracker: ProgressTracker) -> tuple[bool, str]:
     """
-    Install/update multiple packages in parallel using ThreadPoolExecutor.
-    
+    Run a single pip process, showing its output on the progress tracker.
+
+    Args:
+        arguments: Arguments after "pip", e.g. ["install", "numpy", "pandas"]
+        progress_tracker: ProgressTracker instance showing pip's output
+
+    Returns:
+        Tuple of (success_status, error_output)
+    """
+    command = [sys.executable, "-m", "pip", *arguments]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+    # Read stderr in the background so a chatty pip cannot block on a full pipe
+    errors = []
+    reader = threading.Thread(target=lambda: errors.extend(process.stderr), daemon=True)
+    reader.start()
+    for line in process.stdout:
+        if line.strip():
+            progress_tracker.update_progress("pip", line.strip())
+    process.wait()
+    reader.join()
+    return process.returncode == 0, "".join(errors).strip()
+
+def to_requirements(packages: List[str]) -> List[str]:
+    """Map import names to distributions and drop standard library modules."""
+    requirements = []
+    for package in packages:
+        name, extras, specifiers = parse_requirement(package)
+        if name not in sys.stdlib_module_names:
+            requirements.append(f"{name}{extras}{specifiers}")
+    return requirements
+
+def resolve_from_wheelhouse(requirements: List[str], wheelhouse: str) -> list[dict]:
+    """
+    Resolve requirements and all their dependencies against a local wheel folder only,
+    with pip's own resolver and without installing anything.
+
+    Args:
+        requirements: Requirements to resolve
+        wheelhouse: Folder holding the wheels (and sdists)
+
+    Returns:
+        List of dicts with the name, version, file name and SHA-256 of every package
+    """
+    command = [sys.executable, "-m", "pip", "install", "--dry-run", "--ignore-installed", "--no-index",
+               "--find-links", wheelhouse, "--quiet", "--report", "-", *requirements]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+
+    resolved = []
+    for item in json.loads(result.stdout)["install"]:
+        file_path = url2pathname(urlparse(item["download_info"]["url"]).path)
+        resolved.append({
+            "name": item["metadata"]["name"],
+            "version": item["metadata"]["version"],
+            "file": os.path.basename(file_path),
+            "sha256": file_sha256(file_path),
+        })
+    return resolved
+
+def fill_wheelhouse(packages: List[str], wheelhouse: str) -> list[dict]:
+    """
+    Download the packages and all their dependencies into a local wheel folder.
+
+    Files already in the folder are not downloaded again, so refilling only fetches
+    what is new. Resolution runs for the Python version and platform of this machine.
+
+    Args:
+        packages: List of package names or requirements
+        wheelhouse: Folder to fill, created if needed
+
+    Returns:
+        The resolved packages (see resolve_from_wheelhouse), each with a "cache_hit"
+        flag telling whether its file was already in the wheelhouse
+    """
+    requirements = to_requirements(packages)
+    os.makedirs(wheelhouse, exist_ok=True)
+    before = set(os.listdir(wheelhouse))
+
+    with ProgressTracker(1) as progress_tracker:
+        ok, error = run_pip(["download", "--dest", wheelhouse, "--find-links", wheelhouse, *requirements],
+                            progress_tracker)
+        progress_tracker.complete_package("pip")
+    if not ok:
+        raise RuntimeError(error)
+
+    resolved = resolve_from_wheelhouse(requirements, wheelhouse)
+    for package in resolved:
+        package["cache_hit"] = package["file"] in before
+    return resolved
+
+def write_lockfile(resolved: list[dict], lock_path: str, packages: List[str]) -> None:
+    """
+    Write a requirements file pinning exact versions and hashes, for pip's hash-checking mode.
+
+    Args:
+        resolved: Packages from resolve_from_wheelhouse or fill_wheelhouse
+        lock_path: Path of the lockfile to write
+        packages: The top-level packages, recorded in the header
+    """
+    lines = [f"# Generated by _InstallTheLibs.py for: {' '.join(packages)}"]
+    for package in sorted(resolved, key=lambda package: normalize_name(package["name"])):
+        lines.append(f"{package['name']}=={package['version']} --hash=sha256:{package['sha256']}")
+    with open(lock_path, "w", encoding="utf-8") as file:
+        file.write("\n".join(lines) + "\n")
+
+def read_lockfile(lock_path: str) -> dict[str, str]:
+    """
+    Read a lockfile written by write_lockfile.
+
+    Returns:
+        Dict of pinned requirement ("name==version") -> full lockfile line with its hashes
+    """
+    pins = {}
+    with open(lock_path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                pins[line.split()[0]] = line
+    return pins
+
+def batch_install(packages: List[str], upgrade: bool = False, wheelhouse: Optional[str] = None,
+                  lockfile: Optional[str] = None, report_path: Optional[str] = None) -> bool:
+    """
+    Install the packages that are missing or too old with a single pip invocation.
+
     Args:
-        packages: List of package names to install/update
-        max_workers: Maximum number of concurrent operations
+        packages: List of package names or requirements to install/update
+        upgrade: Also upgrade packages that already meet their requirement
+        wheelhouse: Install only from this wheel folder (or --find-links URL), without the index
+        lockfile: Install exactly the pinned versions of this lockfile, checking their hashes;
+                  packages is ignored
+        report_path: Write a JSON run report (timings, results) to this path
+
+    Returns:
+        True if every package was installed or already satisfied
     """
+    pins = read_lockfile(lockfile) if lockfile else {}
+    if lockfile:
+        packages = list(pins)
+        upgrade = False
+
     print(f"\nStarting batch installation/update at {datetime.now().strftime('%H:%M:%S')}")
     print(f"Packages to process: {', '.join(packages)}\n")
-    
-    progress_tracker = ProgressTracker(len(packages))
-    
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [
-            executor.submit(install_or_update_package, package, progress_tracker)
-            for package in packages
-        ]
-        results = [future.result() for future in futures]
-    
+
+    metrics = RunMetrics("install", len(packages))
+    with metrics.stage("resolve"):
+        plan = resolve_packages(packages, upgrade)
+    outstanding = [entry for entry in plan if entry["action"] == "install"]
+    metrics.items.add(len(plan) - len(outstanding))
+    source = f" from {wheelhouse}" if wheelhouse else ""
+
+    pip_ok, pip_error = True, ""
+    if outstanding:
+        arguments = ["install", *(["--upgrade"] if upgrade else [])]
+        if wheelhouse:
+            arguments += ["--no-index", "--find-links", wheelhouse]
+
+        requirements_path = None
+        try:
+            if lockfile:
+                # The lockfile already lists every dependency, pinned and hashed
+                file_descriptor, requirements_path = tempfile.mkstemp(suffix=".txt")
+                with os.fdopen(file_descriptor, "w", encoding="utf-8") as file:
+                    file.writelines(pins[entry["package"]] + "\n" for entry in outstanding)
+                arguments += ["--no-deps", "--require-hashes", "-r", requirements_path]
+            else:
+                arguments += [entry["requirement"] for entry in outstanding]
+
+            with ProgressTracker(len(packages), metrics) as progress_tracker:
+                with metrics.stage("install"):
+                    pip_ok, pip_error = run_pip(arguments, progress_tracker)
+                for entry in outstanding:
+                    progress_tracker.complete_package(entry["package"])
+        finally:
+            if requirements_path:
+                os.remove(requirements_path)
+        installed = snapshot_installed()
+
     # Print final results
+    results = []
+    for entry in plan:
+        if entry["action"] == "builtin":
+            results.append((entry["package"], True, "Part of the Python standard library, nothing to install"))
+        elif entry["action"] == "satisfied":
+            results.append((entry["package"], True, f"Already satisfied (version {entry['installed']})"))
+        else:
+            satisfied, new_version = is_satisfied(entry["requirement"], installed)
+            if not pip_ok and not satisfied:
+                results.append((entry["package"], False, f"Install failed: {pip_error}"))
+            elif entry["installed"] is None:
+                results.append((entry["package"], True, f"Newly installed{source} (version {new_version})"))
+            elif new_version != entry["installed"]:
+                results.append((entry["package"], True,
+                                f"Updated{source} from {entry['installed']} to {new_version}"))
+            else:
+                results.append((entry["package"], True, f"Already up to date (version {new_version})"))
+
     success_count = 0
     print("\nFinal Results:")
     print("-" * 60)
@@ -174,18 +395,61 @@ def batch_install(packages: List[str], max_workers: int = 4) -> None:
         print(f"{status} {package}: {message}")
     
     print("-" * 60)
-    print(f"Successfully processed {success_count}/{len(packages)} packages")
+    metrics.finish()
+    print(f"Successfully processed {success_count}/{len(packages)} packages in {metrics.elapsed:.2f}s")
+
+    if report_path:
+        metrics.errors.add(len(packages) - success_count)
+        metrics.details["results"] = [{"package": package, "success": success, "message": message}
+                                      for package, success, message in results]
+        metrics.write_report(report_path)
+    return success_count == len(packages)
+
+def main(argv: Optional[List[str]] = None, prog: Optional[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog=prog, description="Install or update the packages used by the scripts.")
+    parser.add_argument("packages", nargs="*", default=DEFAULT_PACKAGES,
+                        help="Package names or requirements (default: the packages the scripts use)")
+    parser.add_argument("--upgrade", action="store_true", help="Also upgrade packages that are already satisfied")
+    parser.add_argument("--wheelhouse",
+                        help="Local wheel folder (or --find-links URL) to install from, without the package index")
+    parser.add_argument("--fill-wheelhouse", action="store_true",
+                        help="Download the packages and their dependencies into --wheelhouse instead of installing")
+    parser.add_argument("--lock", help="Write a lockfile of exact versions and hashes resolved from --wheelhouse")
+    parser.add_argument("--from-lock", help="Install the exact versions of a lockfile, checking their hashes")
+    parser.add_argument("--report", help="Write a JSON run report to this path")
+    args = parser.parse_args(argv)
+
+    if (args.fill_wheelhouse or args.lock) and not args.wheelhouse:
+        parser.error("--fill-wheelhouse and --lock need a local --wheelhouse folder")
+    if args.fill_wheelhouse or args.lock:
+        # The wheels are listed and hashed here, which pip's --find-links URLs do not allow;
+        # --fill-wheelhouse creates a missing folder
+        creatable = args.fill_wheelhouse and not os.path.exists(args.wheelhouse)
+        if "://" in args.wheelhouse or not (os.path.isdir(args.wheelhouse) or creatable):
+            parser.error(f"--fill-wheelhouse and --lock need a local --wheelhouse folder, not {args.wheelhouse}")
+
+    if args.fill_wheelhouse or args.lock:
+        if args.fill_wheelhouse:
+            resolved = fill_wheelhouse(args.packages, args.wheelhouse)
+            print("\nWheelhouse:")
+            print("-" * 60)
+            for package in resolved:
+                status = "cached" if package["cache_hit"] else "downloaded"
+                print(f"{status:>10}  {package['name']}=={package['version']} ({package['file']})")
+            hits = sum(package["cache_hit"] for package in resolved)
+            print("-" * 60)
+            print(f"{hits}/{len(resolved)} packages were already in {args.wheelhouse}")
+        else:
+            resolved = resolve_from_wheelhouse(to_requirements(args.packages), args.wheelhouse)
+
+        if args.lock:
+            write_lockfile(resolved, args.lock, args.packages)
+            print(f"Wrote {len(resolved)} pins to {args.lock}")
+        return 0
+
+    return 0 if batch_install(args.packages, args.upgrade, args.wheelhouse, args.from_lock, args.report) else 1
 
 if __name__ == "__main__":
     # You can either pass packages as command line arguments
-    # or modify this list directly
-    packages_to_install = sys.argv[1:] if len(sys.argv) > 1 else [        
-        "requests",
-        "pandas",
-        "numpy",
-        "glob",
-        "pyperclip",
-        "PIL"
-    ]
-    
-    batch_install(packages_to_install)
\ No newline at end of file
+    # or modify DEFAULT_PACKAGES directly
+    sys.exit(main())
@@ -0,0 +1,258 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextlib
+from datetime import datetime
+
+# Redraws per second of the progress line on a terminal
+REFRESH_RATE = 10
+
+# Seconds between progress lines when the output is not a terminal
+PLAIN_INTERVAL = 5.0
+
+
+def peak_rss_bytes():
+    """
+    Returns the peak resident set size of the current process in bytes.
+    """
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                 ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize
+
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Counter:
+    """
+    A counter that many threads can add to without a lock.
+
+    Every thread adds to its own slot, so no two threads ever write the same
+    value, and readers sum the slots. Reads may miss an addition that is
+    happening at that moment, which is fine for progress display.
+    """
+
+    def __init__(self):
+        self._slots = {}
+
+    def add(self, amount=1):
+        thread = threading.get_ident()
+        self._slots[thread] = self._slots.get(thread, 0) + amount
+
+    @property
+    def value(self):
+        return sum(list(self._slots.values()))
+
+
+class RunMetrics:
+    """
+    Counters and stage timings of one run of a script.
+
+    Workers count items and bytes and time their stages (scan, read,
+    transform, write, ...); a ProgressRenderer reads the same object to show
+    progress, and report() turns it into a dict that can be written as a
+    JSON run report.
+
+    Parameters:
+    name (str): Name of the run, e.g. "extract_zips".
+    total (int): Number of items expected, if known.
+    """
+
+    def __init__(self, name, total=None):
+        self.name = name
+        self.total = total
+        self.items = Counter()
+        self.bytes = Counter()
+        self.errors = Counter()
+        self.status = ""
+        self.details = {}
+        self._stages = {}
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self._end = None
+        self.renderer = None
+
+    def log(self, message):
+        """
+        Prints a message without garbling the progress line.
+        """
+        if self.renderer:
+            self.renderer.log(message)
+        else:
+            print(message)
+
+    def add_stage_time(self, stage, seconds):
+        """
+        Adds time spent in a stage, e.g. timings measured in worker processes.
+        """
+        self._stages.setdefault(stage, Counter()).add(seconds)
+
+    @contextlib.contextmanager
+    def stage(self, stage):
+        """
+        Times the enclosed block as part of a stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage_time(stage, time.perf_counter() - start)
+
+    def finish(self):
+        if self._end is None:
+            self._end = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return (self._end or time.perf_counter()) - self._start
+
+    def rates(self):
+        """
+        Returns:
+        tuple: (items per second, bytes per second) since the start.
+        """
+        elapsed = max(self.elapsed, 1e-9)
+        return self.items.value / elapsed, self.bytes.value / elapsed
+
+    def report(self):
+        """
+        Returns:
+        dict: The run report, ready for json.dump.
+        """
+        items_per_second, bytes_per_second = self.rates()
+        return {
+            "name": self.name,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "seconds": round(self.elapsed, 6),
+            "items": self.items.value,
+            "total": self.total,
+            "bytes": self.bytes.value,
+            "errors": self.errors.value,
+            "items_per_second": round(items_per_second, 3),
+            "bytes_per_second": round(bytes_per_second, 3),
+            "stages": {stage: round(counter.value, 6) for stage, counter in self._stages.items()},
+            "peak_rss_bytes": peak_rss_bytes(),
+            "details": self.details,
+        }
+
+    def write_report(self, report_path):
+        """
+        Writes the run report as JSON to report_path.
+        """
+        with open(report_path, 'w', encoding='utf-8') as file:
+            json.dump(self.report(), file, indent=2)
+            file.write("\n")
+
+
+def format_bytes(amount):
+    for unit in ("B", "KB", "MB", "GB"):
+        if amount < 1024 or unit == "GB":
+            return f"{amount:.1f} {unit}" if unit != "B" else f"{amount:.0f} B"
+        amount /= 1024
+
+
+def format_progress(metrics):
+    items = metrics.items.value
+    items_per_second, bytes_per_second = metrics.rates()
+    line = f"{metrics.name}: {items}"
+    if metrics.total:
+        line += f"/{metrics.total} ({items / metrics.total * 100:.1f}%)"
+    line += f" | {items_per_second:.1f} items/s"
+    if metrics.bytes.value:
+        line += f" | {format_bytes(bytes_per_second)}/s"
+    if metrics.errors.value:
+        line += f" | {metrics.errors.value} errors"
+    if metrics.status:
+        line += f" | {metrics.status}"
+    return line
+
+
+class ProgressRenderer:
+    """
+    Draws the progress of a RunMetrics from its own thread, so the workers
+    never wait on the terminal.
+
+    On a terminal a single status line is redrawn REFRESH_RATE times a
+    second; otherwise (output redirected to a file or a pipe) a plain line
+    is printed every PLAIN_INTERVAL seconds. A final line is printed when
+    the renderer stops.
+
+    Use it as a context manager around the work.
+    """
+
+    def __init__(self, metrics, stream=None, refresh_rate=REFRESH_RATE, plain_interval=PLAIN_INTERVAL):
+        self.metrics = metrics
+        self.stream = stream or sys.stderr
+        self.is_tty = hasattr(self.stream, "isatty") and self.stream.isatty()
+        self.interval = 1 / refresh_rate if self.is_tty else plain_interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        # Only serializes writes to the stream, the counters are never locked
+        self._output_lock = threading.Lock()
+        self._width = 0
+
+    def __enter__(self):
+        self.metrics.renderer = self
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _clear(self):
+        if self.is_tty and self._width:
+            self.stream.write("\r" + " " * self._width + "\r")
+            self._width = 0
+
+    def _draw(self, final=False):
+        line = format_progress(self.metrics)
+        with self._output_lock:
+            if self.is_tty:
+                try:
+                    line = line[:os.get_terminal_size(self.stream.fileno()).columns - 1]
+                except (OSError, ValueError):
+                    pass
+                self.stream.write("\r" + line.ljust(self._width) + ("\n" if final else ""))
+                self._width = 0 if final else len(line)
+            else:
+                self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def log(self, message):
+        """
+        Prints a message above the progress line.
+        """
+        with self._output_lock:
+            self._clear()
+            self.stream.flush()
+            print(message, flush=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self._draw()
+
+    def stop(self):
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._draw(final=True)
+        self.metrics.renderer = None
+
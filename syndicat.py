@@ -0,0 +1,292 @@
+"""
+Single entry point for the Studio SyndiCat file scripts.
+
+    python syndicat.py invert Textures/ --workers 8
+    python syndicat.py list D:/Project --ext .uasset --top 50
+    python syndicat.py batch jobs.txt
+
+Each subcommand imports only the script it runs, so e.g. `list` never
+loads PIL. The interactive scripts still work on their own.
+"""
+import os
+import sys
+import time
+import shlex
+import argparse
+
+# Subcommands whose script already has an argparse CLI: their arguments are
+# handed to that script's main(argv) as they are
+DELEGATED = {
+    "list": ("ListFiles_ByEditDate", "List files sorted by last modified date"),
+    "install": ("_InstallTheLibs", "Install or update the packages used by the scripts"),
+}
+
+# Kept in sync with ReplaceHexString.PATTERN_ENCODINGS, which is not imported to keep startup light
+PATTERN_ENCODINGS = ("hex", "utf-8", "utf-16-le")
+
+# Kept in sync with EditImage_Encoders.ENCODER_PROFILES and DEFAULT_PROFILE
+ENCODER_PROFILES = ("fast", "balanced", "archival", "original")
+DEFAULT_PROFILE = "balanced"
+
+
+def run_invert(args):
+    from EditImage_InvertColor import invert_colors
+    results = invert_colors(args.path, args.workers, args.report, args.max_memory, args.profile)
+    return 1 if any(result["error"] for result in results) else 0
+
+
+def run_brighten(args):
+    from EditImage_Brightness import adjust_lightness
+    results = adjust_lightness(args.path, args.value, args.workers, args.report, args.max_memory, args.profile)
+    return 1 if any(result["error"] for result in results) else 0
+
+
+def memory_size(text):
+    # EditImage_Tiled loads PIL, so it is only imported when the option is given
+    from EditImage_Tiled import parse_memory_size
+    return parse_memory_size(text)
+
+
+def run_extract(args):
+    from ExtractMassToFolder import extract_zips
+    if not os.path.isdir(args.folder):
+        raise FileNotFoundError(f"Folder not found: {args.folder}")
+    totals = extract_zips(args.folder, args.to, args.workers, args.nested, args.incremental, args.report)
+    return 1 if totals["errors"] else 0
+
+
+def finish_run(metrics, report_path):
+    metrics.finish()
+    if report_path:
+        metrics.write_report(report_path)
+    return 1 if metrics.errors.value else 0
+
+
+def run_replace(args):
+    from ReplaceHexString import encode_pattern, replace_bytes, replace_in_tree
+    from ReplaceStrings import load_mapping, print_hit_report, replace_strings
+    from _Progress import RunMetrics
+
+    metrics = RunMetrics("replace")
+    if args.mapping:
+        if os.path.isdir(args.path):
+            raise ValueError("--mapping works on a single file")
+        mapping = load_mapping(args.mapping)
+        hits = replace_strings(args.path, mapping, metrics)
+        print_hit_report(args.path, hits, mapping)
+        metrics.details["hits"] = hits
+        return finish_run(metrics, args.report)
+
+    if args.source is None or args.new is None:
+        raise ValueError("Give a source and a new pattern, or --mapping")
+    source_bytes = encode_pattern(args.source, args.encoding)
+    new_bytes = encode_pattern(args.new, args.encoding)
+
+    if os.path.isdir(args.path):
+        extensions = tuple(extension.lower() if extension.startswith('.') else '.' + extension.lower()
+                           for extension in args.ext) or None
+        matches = replace_in_tree(args.path, source_bytes, new_bytes, extensions, dry_run=not args.apply,
+                                  workers=args.workers, metrics=metrics)
+        if matches and not args.apply:
+            print("Dry run, pass --apply to patch these files")
+        return finish_run(metrics, args.report)
+
+    count = replace_bytes(args.path, source_bytes, new_bytes, metrics)
+    print(f"Replaced {count} instances of '{args.source}' with '{args.new}' in {args.path}")
+    metrics.details["replaced"] = count
+    return finish_run(metrics, args.report)
+
+
+def run_rename_module(args):
+    from UE_ModuleRenamer import print_plan, replace_text_in_files_and_rename
+
+    def preview(table, plan, edits):
+        print_plan(table, plan, edits)
+        print("\nDry run, nothing was changed")
+        return False
+
+    replace_text_in_files_and_rename(args.folder, args.old, args.new, args.workers, dict(args.pair),
+                                     confirm=preview if args.dry_run else None, report_path=args.report)
+
+
+def run_rename(args):
+    from RenameFilesInFolder import apply_renames, plan_renames, undo_renames
+    from _Progress import RunMetrics
+
+    metrics = RunMetrics("rename")
+    if args.undo:
+        with metrics.stage("rename"):
+            undone = undo_renames(args.folder)
+        print(f"Undid {undone} renames")
+        metrics.items.add(undone)
+        return finish_run(metrics, args.report)
+    if args.old is None or args.new is None:
+        raise ValueError("Give the string to replace and the new string, or --undo")
+
+    with metrics.stage("scan"):
+        steps, conflicts = plan_renames(args.folder, args.old, args.new, args.regex, args.recursive)
+    metrics.total = len(steps)
+    for old_path, new_name in conflicts:
+        print(f"Skipped: {os.path.relpath(old_path, args.folder)} -> {new_name} (name already taken or invalid)")
+    if not args.dry_run:
+        apply_renames(args.folder, steps, metrics)
+    for old_path, new_path in steps:
+        action = "Would rename" if args.dry_run else "Renamed"
+        print(f"{action}: {os.path.relpath(old_path, args.folder)} -> {os.path.basename(new_path)}")
+    metrics.details["conflicts"] = len(conflicts)
+    return finish_run(metrics, args.report)
+
+
+def run_batch(args):
+    """
+    Runs every job of a jobs file in this process.
+
+    A job is one command line per line, e.g. `invert Textures --workers 4`;
+    blank lines and lines starting with # are skipped. Paths with spaces
+    go in quotes, backslashes are kept as they are.
+    """
+    with open(args.jobs, 'r', encoding='utf-8') as f:
+        jobs = [(number, line.strip()) for number, line in enumerate(f, 1)
+                if line.strip() and not line.lstrip().startswith("#")]
+
+    failed = []
+    start = time.perf_counter()
+    for number, line in jobs:
+        argv = split_job(line)
+        if argv and argv[0] == "batch":
+            print(f"Line {number}: batch jobs cannot start other batches")
+            failed.append(number)
+            continue
+
+        print(f"\n=== [{number}] {line}")
+        job_start = time.perf_counter()
+        code = run(argv)
+        print(f"=== [{number}] {'done' if code == 0 else 'FAILED'} in {time.perf_counter() - job_start:.2f}s")
+        if code != 0:
+            failed.append(number)
+            if not args.keep_going:
+                break
+
+    print(f"\nRan {len(jobs)} jobs in {time.perf_counter() - start:.2f}s, {len(failed)} failed"
+          + (f" (lines {', '.join(map(str, failed))})" if failed else ""))
+    return 1 if failed else 0
+
+
+def parse_pair(text):
+    old, separator, new = text.partition("=")
+    if not separator or not old:
+        raise argparse.ArgumentTypeError(f"expected OLD=NEW, got '{text}'")
+    return old, new
+
+
+def split_job(line):
+    # Not POSIX mode, so Windows paths keep their backslashes
+    return [part[1:-1] if len(part) > 1 and part[0] == part[-1] and part[0] in "'\"" else part
+            for part in shlex.split(line, posix=False)]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="syndicat", description="Studio SyndiCat file scripts.")
+    subparsers = parser.add_subparsers(dest="command", metavar="command", required=True)
+
+    invert = subparsers.add_parser("invert", help="Invert the colors of every image in a folder")
+    invert.add_argument("path", help="Folder of images")
+    invert.set_defaults(handler=run_invert)
+
+    brighten = subparsers.add_parser("brighten", help="Adjust the lightness of every image in a folder")
+    brighten.add_argument("path", help="Folder of images")
+    brighten.add_argument("value", type=float, help="Lightness adjustment, from -1.0 to 1.0")
+    brighten.set_defaults(handler=run_brighten)
+
+    extract = subparsers.add_parser("extract", help="Extract every zip in a folder")
+    extract.add_argument("folder", help="Folder containing the .zip files")
+    extract.add_argument("--to", default="extracted", help="Subfolder to extract to (default: extracted)")
+    extract.add_argument("--nested", action="store_true", help="Also extract zips found inside the archives")
+    extract.add_argument("--incremental", action="store_true", help="Only extract new or changed files")
+    extract.set_defaults(handler=run_extract)
+
+    for name, (_, description) in DELEGATED.items():
+        # Parsed by the script itself, see run()
+        subparsers.add_parser(name, help=f"{description} (see `syndicat {name} -h`)", add_help=False)
+
+    replace = subparsers.add_parser("replace", help="Replace bytes or strings in a file, or patch a whole folder")
+    replace.add_argument("path", help="File, or folder to patch in place")
+    replace.add_argument("source", nargs="?", help="Pattern to replace")
+    replace.add_argument("new", nargs="?", help="New pattern, the same length for folders")
+    replace.add_argument("--encoding", choices=PATTERN_ENCODINGS, default="utf-8",
+                         help="How the patterns are written (default: utf-8)")
+    replace.add_argument("--mapping", help="CSV/JSON file of source -> new strings, for a single file")
+    replace.add_argument("--ext", nargs="*", default=[], help="Folders: only these extensions, e.g. .uasset .uexp")
+    replace.add_argument("--apply", action="store_true", help="Folders: patch the files instead of only listing matches")
+    replace.set_defaults(handler=run_replace)
+
+    rename_module = subparsers.add_parser("rename-module", help="Rename a UE code module in contents and paths")
+    rename_module.add_argument("folder", help="The copied module folder")
+    rename_module.add_argument("old", help="Old module name")
+    rename_module.add_argument("new", help="New module name")
+    rename_module.add_argument("--pair", action="append", default=[], type=parse_pair, metavar="OLD=NEW",
+                               help="Extra replacement, can be repeated")
+    rename_module.add_argument("--dry-run", action="store_true", help="Only show the replacements and renames")
+    rename_module.set_defaults(handler=run_rename_module)
+
+    rename = subparsers.add_parser("rename", help="Batch rename the files and folders in a folder")
+    rename.add_argument("folder", help="Folder to rename in")
+    rename.add_argument("old", nargs="?", help="String to replace, or a regular expression with --regex")
+    rename.add_argument("new", nargs="?", help="New string")
+    rename.add_argument("--regex", action="store_true", help="Treat the string to replace as a regular expression")
+    rename.add_argument("--recursive", action="store_true", help="Include subfolders")
+    rename.add_argument("--dry-run", action="store_true", help="Only show the renames")
+    rename.add_argument("--undo", action="store_true", help="Undo the last batch of renames in the folder")
+    rename.set_defaults(handler=run_rename)
+
+    batch = subparsers.add_parser("batch", help="Run the jobs of a file, one command line per line")
+    batch.add_argument("jobs", help="Jobs file")
+    batch.add_argument("--keep-going", action="store_true", help="Run the remaining jobs after a failure")
+    batch.set_defaults(handler=run_batch)
+
+    for subparser in (invert, brighten, extract, replace, rename_module):
+        subparser.add_argument("--workers", type=int, default=None, help="Number of workers")
+    for subparser in (invert, brighten):
+        subparser.add_argument("--max-memory", type=memory_size, default=None,
+                               help="Memory budget shared by all workers, e.g. 2G. Larger PNGs are processed in strips.")
+        subparser.add_argument("--profile", choices=ENCODER_PROFILES, default=DEFAULT_PROFILE,
+                               help="Encoder profile (default: balanced)")
+    for subparser in (invert, brighten, extract, replace, rename_module, rename):
+        subparser.add_argument("--report", help="Write a JSON run report to this path")
+    return parser
+
+
+def run(argv):
+    """
+    Runs one command line.
+
+    Errors are reported instead of raised, so a batch can go on with the
+    next job.
+
+    Returns:
+        int: The exit code, 0 on success.
+    """
+    try:
+        if argv and argv[0] in DELEGATED:
+            module_name, _ = DELEGATED[argv[0]]
+            module = __import__(module_name)
+            return module.main(argv[1:], prog=f"syndicat {argv[0]}") or 0
+
+        args = build_parser().parse_args(argv)
+        return args.handler(args) or 0
+    except SystemExit as e:
+        # argparse errors and -h
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        return 1
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+def main(argv=None):
+    return run(sys.argv[1:] if argv is None else argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())